@@ -0,0 +1,47 @@
+"""Dashboard computations without Streamlit.
+
+Every function takes a connection or data and returns DataFrames, dicts or fitted models, so the same
+code serves the app, batch jobs and profilers. Names are resolved on first use: importing this package
+loads neither sklearn nor the submodule behind a name until that name is touched.
+
+    cd app
+    python -m analytics age-groups
+    python -m analytics top-customers --customers 20 --clusters 4
+    python -m analytics rfm-segments --output segments.csv
+    python -m analytics predict-category --gender Female --age 30 --quantity 2 --price 100
+    python -m analytics forecast --horizon 6
+    python -m analytics similar --customers C241288 C111565 --neighbors 5
+    python -m analytics what-if --target category --evidence age_band="Under 30" gender=Female
+"""
+import importlib
+
+
+# Public name -> module that defines it
+_EXPORTS = {
+    "AGE_GROUP_LABELS": "analytics.age_groups",
+    "age_category_totals": "analytics.age_groups",
+    "age_group_report": "analytics.age_groups",
+    "assign_age_groups": "analytics.age_groups",
+    "MIN_CLUSTER_CUSTOMERS": "analytics.top_customers",
+    "TOP_CUSTOMER_FEATURES": "analytics.top_customers",
+    "cluster_top_customers": "analytics.top_customers",
+    "feature_importance": "analytics.segments",
+    "predict_category": "analytics.segments",
+    "predict_segment": "analytics.segments",
+    "forecast_sales": "forecasting",
+    "similar_customers": "lookalikes",
+    "purchase_network": "bayes_net",
+    "category_tree": "models",
+    "segment_tree": "models",
+    "sweep_summary": "clustering",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'analytics' has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,99 @@
+import argparse
+import sys
+
+import pandas as pd
+
+import analytics
+from database import borrow_connection
+from migrate import ensure_schema
+from rfm import SEGMENT_OPTIONS, get_rfm_table
+
+
+def write(df, output):
+    if output is None:
+        df.to_csv(sys.stdout, index=False)
+    elif output.endswith(".parquet"):
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analytics", description=analytics.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output", help=".csv or .parquet path (default: CSV on stdout)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("age-groups", parents=[common], help="top category and total quantity per age group")
+
+    top = commands.add_parser("top-customers", parents=[common], help="top customers by RFM score with their cluster")
+    top.add_argument("--customers", type=int, default=10)
+    top.add_argument("--clusters", type=int, default=3)
+
+    segments = commands.add_parser("rfm-segments", parents=[common], help="customers with their RFM segment")
+    segments.add_argument("--segment", choices=SEGMENT_OPTIONS)
+
+    commands.add_parser("segment-tree", parents=[common], help="segment tree accuracy and feature importance")
+
+    category = commands.add_parser("predict-category", parents=[common], help="predicted product category for one customer")
+    category.add_argument("--gender", required=True)
+    category.add_argument("--age", type=int, required=True)
+    category.add_argument("--quantity", type=int, required=True)
+    category.add_argument("--price", type=float, required=True)
+
+    forecast = commands.add_parser("forecast", parents=[common], help="monthly revenue forecast per category and mall")
+    forecast.add_argument("--horizon", type=int, default=3, help="months to forecast")
+
+    similar = commands.add_parser("similar", parents=[common], help="most similar customers to the given ones")
+    similar.add_argument("--customers", nargs="+", required=True, help="customer IDs")
+    similar.add_argument("--neighbors", type=int, default=10)
+
+    what_if = commands.add_parser("what-if", parents=[common], help="P(target | evidence) from the purchase network")
+    what_if.add_argument("--target", default="category")
+    what_if.add_argument("--evidence", nargs="*", default=[], metavar="VARIABLE=STATE")
+    args = parser.parse_args(argv)
+
+    with borrow_connection() as conn:
+        ensure_schema(conn)
+        if args.command == "age-groups":
+            report = analytics.age_group_report(conn)
+            if report is None:
+                print("No data to analyze.", file=sys.stderr)
+                return 1
+            df = report["top_categories"].merge(report["quantity"], on="age_group_label",
+                                                suffixes=("_top_category", "_total"))
+        elif args.command == "top-customers":
+            df, clusterings = analytics.cluster_top_customers(get_rfm_table(conn), args.customers)
+            if not clusterings:
+                print(f"Clustering needs at least {analytics.MIN_CLUSTER_CUSTOMERS} customers.", file=sys.stderr)
+                return 1
+            df["Cluster"] = clusterings[min(args.clusters, max(clusterings))]["labels"]
+        elif args.command == "rfm-segments":
+            table = get_rfm_table(conn)
+            segments = [args.segment] if args.segment else SEGMENT_OPTIONS
+            df = pd.concat([table.customers_in_segment(segment) for segment in segments], ignore_index=True)
+        elif args.command == "segment-tree":
+            fitted = analytics.segment_tree(conn)
+            df = analytics.feature_importance(fitted).assign(accuracy=fitted["accuracy"])
+        elif args.command == "forecast":
+            result = analytics.forecast_sales(conn, args.horizon)
+            if result is None:
+                print("No data to forecast.", file=sys.stderr)
+                return 1
+            df = result["forecasts"].merge(result["fits"], on=["category", "shopping_mall"])
+        elif args.command == "what-if":
+            evidence = dict(item.split("=", 1) for item in args.evidence)
+            df = analytics.purchase_network(conn).query(args.target, evidence).rename("probability").reset_index()
+        elif args.command == "similar":
+            df = analytics.similar_customers(conn, args.customers, args.neighbors)
+        else:
+            fitted = analytics.category_tree(conn)
+            prediction = analytics.predict_category(fitted, args.gender, args.age, args.quantity, args.price)
+            df = pd.DataFrame([{"predicted_category": prediction, "accuracy": fitted["accuracy"]}])
+    write(df, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from clustering import kmeans_1d
+from preprocessing import iter_preprocessed
+
+
+AGE_GROUP_LABELS = {
+    0: "Young Adults (18-30)",
+    1: "Middle-Aged (31-50)",
+    2: "Seniors (51+)"
+}
+
+
+def age_category_totals(chunks):
+    # One streaming pass over preprocessed chunks: only the per (age, category) totals of each chunk are
+    # kept. Returns age, category, quantity (scaled, summed) and count, or None when there are no rows.
+    partials = [
+        chunk.groupby(['age', 'category'], observed=True)['quantity'].agg(['sum', 'count'])
+        for chunk in chunks
+    ]
+    if not partials:
+        return None
+    totals = pd.concat(partials).groupby(level=['age', 'category'], observed=True).sum().reset_index()
+    return totals.rename(columns={'sum': 'quantity'})
+
+
+def assign_age_groups(totals, n_groups=3):
+    # Exact 1-D k-means over the age histogram, labels ordered youngest first.
+    # Returns the totals with age_group/age_group_label added, and each group's age range.
+    totals = totals.copy()
+    ages = totals.groupby('age')['count'].sum().reset_index()
+    ages['age_group'], _, _ = kmeans_1d(ages['age'], n_groups, weights=ages['count'])
+    totals['age_group'] = totals['age'].map(ages.set_index('age')['age_group'])
+    totals['age_group_label'] = totals['age_group'].map(AGE_GROUP_LABELS)
+
+    ages['weighted_age'] = ages['age'] * ages['count']
+    ranges = ages.groupby('age_group').agg(
+        min=('age', 'min'), max=('age', 'max'), weighted_age=('weighted_age', 'sum'), count=('count', 'sum')
+    )
+    ranges['mean'] = ranges.pop('weighted_age') / ranges.pop('count')
+    return totals, ranges.reset_index()
+
+
+def age_group_report(conn):
+    # Everything the Age Group page shows: age ranges, quantity per group and the top category per group
+    totals = age_category_totals(iter_preprocessed(conn))
+    if totals is None:
+        return None
+    totals, ranges = assign_age_groups(totals)
+
+    quantity = totals.groupby('age_group_label', observed=True)['quantity'].sum().reset_index()
+    by_category = totals.groupby(['age_group_label', 'category'], observed=True)['quantity'].sum().reset_index()
+    top_categories = by_category.loc[by_category.groupby('age_group_label')['quantity'].idxmax()]
+    return {
+        "ranges": ranges,
+        "quantity": quantity,
+        "top_categories": top_categories[['age_group_label', 'category', 'quantity']],
+    }
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from models import CATEGORY_FEATURES
+from rfm import CLASSIFIER_FEATURES
+
+
+def predict_segment(fitted, values):
+    # values: {feature: value} for CLASSIFIER_FEATURES; fitted is what models.segment_tree returns
+    predicted = fitted["model"].predict(pd.DataFrame([values])[CLASSIFIER_FEATURES])
+    return fitted["label_encoder"].inverse_transform(predicted)[0]
+
+
+def feature_importance(fitted):
+    importance = pd.DataFrame({"Feature": CLASSIFIER_FEATURES, "Importance": fitted["model"].feature_importances_})
+    return importance.sort_values(by="Importance", ascending=False)
+
+
+def predict_category(fitted, gender, age, quantity, price):
+    # Encoded and scaled with the preprocessor the category tree was trained with
+    features = pd.DataFrame([{"gender": gender, "age": age, "quantity": quantity, "price": price}])
+    features = fitted["preprocessor"].transform(features)
+    return fitted["model"].predict(features[CATEGORY_FEATURES])[0]
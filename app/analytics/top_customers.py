@@ -0,0 +1,19 @@
+from sklearn.preprocessing import StandardScaler
+
+from clustering import sweep
+
+
+TOP_CUSTOMER_FEATURES = ["total_orders", "revenue", "last_date_order", "rfm_score"]
+# Two clusters need at least one customer more than clusters, or each customer is its own cluster
+MIN_CLUSTER_CUSTOMERS = 3
+
+
+def cluster_top_customers(rfm_table, n_customers, max_clusters=10):
+    # The top customers by RFM score and a cached sweep of every cluster count from 2 to max_clusters
+    # (capped below the number of customers); returns (customers, {k: labels/centroids/inertia/silhouette}).
+    # The sweep is empty when there are fewer than MIN_CLUSTER_CUSTOMERS customers.
+    df = rfm_table.top_customers(n_customers)
+    if len(df) < MIN_CLUSTER_CUSTOMERS:
+        return df, {}
+    scaled = StandardScaler().fit_transform(df[TOP_CUSTOMER_FEATURES])
+    return df, sweep(scaled, range(2, min(max_clusters, len(df) - 1) + 1))
@@ -0,0 +1,317 @@
+"""Score every customer with an RFM segment and a predicted product category.
+
+Customers are streamed in fixed-size chunks (keyset pages of customer_rfm_agg, or per-customer
+aggregates of the Parquet snapshot, built one customer hash bucket at a time), scored with vectorized
+predict calls and written out chunk by chunk. RFM tiles follow the dashboard's NTILE(3), with customers
+tied on a tile boundary split across it in the order they are streamed (customer_id for the database).
+
+    cd app
+    python batch_score.py                                          # database -> customer_scores table
+    python batch_score.py --source snapshot --output scores.parquet
+    python batch_score.py --output scores.csv --chunk-rows 20000
+"""
+import argparse
+import datetime
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import snapshot
+from database import borrow_connection
+from migrate import ensure_schema
+from models import CATEGORY_FEATURES, category_tree
+from rfm import SEGMENT_LOOKUP, SEGMENT_OPTIONS, TILE_COLUMNS
+
+
+CHUNK_ROWS = 50_000
+
+# Per-customer scoring inputs. The category model was trained on invoices, so a customer is scored on
+# their average quantity per invoice and average unit price.
+CUSTOMER_CHUNK_QUERY = """
+    SELECT
+        customer_id,
+        gender,
+        age,
+        DATEDIFF('2024-01-01', last_invoice_date) AS last_date_order,
+        total_quantity AS total_orders,
+        CAST(revenue AS DECIMAL(10, 2)) AS revenue,
+        total_quantity / invoice_count AS quantity,
+        revenue / NULLIF(total_quantity, 0) AS price
+    FROM customer_rfm_agg
+    WHERE customer_id > %s
+    ORDER BY customer_id
+    LIMIT %s
+"""
+
+# The value at a given position of the NTILE ordering, and how many customers sort strictly below a value;
+# the client never holds the full column
+TILE_VALUE_QUERY = "SELECT {expression} FROM customer_rfm_agg ORDER BY {expression} LIMIT 1 OFFSET %s"
+TILE_BELOW_QUERY = "SELECT COUNT(*) FROM customer_rfm_agg WHERE {expression} < %s"
+
+TILE_EXPRESSIONS = {
+    "last_date_order": "DATEDIFF('2024-01-01', last_invoice_date)",
+    "total_orders": "total_quantity",
+    "revenue": "CAST(revenue AS DECIMAL(10, 2))",
+}
+
+SEGMENT_TILES = [(value, tile) for value, tile, n_tiles in TILE_COLUMNS if n_tiles == 3]
+
+UPSERT_SCORES = """
+    INSERT INTO customer_scores (customer_id, rfm_segment, predicted_category)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE rfm_segment = VALUES(rfm_segment), predicted_category = VALUES(predicted_category)
+"""
+
+
+def tile_bounds(size, n_tiles=3):
+    # Ordering positions that end each NTILE bucket but the last; the first size % n buckets get one extra row
+    bucket_sizes = np.full(n_tiles, size // n_tiles)
+    bucket_sizes[:size % n_tiles] += 1
+    return [int(bound) for bound in np.cumsum(bucket_sizes)[:-1] if bound > 0]
+
+
+def db_cut_points(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM customer_rfm_agg")
+        bounds = tile_bounds(cursor.fetchone()[0])
+        cut_points = {}
+        for value, tile in SEGMENT_TILES:
+            expression = TILE_EXPRESSIONS[value]
+            cut_points[tile] = []
+            for bound in bounds:
+                cursor.execute(TILE_VALUE_QUERY.format(expression=expression), (bound - 1,))
+                boundary = cursor.fetchone()[0]
+                cursor.execute(TILE_BELOW_QUERY.format(expression=expression), (boundary,))
+                cut_points[tile].append((float(boundary), bound - cursor.fetchone()[0]))
+    finally:
+        cursor.close()
+    return cut_points
+
+
+def db_customers(conn, chunk_rows):
+    last_customer_id = ""
+    while True:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CUSTOMER_CHUNK_QUERY, (last_customer_id, chunk_rows))
+            chunk = pd.DataFrame(cursor.fetchall(), columns=cursor.column_names)
+        finally:
+            cursor.close()
+        if chunk.empty:
+            return
+        yield chunk
+        last_customer_id = chunk["customer_id"].iloc[-1]
+
+
+SNAPSHOT_COLUMNS = ["customer_id", "gender", "age", "invoice_date", "quantity", "price"]
+
+
+def aggregate_customers(table):
+    # Per-customer aggregates of invoice rows in Arrow, matching CUSTOMER_CHUNK_QUERY's columns
+    table = table.append_column("revenue", pc.multiply(table["price"], table["quantity"]))
+    grouped = table.group_by("customer_id").aggregate([
+        ("gender", "max"), ("age", "max"), ("invoice_date", "max"),
+        ("quantity", "sum"), ("quantity", "count"), ("revenue", "sum"),
+    ]).to_pandas()
+
+    last_invoice = pd.to_datetime(grouped["invoice_date_max"])
+    total_orders = grouped["quantity_sum"]
+    revenue = grouped["revenue_sum"].round(2)
+    return pd.DataFrame({
+        "customer_id": grouped["customer_id"],
+        "gender": grouped["gender_max"],
+        "age": grouped["age_max"],
+        "last_date_order": (pd.Timestamp("2024-01-01") - last_invoice).dt.days,
+        "total_orders": total_orders,
+        "revenue": revenue,
+        "quantity": total_orders / grouped["quantity_count"],
+        "price": revenue / total_orders.where(total_orders != 0),
+    })
+
+
+def spill_buckets(conn, spill_dir, chunk_rows):
+    # Stream the snapshot once and append its invoice rows to one Parquet file per customer hash bucket,
+    # so that every customer's invoices land in one file of about chunk_rows rows
+    snapshot.ensure_fresh(conn)
+    n_buckets = max(1, math.ceil(snapshot.row_count() / chunk_rows))
+    writers = {}
+    try:
+        for frame in snapshot.iter_frames(conn, SNAPSHOT_COLUMNS, chunk_rows):
+            frame = frame.assign(gender=frame["gender"].astype(str))
+            buckets = pd.util.hash_pandas_object(frame["customer_id"], index=False).to_numpy() % n_buckets
+            for bucket in np.unique(buckets):
+                part = pa.Table.from_pandas(frame[buckets == bucket], preserve_index=False)
+                if bucket not in writers:
+                    writers[bucket] = pq.ParquetWriter(os.path.join(spill_dir, f"{bucket}.parquet"), part.schema)
+                writers[bucket].write_table(part.cast(writers[bucket].schema))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return [os.path.join(spill_dir, f"{bucket}.parquet") for bucket in sorted(writers)]
+
+
+def snapshot_customers(conn, chunk_rows, spill_dir):
+    # (cut points, chunks of per-customer aggregates). Memory holds one bucket of invoices at a time,
+    # plus the three values per customer the NTILE cut points are taken from.
+    paths = spill_buckets(conn, spill_dir, chunk_rows)
+    values = {value: [] for value, _ in SEGMENT_TILES}
+    for path in paths:
+        customers = aggregate_customers(pq.read_table(path))
+        for value in values:
+            values[value].append(customers[value].to_numpy(dtype=float))
+    cut_points = local_cut_points({value: np.concatenate(parts) if parts else np.empty(0)
+                                   for value, parts in values.items()})
+
+    def chunks():
+        for path in paths:
+            customers = aggregate_customers(pq.read_table(path))
+            for i in range(0, len(customers), chunk_rows):
+                yield customers.iloc[i:i + chunk_rows]
+
+    return cut_points, chunks()
+
+
+def local_cut_points(values):
+    # values: {value column: every customer's values}, as a frame or a dict of arrays
+    cut_points = {}
+    for value, tile in SEGMENT_TILES:
+        column = np.sort(np.asarray(values[value], dtype=float))
+        cut_points[tile] = [(column[bound - 1], bound - int(np.searchsorted(column, column[bound - 1], side="left")))
+                            for bound in tile_bounds(len(column))]
+    return cut_points
+
+
+class StreamTiles:
+    # NTILE(3) for customers scored one chunk at a time. cut_points holds (boundary value, customers with
+    # that value in the tiles up to the boundary) per boundary: a value above a boundary is in a higher
+    # tile, and customers equal to it fill the lower tile up to that count in the order they arrive.
+    def __init__(self, cut_points):
+        self.cut_points = cut_points
+        self.seen = {}
+
+    def assign(self, values):
+        values = np.asarray(values, dtype=float)
+        tiles = np.ones(len(values), dtype=int)
+        for boundary, _ in self.cut_points:
+            tiles += values > boundary
+        for tied in {boundary for boundary, _ in self.cut_points}:
+            positions = np.flatnonzero(values == tied)
+            arrivals = self.seen.get(tied, 0) + np.arange(len(positions))
+            self.seen[tied] = self.seen.get(tied, 0) + len(positions)
+            for boundary, lower in self.cut_points:
+                if boundary == tied:
+                    tiles[positions] += arrivals >= lower
+        return tiles
+
+
+def score_chunk(chunk, tilers, category):
+    tiles = {tile: tilers[tile].assign(chunk[value].astype(float).to_numpy()) for value, tile in SEGMENT_TILES}
+    r, f, m = tiles["rfm_recency"], tiles["rfm_frequency"], tiles["rfm_monetary"]
+    segments = np.asarray(SEGMENT_OPTIONS)[SEGMENT_LOOKUP[r - 1, f - 1, m - 1]]
+
+    features = pd.DataFrame({
+        "gender": chunk["gender"].to_numpy(),
+        "age": chunk["age"].astype(float).to_numpy(),
+        "quantity": chunk["quantity"].astype(float).fillna(0.0).to_numpy(),
+        "price": chunk["price"].astype(float).fillna(0.0).to_numpy(),
+    })
+    category["preprocessor"].transform(features, dropna=False)
+    predicted = category["model"].predict(features[CATEGORY_FEATURES])
+
+    return pd.DataFrame({"customer_id": chunk["customer_id"].to_numpy(),
+                         "rfm_segment": segments, "predicted_category": predicted})
+
+
+class TableWriter:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def write(self, scores):
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(UPSERT_SCORES, list(scores.itertuples(index=False, name=None)))
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+    def close(self):
+        pass
+
+
+class FileWriter:
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._first_chunk = True
+
+    def write(self, scores):
+        if self.path.endswith(".parquet"):
+            table = pa.Table.from_pandas(scores, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            scores.to_csv(self.path, mode="w" if self._first_chunk else "a", header=self._first_chunk, index=False)
+        self._first_chunk = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_customers(conn, source="db", output="table", chunk_rows=CHUNK_ROWS):
+    # Library entry point; returns rows scored, elapsed seconds and throughput
+    start = time.perf_counter()
+    category = category_tree(conn)
+
+    if source not in ("db", "snapshot"):
+        raise ValueError(f"Unknown source: {source!r} (expected 'db' or 'snapshot')")
+
+    writer = TableWriter(conn) if output == "table" else FileWriter(output)
+    rows = 0
+    with tempfile.TemporaryDirectory(prefix="batch_score_") as spill_dir:
+        if source == "db":
+            cut_points = db_cut_points(conn)
+            chunks = db_customers(conn, chunk_rows)
+        else:
+            cut_points, chunks = snapshot_customers(conn, chunk_rows, spill_dir)
+        tilers = {tile: StreamTiles(cut_points[tile]) for _, tile in SEGMENT_TILES}
+        try:
+            for chunk in chunks:
+                writer.write(score_chunk(chunk, tilers, category))
+                rows += len(chunk)
+        finally:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else 0.0,
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["db", "snapshot"], default="db")
+    parser.add_argument("--output", default="table",
+                        help="'table' for customer_scores, or a .csv/.parquet file path")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    with borrow_connection() as conn:
+        ensure_schema(conn)
+        stats = score_customers(conn, args.source, args.output, args.chunk_rows)
+    print(f"Scored {stats['rows']:,} customers in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} rows/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
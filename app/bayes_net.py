@@ -0,0 +1,165 @@
+"""Bayesian network over customer purchases, for what-if queries.
+
+The structure is declared in PURCHASE_NETWORK. Every CPD is a maximum-likelihood estimate counted
+from one GROUP BY over customer_data, and the network is compiled into its joint table once per
+data version. A conditional query is then a slice and a sum over a few hundred cells.
+The fitted network can be exported as BIF (e.g. for pgmpy's BIFReader in the notebooks):
+
+    cd app
+    python bayes_net.py --bif purchase_network.bif
+"""
+import argparse
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from database import borrow_connection, data_fingerprint
+from model_registry import get_or_fit
+from validation import CATEGORIES, GENDERS, PAYMENT_METHODS
+
+
+# (label, upper bound exclusive) per age band; the last band is open-ended
+AGE_BANDS = [("Under 30", 30), ("30-39", 40), ("40-49", 50), ("50-59", 60), ("60+", None)]
+# Same threshold on an invoice's price as the high-value purchase experiment
+HIGH_VALUE_PRICE = 5000
+
+# variable -> (states, parents), in an order where parents come first
+PURCHASE_NETWORK = {
+    "age_band": ([label for label, _ in AGE_BANDS], []),
+    "gender": (GENDERS, []),
+    "payment_method": (PAYMENT_METHODS, ["age_band"]),
+    "category": (CATEGORIES, ["age_band", "gender"]),
+    "purchase_value": (["low", "high"], ["category", "payment_method"]),
+}
+
+# Conditional tables compiled up front for the What-If panel: (target, evidence variables)
+COMMON_QUERIES = [
+    ("category", ("age_band", "gender", "payment_method")),
+    ("purchase_value", ("age_band", "gender", "payment_method")),
+]
+
+AGE_BAND_SQL = "CASE " + " ".join(
+    f"WHEN age < {upper} THEN '{label}'" for label, upper in AGE_BANDS if upper is not None
+) + f" ELSE '{AGE_BANDS[-1][0]}' END"
+
+JOINT_COUNTS_QUERY = f"""
+    SELECT {AGE_BAND_SQL} AS age_band, gender, payment_method, category,
+           CASE WHEN price > {HIGH_VALUE_PRICE} THEN 'high' ELSE 'low' END AS purchase_value,
+           COUNT(*) AS row_count
+    FROM customer_data
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def count_joint(conn, network=PURCHASE_NETWORK):
+    # Counts over every combination of the network's states; rows with states outside the network are dropped
+    cursor = conn.cursor()
+    try:
+        cursor.execute(JOINT_COUNTS_QUERY)
+        df = pd.DataFrame(cursor.fetchall(), columns=cursor.column_names)
+    finally:
+        cursor.close()
+
+    counts = np.zeros([len(states) for states, _ in network.values()])
+    codes = [pd.Categorical(df[name], categories=states).codes for name, (states, _) in network.items()]
+    known = np.all([code >= 0 for code in codes], axis=0) if len(df) else np.zeros(0, dtype=bool)
+    np.add.at(counts, tuple(code[known] for code in codes), df["row_count"].to_numpy(dtype=float)[known])
+    return counts
+
+
+class CompiledNetwork:
+    # CPDs estimated from joint counts and multiplied out into the network's joint distribution.
+    # Conditional tables are memoized per (target, evidence variables).
+    def __init__(self, counts, network=PURCHASE_NETWORK):
+        self.network = network
+        self.variables = list(network)
+        self.cpds = {}
+        joint = np.ones(counts.shape)
+        for axis, (name, (states, parents)) in enumerate(network.items()):
+            # P(variable | parents): counts marginalized onto (parents..., variable), normalized over the
+            # variable; parent combinations never seen in the data get a uniform distribution
+            keep = [self.variables.index(parent) for parent in parents] + [axis]
+            drop = tuple(i for i in range(counts.ndim) if i not in keep)
+            marginal = np.moveaxis(counts.sum(axis=drop, keepdims=True), keep,
+                                   range(counts.ndim - len(keep), counts.ndim))
+            totals = marginal.sum(axis=-1, keepdims=True)
+            cpd = np.divide(marginal, totals, out=np.full(marginal.shape, 1.0 / len(states)), where=totals > 0)
+            self.cpds[name] = cpd.reshape([counts.shape[i] for i in keep])
+            joint = joint * np.moveaxis(cpd, range(counts.ndim - len(keep), counts.ndim), keep)
+        self.joint = joint
+        self.rows = int(counts.sum())
+        self._tables = {}
+        for target, evidence in COMMON_QUERIES:
+            self.table(target, evidence)
+
+    def table(self, target, evidence):
+        # P(target | evidence variables) with axes (evidence..., target)
+        key = (target, tuple(evidence))
+        if key not in self._tables:
+            axes = [self.variables.index(name) for name in key[1]] + [self.variables.index(target)]
+            drop = tuple(i for i in range(self.joint.ndim) if i not in axes)
+            marginal = np.moveaxis(self.joint.sum(axis=drop, keepdims=True), axes,
+                                   range(self.joint.ndim - len(axes), self.joint.ndim))
+            marginal = marginal.reshape([self.joint.shape[i] for i in axes])
+            totals = marginal.sum(axis=-1, keepdims=True)
+            self._tables[key] = np.divide(marginal, totals, out=np.zeros(marginal.shape), where=totals > 0)
+        return self._tables[key]
+
+    def query(self, target, evidence=None):
+        # P(target | evidence) as a Series over the target's states; evidence is {variable: state}
+        evidence = {name: state for name, state in (evidence or {}).items() if state is not None}
+        for name in [target, *evidence]:
+            if name not in self.network:
+                raise ValueError(f"Unknown variable: {name} (expected one of: {', '.join(self.variables)})")
+        for name, state in evidence.items():
+            if state not in self.network[name][0]:
+                raise ValueError(f"{name} should be one of: {', '.join(self.network[name][0])}.")
+        names = tuple(name for name in self.variables if name in evidence)
+        position = tuple(self.network[name][0].index(evidence[name]) for name in names)
+        return pd.Series(self.table(target, names)[position], index=self.network[target][0], name=target)
+
+
+def purchase_network(conn):
+    # Counted and compiled once per data version, and persisted by the model registry
+    structure = {name: parents for name, (_, parents) in PURCHASE_NETWORK.items()}
+    return get_or_fit("bayes_net", structure, list(PURCHASE_NETWORK), data_fingerprint(conn),
+                      lambda: CompiledNetwork(count_joint(conn)))
+
+
+def write_bif(network, path):
+    # BIF names are identifiers: "Food & Beverage" is written as Food_Beverage, "60+" as 60
+    def state_list(states):
+        return ", ".join(re.sub(r"\W+", "_", str(state)).strip("_") for state in states)
+
+    lines = ["network purchase_network {", "}"]
+    for name, (states, _) in network.network.items():
+        lines += [f"variable {name} {{", f"  type discrete [ {len(states)} ] {{ {state_list(states)} }};", "}"]
+    for name, (states, parents) in network.network.items():
+        cpd = network.cpds[name]
+        if not parents:
+            lines += [f"probability ( {name} ) {{", f"  table {', '.join(f'{p:.6f}' for p in cpd)};", "}"]
+            continue
+        lines.append(f"probability ( {name} | {', '.join(parents)} ) {{")
+        for position in np.ndindex(*cpd.shape[:-1]):
+            parent_states = state_list(network.network[parent][0][i] for parent, i in zip(parents, position))
+            lines.append(f"  ({parent_states}) {', '.join(f'{p:.6f}' for p in cpd[position])};")
+        lines.append("}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bif", required=True, help="write the fitted network to this BIF file")
+    args = parser.parse_args(argv)
+    with borrow_connection() as conn:
+        network = purchase_network(conn)
+    write_bif(network, args.bif)
+    print(f"Wrote {args.bif} ({network.rows:,} rows counted)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Compile time and what-if query latency of the purchase Bayesian network.
+
+Counts synthetic rows (benchmarks/generate.py) the way JOINT_COUNTS_QUERY does, compiles the network,
+and times every What-If panel query (each combination of evidence, "Any" included) on the compiled
+tables against the same queries summed from the joint each time. Results are JSON lines; the exit
+status is 1 when the slowest compiled query is over the budget.
+
+    cd app
+    python -m benchmarks.bayes_net_benchmark
+    python -m benchmarks.bayes_net_benchmark --rows 1000000 --budget-ms 10
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from bayes_net import AGE_BANDS, HIGH_VALUE_PRICE, PURCHASE_NETWORK, CompiledNetwork
+from benchmarks.generate import generate_chunks
+
+
+EVIDENCE_VARIABLES = ["age_band", "gender", "payment_method"]
+
+
+def synthetic_counts(rows, seed):
+    counts = np.zeros([len(states) for states, _ in PURCHASE_NETWORK.values()])
+    bounds = [upper for _, upper in AGE_BANDS if upper is not None]
+    for chunk in generate_chunks(rows, seed=seed):
+        chunk["age_band"] = np.searchsorted(bounds, chunk["age"], side="right")
+        chunk["purchase_value"] = np.where(chunk["price"] > HIGH_VALUE_PRICE, "high", "low")
+        codes = [chunk["age_band"].to_numpy()] + [
+            pd.Categorical(chunk[name], categories=states).codes
+            for name, (states, _) in list(PURCHASE_NETWORK.items())[1:]
+        ]
+        np.add.at(counts, tuple(codes), 1)
+    return counts
+
+
+def all_evidence():
+    options = [[None] + list(PURCHASE_NETWORK[name][0]) for name in EVIDENCE_VARIABLES]
+    return [dict(zip(EVIDENCE_VARIABLES, states)) for states in itertools.product(*options)]
+
+
+def time_queries(network, evidences, fresh_tables):
+    seconds = []
+    for evidence in evidences:
+        for target in ("category", "purchase_value"):
+            if fresh_tables:
+                network._tables.clear()
+            start = time.perf_counter()
+            network.query(target, evidence)
+            seconds.append(time.perf_counter() - start)
+    seconds = np.array(seconds) * 1000
+    return {"queries": len(seconds), "median_ms": float(np.median(seconds)),
+            "p99_ms": float(np.percentile(seconds, 99)), "max_ms": float(seconds.max())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="per-query budget in milliseconds")
+    args = parser.parse_args(argv)
+
+    counts = synthetic_counts(args.rows, args.seed)
+    start = time.perf_counter()
+    network = CompiledNetwork(counts)
+    print(json.dumps({"benchmark": "bayes_net_compile", "rows": args.rows, "cells": int(network.joint.size),
+                      "seconds": time.perf_counter() - start}))
+
+    evidences = all_evidence()
+    uncompiled = time_queries(network, evidences, fresh_tables=True)
+    print(json.dumps(dict(uncompiled, benchmark="bayes_net_query", tables="summed per query")))
+    compiled = time_queries(network, evidences, fresh_tables=False)
+    print(json.dumps(dict(compiled, benchmark="bayes_net_query", tables="compiled",
+                          budget_ms=args.budget_ms, within_budget=compiled["max_ms"] <= args.budget_ms)))
+    return 0 if compiled["max_ms"] <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Compare the clustering engine against full KMeans on synthetic data.
+
+    cd app
+    python -m benchmarks.clustering_benchmark                 # 1M rows
+    python -m benchmarks.clustering_benchmark --rows 5000000
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from clustering import MINIBATCH_CHUNK_ROWS, kmeans_1d, streaming_kmeans
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--clusters", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    results = []
+
+    # Age Group: 1-D ages, as on the "Sales Analysis: Age Group" page
+    ages = rng.integers(18, 70, size=args.rows).astype(float)
+    seconds, model = timed(lambda: KMeans(n_clusters=args.clusters, random_state=42).fit(ages.reshape(-1, 1)))
+    results.append({"benchmark": "age_kmeans_full", "rows": args.rows, "seconds": seconds,
+                    "inertia": float(model.inertia_)})
+    seconds, (_, _, inertia) = timed(lambda: kmeans_1d(ages, args.clusters))
+    results.append({"benchmark": "age_kmeans_1d_exact", "rows": args.rows, "seconds": seconds, "inertia": inertia})
+
+    # Top Customers: standardized (total_orders, revenue, last_date_order, rfm_score)-like features
+    X = rng.normal(size=(args.rows, 4))
+    X[: args.rows // 3] += 3.0
+    seconds, model = timed(lambda: KMeans(n_clusters=args.clusters, random_state=42).fit(X))
+    results.append({"benchmark": "features_kmeans_full", "rows": args.rows, "seconds": seconds,
+                    "inertia": float(model.inertia_)})
+
+    def minibatch():
+        chunks = (X[i:i + MINIBATCH_CHUNK_ROWS] for i in range(0, len(X), MINIBATCH_CHUNK_ROWS))
+        model = streaming_kmeans(chunks, args.clusters)
+        labels = model.predict(X)
+        return float(np.sum((X - model.cluster_centers_[labels]) ** 2))
+
+    seconds, inertia = timed(minibatch)
+    results.append({"benchmark": "features_minibatch", "rows": args.rows, "seconds": seconds,
+                    "inertia": inertia})
+
+    for result in results:
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""End-to-end timings for every dashboard section on synthetic customer_data.
+
+Loads generated rows into a scratch MySQL/MariaDB database (DB_HOST/DB_USER/... from the environment,
+with the database named by --database), then times each section's data path as the page runs it,
+without Streamlit: cold (caches emptied) and warm. Results are JSON lines.
+
+    cd app
+    python -m benchmarks.dashboard_benchmark --database dashboard_bench --rows 100000
+    python -m benchmarks.dashboard_benchmark --database dashboard_bench --rows 10000000 --repeat 5
+    python -m benchmarks.dashboard_benchmark --database dashboard_bench --reuse   # keep the loaded rows
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+
+LOAD_BATCH_ROWS = 10_000
+
+CUSTOMER_DATA_DDL = """
+    CREATE TABLE IF NOT EXISTS customer_data (
+        invoice_number VARCHAR(64) NOT NULL PRIMARY KEY,
+        customer_id VARCHAR(64) NOT NULL,
+        gender VARCHAR(16),
+        age INT,
+        category VARCHAR(64),
+        quantity INT,
+        price DECIMAL(10, 2),
+        payment_method VARCHAR(32),
+        invoice_date DATE,
+        shopping_mall VARCHAR(64)
+    )
+"""
+
+
+def load(conn, rows, seed):
+    # Raw multi-row inserts, then every derived table rebuilt in bulk (migrations create them if missing)
+    from benchmarks.generate import generate_chunks
+    from data_view import CUSTOMER_COLUMNS
+    from ingest import INSERT_ROWS
+    from migrate import apply_migrations
+    from rfm import rebuild_aggregates
+    from summaries import refresh_summaries
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CUSTOMER_DATA_DDL)
+        # TRUNCATE does not fire the delete trigger, so no tombstones are written for the old rows
+        cursor.execute("TRUNCATE TABLE customer_data")
+        conn.commit()
+        for chunk in generate_chunks(rows, seed=seed):
+            chunk["invoice_date"] = chunk["invoice_date"].dt.date
+            records = list(chunk[CUSTOMER_COLUMNS].astype(object).itertuples(index=False, name=None))
+            for offset in range(0, len(records), LOAD_BATCH_ROWS):
+                cursor.executemany(INSERT_ROWS, records[offset:offset + LOAD_BATCH_ROWS])
+            conn.commit()
+    finally:
+        cursor.close()
+    apply_migrations(conn)
+    rebuild_aggregates(conn)
+    refresh_summaries(conn)
+
+
+def reset_caches():
+    # Everything a first visit to a freshly started app would find empty
+    import clustering
+    import forecasting
+    import lookalikes
+    import model_registry
+    import query_cache
+    import rfm
+    import snapshot
+
+    query_cache.clear()
+    rfm._cache.clear()
+    clustering._sweeps.clear()
+    model_registry._models.clear()
+    forecasting._forecasts.clear()
+    forecasting._state = None
+    lookalikes._cache.clear()
+    shutil.rmtree(model_registry.MODEL_DIR, ignore_errors=True)
+    snapshot._frames.clear()
+    snapshot._last_sync.update(fingerprint=None, time=0.0)
+    shutil.rmtree(snapshot.SNAPSHOT_DIR, ignore_errors=True)
+
+
+def sections(conn):
+    # name -> callable running that section's data path, through the same analytics calls as the pages
+    import analytics
+    import summaries
+    from data_view import CUSTOMER_COLUMNS, estimate_row_count, fetch_page
+    from rfm import SEGMENT_OPTIONS, get_rfm_table
+
+    def view_data():
+        df, last_key, _ = fetch_page(conn, CUSTOMER_COLUMNS, {}, page_size=50)
+        fetch_page(conn, CUSTOMER_COLUMNS, {}, after=last_key, page_size=50)
+        fetch_page(conn, CUSTOMER_COLUMNS, {"category": "Books", "gender": "Female"}, page_size=50)
+        estimate_row_count(conn, {})
+        estimate_row_count(conn, {"category": "Books", "gender": "Female"})
+
+    def visualization(query):
+        return lambda: summaries.read_summary(conn, query)
+
+    def rfm_segmentation():
+        table = get_rfm_table(conn)
+        table.segment_counts()
+        analytics.segment_tree(conn)
+        table.customers_in_segment(SEGMENT_OPTIONS[-1])
+
+    def top_customers():
+        analytics.cluster_top_customers(get_rfm_table(conn), 10)
+
+    def age_group():
+        analytics.age_group_report(conn)
+
+    def customer_segmentation():
+        analytics.predict_category(analytics.category_tree(conn), "Female", 30, 2, 100.0)
+
+    def sales_forecast():
+        analytics.forecast_sales(conn)
+
+    def similar_customers():
+        customer_ids = get_rfm_table(conn).top_customers(10)["customer_id"]
+        analytics.similar_customers(conn, customer_ids[:1], 10)
+        analytics.similar_customers(conn, customer_ids, 10)
+
+    def what_if():
+        network = analytics.purchase_network(conn)
+        network.query("category", {"age_band": "Under 30", "gender": "Female", "payment_method": "Cash"})
+        network.query("purchase_value", {"age_band": "Under 30", "gender": "Female", "payment_method": "Cash"})
+
+    return {
+        "view_data": view_data,
+        "visualizations.category_revenue": visualization(summaries.CATEGORY_REVENUE_QUERY),
+        "visualizations.age_distribution": visualization(summaries.AGE_COUNTS_QUERY),
+        "visualizations.sales_trend": visualization(summaries.DAILY_SALES_QUERY),
+        "visualizations.payment_methods": visualization(summaries.PAYMENT_COUNTS_QUERY),
+        "rfm_segmentation": rfm_segmentation,
+        "top_customers": top_customers,
+        "age_group": age_group,
+        "customer_segmentation": customer_segmentation,
+        "sales_forecast": sales_forecast,
+        "similar_customers": similar_customers,
+        "what_if": what_if,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", required=True, help="scratch database; customer_data in it is replaced")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per section")
+    parser.add_argument("--reuse", action="store_true", help="benchmark the rows already loaded")
+    parser.add_argument("--sections", nargs="+", help="only these sections")
+    args = parser.parse_args(argv)
+
+    # Point the app at the scratch database and at throwaway snapshot and model directories
+    load_dotenv()
+    os.environ["DB_NAME"] = args.database
+    work_dir = tempfile.mkdtemp(prefix="dashboard_bench_")
+    os.environ["SNAPSHOT_DIR"] = os.path.join(work_dir, "snapshot")
+    os.environ["MODEL_DIR"] = os.path.join(work_dir, "models")
+
+    from database import borrow_connection
+
+    try:
+        with borrow_connection() as conn:
+            if not args.reuse:
+                start = time.perf_counter()
+                load(conn, args.rows, args.seed)
+                print(json.dumps({"benchmark": "load", "rows": args.rows, "seconds": time.perf_counter() - start}))
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM customer_data")
+            rows = cursor.fetchone()[0]
+            cursor.close()
+
+            meta = {"rows": rows, "python": platform.python_version(), "machine": platform.machine()}
+            for name, run in sections(conn).items():
+                if args.sections and name not in args.sections:
+                    continue
+                reset_caches()
+                start = time.perf_counter()
+                run()
+                cold = time.perf_counter() - start
+                warm = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    run()
+                    warm.append(time.perf_counter() - start)
+                print(json.dumps(dict(meta, benchmark="section", section=name, cold_seconds=cold,
+                                      warm_seconds=min(warm) if warm else None)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Wall time to forecast every category x shopping mall series, against the forecast budget.
+
+Builds the monthly sales summary from synthetic rows (benchmarks/generate.py), then times three runs the
+way the dashboard meets them: a cold start (full order search), the same data again (stored parameters
+reused), and one more month of invoices (stored orders refitted from their parameters). Orders and
+parameters are kept in a throwaway MODEL_DIR. Results are JSON lines; the exit status is 1 when a run
+is over budget.
+
+    cd app
+    python -m benchmarks.forecast_benchmark
+    python -m benchmarks.forecast_benchmark --rows 1000000 --budget 30 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.generate import generate_chunks
+
+
+def monthly_sales(rows, seed):
+    # Same rows as SELECT ... FROM agg_monthly_sales
+    parts = []
+    for chunk in generate_chunks(rows, seed=seed):
+        chunk["sales_month"] = chunk["invoice_date"].dt.to_period("M").dt.to_timestamp()
+        chunk["total_sales"] = chunk["price"] * chunk["quantity"]
+        parts.append(chunk.groupby(["sales_month", "category", "shopping_mall"])["total_sales"].sum())
+    return pd.concat(parts).groupby(level=[0, 1, 2]).sum().reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--horizon", type=int, default=3, help="months to forecast")
+    parser.add_argument("--budget", type=float, help="seconds (default: FORECAST_BUDGET_SECONDS)")
+    parser.add_argument("--workers", type=int, help="processes (default: FORECAST_WORKERS)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="forecast_bench_")
+    os.environ["MODEL_DIR"] = work_dir
+    import forecasting
+
+    budget = args.budget if args.budget is not None else forecasting.FORECAST_BUDGET_SECONDS
+    workers = args.workers if args.workers is not None else forecasting.FORECAST_WORKERS
+    history = monthly_sales(args.rows, args.seed)
+    last_month = history["sales_month"].max()
+
+    # The last month arrives as "new invoices" for the third run
+    runs = [
+        ("cold", history[history["sales_month"] < last_month]),
+        ("unchanged", history[history["sales_month"] < last_month]),
+        ("new_month", history),
+    ]
+    over_budget = False
+    try:
+        for name, data in runs:
+            series = forecasting.monthly_series(data)
+            result = forecasting.forecast_series(series, args.horizon, budget, workers)
+            over_budget |= result["seconds"] > budget
+            print(json.dumps({
+                "benchmark": "forecast", "run": name, "rows": args.rows, "series": len(series),
+                "months": len(next(iter(series.values()))), "workers": workers, "seconds": result["seconds"],
+                "budget_seconds": budget, "within_budget": result["seconds"] <= budget,
+                "modes": result["fits"]["mode"].value_counts().to_dict(),
+                "fit_seconds_max": float(result["fits"]["seconds"].max()),
+            }))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
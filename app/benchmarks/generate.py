@@ -0,0 +1,90 @@
+"""Synthetic customer_data rows with the same column domains as the public dataset.
+
+    cd app
+    python -m benchmarks.generate --rows 1000000 --output customer_data.parquet
+    python -m benchmarks.generate --rows 100000 --output customer_data.csv   # loadable with ingest.py
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from validation import CATEGORIES, GENDERS, PAYMENT_METHODS, SHOPPING_MALLS
+
+
+CHUNK_ROWS = 500_000
+
+# Unit prices per category in the public dataset; an invoice's price is unit price times quantity
+UNIT_PRICES = {"Books": 15.15, "Clothing": 300.08, "Cosmetics": 40.66, "Food & Beverage": 5.23,
+               "Shoes": 600.17, "Souvenir": 11.73, "Technology": 1050.0, "Toys": 35.84}
+CATEGORY_SHARES = [0.05, 0.35, 0.15, 0.15, 0.10, 0.05, 0.05, 0.10]
+GENDER_SHARES = [0.4, 0.6]
+PAYMENT_SHARES = [0.45, 0.35, 0.20]
+FIRST_DATE = np.datetime64("2021-01-01")
+DATE_SPAN_DAYS = 796  # through 2023-03-08
+AGE_RANGE = (18, 70)
+INVOICES_PER_CUSTOMER = 3
+
+
+def gender_index(customer):
+    # Index into GENDERS in GENDER_SHARES proportions, from a hash of the customer number
+    return np.searchsorted(np.cumsum(GENDER_SHARES), customer * 2654435761 % 1000 / 1000, side="right")
+
+
+def generate_chunks(rows, chunk_rows=CHUNK_ROWS, seed=42):
+    # Deterministic for a given (rows, seed) whatever the chunk size: chunk i is seeded by its first row
+    customers = max(rows // INVOICES_PER_CUSTOMER, 1)
+    unit_prices = np.array([UNIT_PRICES[category] for category in CATEGORIES])
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        rng = np.random.default_rng([seed, start])
+        category = rng.choice(len(CATEGORIES), n, p=CATEGORY_SHARES)
+        quantity = rng.integers(1, 6, n)
+        customer = rng.integers(0, customers, n)
+        yield pd.DataFrame({
+            "invoice_number": np.char.add("I", np.arange(start, start + n).astype(str)),
+            "customer_id": np.char.add("C", customer.astype(str)),
+            # A customer keeps one gender and age across their invoices
+            "gender": np.asarray(GENDERS)[gender_index(customer)],
+            "age": AGE_RANGE[0] + customer * 40503 % (AGE_RANGE[1] - AGE_RANGE[0]),
+            "category": np.asarray(CATEGORIES)[category],
+            "quantity": quantity,
+            "price": np.round(unit_prices[category] * quantity, 2),
+            "payment_method": rng.choice(PAYMENT_METHODS, n, p=PAYMENT_SHARES),
+            "invoice_date": FIRST_DATE + rng.integers(0, DATE_SPAN_DAYS, n).astype("timedelta64[D]"),
+            "shopping_mall": rng.choice(SHOPPING_MALLS, n),
+        })
+
+
+def write_file(path, rows, chunk_rows=CHUNK_ROWS, seed=42):
+    writer = None
+    try:
+        for i, chunk in enumerate(generate_chunks(rows, chunk_rows, seed)):
+            if path.endswith(".parquet"):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", required=True, help=".csv or .parquet path")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    write_file(args.output, args.rows, seed=args.seed)
+    print(f"Wrote {args.rows:,} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
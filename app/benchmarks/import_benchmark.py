@@ -0,0 +1,123 @@
+"""Import cost of starting the dashboard, measured in fresh interpreters.
+
+Reads the module-level imports of streamlit_app.py (what every session and rerun pays before the page
+can render) and the imports deferred to individual sections, including the modules behind the lazy
+`analytics` names. Reports the startup wall time against a budget, a `-X importtime` breakdown by
+module and by package, and what each deferred import adds the first time its section opens.
+Results are JSON lines; the exit status is 1 when startup is over budget.
+
+    cd app
+    python -m benchmarks.import_benchmark
+    python -m benchmarks.import_benchmark --budget 0.5 --repeat 10
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+import analytics
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(APP_DIR, "streamlit_app.py")
+STARTUP_BUDGET_SECONDS = 1.0
+TOP_PACKAGES = 10
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+MARKER = "-- measured imports --"
+
+
+def script_imports(path=APP_SCRIPT):
+    # (imports at module level, imports nested in the script's branches), in file order
+    with open(path) as f:
+        tree = ast.parse(f.read())
+
+    def names(node):
+        if isinstance(node, ast.Import):
+            return [alias.name for alias in node.names]
+        if isinstance(node, ast.ImportFrom) and node.level == 0:
+            return [node.module]
+        return []
+
+    startup = [name for node in tree.body for name in names(node)]
+    deferred = [name for node in ast.walk(tree) for name in names(node) if name not in startup]
+    return list(dict.fromkeys(startup)), list(dict.fromkeys(deferred))
+
+
+def _program(preload, modules):
+    # Imports `preload` unmeasured, then `modules`; prints the seconds spent on `modules` and any that
+    # failed to import. The marker separates the two phases in the -X importtime output.
+    return "\n".join([
+        "import json, os, sys, time",
+        f"for name in {preload!r}:",
+        "    try: __import__(name)",
+        "    except ImportError: pass",
+        f"os.write(2, b{MARKER!r} + b'\\n')",
+        "missing = []",
+        "start = time.perf_counter()",
+        f"for name in {modules!r}:",
+        "    try: __import__(name)",
+        "    except ImportError: missing.append(name)",
+        "print(json.dumps({'seconds': time.perf_counter() - start, 'missing': missing}))",
+    ])
+
+
+def measure(modules, preload=(), importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _program(list(preload), modules)]
+    result = subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True, check=True)
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    lines = result.stderr.split(MARKER, 1)[-1].splitlines()
+    # (self seconds, cumulative seconds, nesting depth, module) per module actually loaded, in load order
+    measured["profile"] = [
+        (int(match.group(1)) / 1e6, int(match.group(2)) / 1e6, len(match.group(3)) // 2, match.group(4))
+        for match in map(IMPORT_TIME_LINE.match, lines) if match
+    ]
+    return measured
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS, help="startup import budget in seconds")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per wall-time measurement")
+    args = parser.parse_args(argv)
+
+    startup, deferred = script_imports()
+    deferred += [name for name in sorted(set(analytics._EXPORTS.values())) if name not in startup + deferred]
+
+    def best_of(modules, preload=()):
+        runs = [measure(modules, preload) for _ in range(args.repeat)]
+        return min(run["seconds"] for run in runs), runs[0]["missing"]
+
+    seconds, missing = best_of(startup)
+    eager_seconds, _ = best_of(startup + deferred)
+    print(json.dumps({"benchmark": "startup_imports", "modules": startup, "missing": missing, "seconds": seconds,
+                      "budget_seconds": args.budget, "within_budget": seconds <= args.budget,
+                      "all_imports_at_startup_seconds": eager_seconds}))
+
+    # -X importtime breakdown: each startup module's own share (what it adds after the ones above it),
+    # then the packages where the time is actually spent
+    profile = measure(startup, importtime=True)["profile"]
+    for self_seconds, cumulative, depth, name in profile:
+        if depth == 0 and name in startup:
+            print(json.dumps({"benchmark": "startup_module", "module": name, "cumulative_seconds": cumulative}))
+    packages = {}
+    for self_seconds, _, _, name in profile:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_seconds
+    for package, self_seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP_PACKAGES]:
+        print(json.dumps({"benchmark": "startup_package", "package": package, "self_seconds": self_seconds}))
+
+    # What a section's deferred import costs the first time it runs in a session
+    for name in deferred:
+        seconds_deferred, missing_deferred = best_of([name], preload=startup)
+        print(json.dumps({"benchmark": "deferred_import", "module": name, "seconds": seconds_deferred,
+                          "missing": missing_deferred}))
+
+    return 0 if seconds <= args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Build and query times of the lookalike (similar customers) index, checked against brute force.
+
+Runs on synthetic per-customer aggregates, so no database is needed. Times the KD-tree build, single and
+batch k-NN queries, and the same queries after patching in changed, added and removed customers the way
+the Data Management forms do. Results are JSON lines.
+
+    cd app
+    python -m benchmarks.lookalike_benchmark
+    python -m benchmarks.lookalike_benchmark --customers 1000000 --changes 400
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from lookalikes import LookalikeIndex, feature_matrix
+from rfm import AGGREGATE_COLUMNS, RFMTable, score_rfm
+from validation import GENDERS
+
+
+def synthetic_customers(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": [f"C{i}" for i in range(n)],
+        "gender": rng.choice(GENDERS, n),
+        "age": rng.integers(18, 70, n),
+        "last_date_order": rng.integers(300, 1100, n),
+        "total_orders": rng.integers(1, 16, n),
+        "revenue": rng.gamma(1.5, 2_000, n).round(2),
+    })
+
+
+def recall(index, table, customer_ids, k):
+    # Share of the exact k nearest (brute force over the table as it is now) that the index returned
+    X = index.standardize(feature_matrix(table.df))
+    all_ids = table.df["customer_id"].to_numpy(dtype=object)
+    vectors = index.standardize(feature_matrix(table.df.loc[customer_ids]))
+    found, _ = index.query(vectors, k, exclude=customer_ids)
+    hits = 0
+    for customer_id, vector, returned in zip(customer_ids, vectors, found):
+        distances = np.linalg.norm(X - vector, axis=1)
+        distances[all_ids == customer_id] = np.inf
+        hits += len(set(all_ids[np.argsort(distances)[:k]]) & set(returned))
+    return hits / (k * len(customer_ids))
+
+
+def time_queries(index, table, customer_ids, k, repeat):
+    vectors = index.standardize(feature_matrix(table.df.loc[customer_ids]))
+    single = []
+    for customer_id, vector in zip(customer_ids[:repeat], vectors):
+        start = time.perf_counter()
+        index.query(vector, k, exclude=[customer_id])
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    index.query(vectors, k, exclude=customer_ids)
+    return {"single_median_ms": float(np.median(single)) * 1000, "single_p95_ms": float(np.percentile(single, 95)) * 1000,
+            "batch_size": len(customer_ids), "batch_ms": (time.perf_counter() - start) * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--neighbors", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1_000, help="customers per batch query")
+    parser.add_argument("--changes", type=int, default=200, help="customers patched in after the build")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    table = RFMTable(score_rfm(synthetic_customers(args.customers, args.seed)), 0)
+    k = args.neighbors
+
+    start = time.perf_counter()
+    index = LookalikeIndex(table.df)
+    index.version = 0
+    print(json.dumps({"benchmark": "lookalike_build", "customers": args.customers,
+                      "seconds": time.perf_counter() - start}))
+
+    customer_ids = list(rng.choice(table.df["customer_id"].to_numpy(dtype=object), args.batch, replace=False))
+    print(json.dumps(dict(time_queries(index, table, customer_ids, k, 200), benchmark="lookalike_query",
+                          state="built", recall=recall(index, table, customer_ids[:100], k))))
+
+    # A third each of changed, new and removed customers, one data version per write as the forms do
+    changed = rng.choice(table.df["customer_id"].to_numpy(dtype=object), args.changes, replace=False)
+    donors = table.df.sample(args.changes, random_state=args.seed)[AGGREGATE_COLUMNS].to_dict("records")
+    for version, (customer_id, donor) in enumerate(zip(changed, donors), start=1):
+        if version % 3 == 0:
+            table.apply_customer(customer_id, None, version)
+        else:
+            customer_id = customer_id if version % 3 == 1 else f"N{version}"
+            table.apply_customer(customer_id, dict(donor, customer_id=customer_id), version)
+    start = time.perf_counter()
+    patched = index.patched(table)
+    print(json.dumps({"benchmark": "lookalike_patch", "changes": args.changes, "pending": patched.pending(),
+                      "seconds": time.perf_counter() - start}))
+
+    customer_ids = [customer_id for customer_id in customer_ids if customer_id in table.df.index]
+    print(json.dumps(dict(time_queries(patched, table, customer_ids, k, 200), benchmark="lookalike_query",
+                          state="patched", recall=recall(patched, table, customer_ids[:100], k))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Benchmark for the local RFM scorer, with an optional parity check against the SQL backend.
+
+    cd app
+    python -m benchmarks.rfm_benchmark                      # local scorer at 100k, 1M and 10M customers
+    python -m benchmarks.rfm_benchmark --sizes 100000 --db  # also time both backends and check parity
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from rfm import load_rfm, rfm_mismatches, score_rfm
+
+
+def synthetic_aggregates(n, seed=42):
+    # Per-customer aggregates shaped like RFM_AGGREGATE_QUERY output (recency in days over 2021-2023)
+    rng = np.random.default_rng(seed)
+    total_orders = rng.integers(1, 6, size=n)
+    return pd.DataFrame({
+        "customer_id": np.char.add("C", np.arange(n).astype(str)),
+        "gender": rng.choice(["Male", "Female"], size=n),
+        "age": rng.integers(18, 70, size=n),
+        "last_date_order": rng.integers(1, 1095, size=n),
+        "total_orders": total_orders,
+        "revenue": np.round(total_orders * rng.uniform(5.0, 5250.0, size=n), 2),
+    })
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", action="store_true",
+                        help="time the sql and local backends on the configured database and check parity")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.sizes:
+        df = synthetic_aggregates(n)
+        seconds, _ = time_call(lambda: score_rfm(df), args.repeat)
+        results.append({"benchmark": "rfm_local_score", "rows": n, "seconds": seconds,
+                        "rows_per_second": n / seconds})
+
+    if args.db:
+        from database import borrow_connection
+
+        with borrow_connection() as conn:
+            sql_seconds, sql_df = time_call(lambda: load_rfm(conn, "sql"), args.repeat)
+            local_seconds, local_df = time_call(lambda: load_rfm(conn, "local"), args.repeat)
+        mismatches = rfm_mismatches(sql_df, local_df)
+        results.append({"benchmark": "rfm_sql_backend", "rows": len(sql_df), "seconds": sql_seconds})
+        results.append({"benchmark": "rfm_local_backend", "rows": len(local_df), "seconds": local_seconds})
+        results.append({"benchmark": "rfm_parity", "rows": len(sql_df), "mismatches": len(mismatches),
+                        "customers_missing": abs(len(sql_df) - len(local_df))})
+
+    for result in results:
+        print(json.dumps(result))
+
+    if args.db and (results[-1]["mismatches"] or results[-1]["customers_missing"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Rows per second through the customer_data validator.
+
+    cd app
+    python -m benchmarks.validation_benchmark                    # 1M rows, 5% invalid
+    python -m benchmarks.validation_benchmark --rows 200000 --invalid 0.2
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from validation import CATEGORIES, CUSTOMER_VALIDATOR, GENDERS, PAYMENT_METHODS, SHOPPING_MALLS
+
+
+def synthetic_rows(n, invalid_fraction, seed=42):
+    # Text columns as a CSV reader would produce them, with a share of rows broken in one field each
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 800, n), unit="D")
+    df = pd.DataFrame({
+        "invoice_number": [f"I{i}" for i in range(n)],
+        "customer_id": [f"C{i}" for i in rng.integers(0, n // 3 + 1, n)],
+        "gender": rng.choice(GENDERS, n),
+        "age": rng.integers(18, 70, n).astype(str),
+        "category": rng.choice(CATEGORIES, n),
+        "quantity": rng.integers(1, 6, n).astype(str),
+        "price": rng.uniform(5, 5000, n).round(2).astype(str),
+        "payment_method": rng.choice(PAYMENT_METHODS, n),
+        "invoice_date": dates.strftime("%d/%m/%Y"),
+        "shopping_mall": rng.choice(SHOPPING_MALLS, n),
+    })
+    broken = rng.random(n) < invalid_fraction
+    columns = rng.choice(["invoice_number", "age", "category", "invoice_date", "quantity"], n)
+    breakage = {"invoice_number": "I-1", "age": "", "category": "Garden", "invoice_date": "01/01/2999", "quantity": "0"}
+    for column, value in breakage.items():
+        df.loc[broken & (columns == column), column] = value
+    return df, int(broken.sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--invalid", type=float, default=0.05, help="fraction of rows with a broken field")
+    parser.add_argument("--records", type=int, default=2_000, help="rows to time through validate_record")
+    args = parser.parse_args(argv)
+
+    df, broken = synthetic_rows(args.rows, args.invalid)
+    results = []
+
+    start = time.perf_counter()
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(df)
+    seconds = time.perf_counter() - start
+    results.append({"benchmark": "validate_frame", "rows": args.rows, "seconds": seconds,
+                    "rows_per_second": args.rows / seconds, "rejected": len(rejected), "expected_rejected": broken})
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    start = time.perf_counter()
+    CUSTOMER_VALIDATOR.validate_frame(table)
+    seconds = time.perf_counter() - start
+    results.append({"benchmark": "validate_frame_arrow", "rows": args.rows, "seconds": seconds,
+                    "rows_per_second": args.rows / seconds})
+
+    # One record at a time, as the Add Entry form submits
+    records = df.head(args.records).to_dict("records")
+    start = time.perf_counter()
+    for record in records:
+        CUSTOMER_VALIDATOR.validate_record(record)
+    seconds = time.perf_counter() - start
+    results.append({"benchmark": "validate_record", "rows": len(records), "seconds": seconds,
+                    "rows_per_second": len(records) / seconds})
+
+    for result in results:
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
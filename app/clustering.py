@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+
+# Above this many rows, cluster() switches from full KMeans to MiniBatch k-means
+FULL_KMEANS_MAX_ROWS = 50_000
+MINIBATCH_CHUNK_ROWS = 10_000
+
+# Beyond this many distinct values, kmeans_1d bins the values into a histogram first
+KMEANS_1D_MAX_DISTINCT = 4096
+
+# k sweeps run on a process pool once the input is big enough to outweigh the worker start-up
+SWEEP_WORKERS = int(os.environ.get("CLUSTER_SWEEP_WORKERS", os.cpu_count() or 1))
+SWEEP_PARALLEL_MIN_ROWS = 10_000
+SILHOUETTE_SAMPLE_ROWS = 5_000
+SWEEPS_IN_MEMORY = 16
+
+_sweeps = OrderedDict()
+_sweeps_lock = threading.Lock()
+
+
+def kmeans_1d(values, n_clusters, weights=None):
+    # Exact 1-D k-means by dynamic programming over the sorted distinct values (weighted by their counts).
+    # Returns labels ordered by centre, so label 0 is always the smallest values. `weights` lets a caller
+    # pass a histogram (distinct values and their row counts) instead of every row.
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0), 0.0
+    row_weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    distinct, inverse = np.unique(values, return_inverse=True)
+    counts = np.bincount(inverse, weights=row_weights)
+    if len(distinct) > KMEANS_1D_MAX_DISTINCT:
+        # Too many distinct values for the quadratic DP: cluster histogram bin centres instead
+        edges = np.linspace(distinct[0], distinct[-1], KMEANS_1D_MAX_DISTINCT + 1)
+        bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, KMEANS_1D_MAX_DISTINCT - 1)
+        counts = np.bincount(bins, weights=row_weights, minlength=KMEANS_1D_MAX_DISTINCT)
+        sums = np.bincount(bins, weights=row_weights * values, minlength=KMEANS_1D_MAX_DISTINCT)
+        occupied = counts > 0
+        distinct = sums[occupied] / counts[occupied]
+        inverse = np.cumsum(occupied)[bins] - 1
+        counts = counts[occupied]
+
+    n = len(distinct)
+    k = min(n_clusters, n)
+    weights = counts.astype(float)
+    sum_w = np.concatenate([[0.0], np.cumsum(weights)])
+    sum_wx = np.concatenate([[0.0], np.cumsum(weights * distinct)])
+    sum_wxx = np.concatenate([[0.0], np.cumsum(weights * distinct * distinct)])
+
+    def sse(starts, end):
+        # Within-cluster sum of squares of distinct[starts:end] for every start in starts
+        w = sum_w[end] - sum_w[starts]
+        wx = sum_wx[end] - sum_wx[starts]
+        return sum_wxx[end] - sum_wxx[starts] - wx * wx / w
+
+    # cost[c, j]: best SSE of the first j distinct values split into c + 1 clusters
+    cost = np.full((k, n + 1), np.inf)
+    split = np.zeros((k, n + 1), dtype=int)
+    cost[0, 1:] = sse(np.zeros(n, dtype=int), np.arange(1, n + 1))
+    for c in range(1, k):
+        for j in range(c + 1, n + 1):
+            starts = np.arange(c, j)
+            candidates = cost[c - 1, starts] + sse(starts, j)
+            best = int(np.argmin(candidates))
+            cost[c, j] = candidates[best]
+            split[c, j] = starts[best]
+
+    # Walk the split points back to cluster boundaries
+    bounds = [n]
+    for c in range(k - 1, 0, -1):
+        bounds.append(split[c, bounds[-1]])
+    bounds = bounds[::-1]
+    starts = np.array([0] + bounds[:-1])
+    ends = np.array(bounds)
+
+    centers = (sum_wx[ends] - sum_wx[starts]) / (sum_w[ends] - sum_w[starts])
+    distinct_labels = np.searchsorted(ends, np.arange(n), side="right")
+    labels = distinct_labels[inverse]
+    inertia = float(np.sum(row_weights * (values - centers[labels]) ** 2))
+    return labels, centers, inertia
+
+
+def streaming_kmeans(chunks, n_clusters, random_state=42):
+    # MiniBatch k-means over an iterable of 2-D chunks
+    model = MiniBatchKMeans(n_clusters=n_clusters, n_init=1, random_state=random_state)
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        if len(chunk) >= n_clusters:
+            model.partial_fit(chunk)
+    return model
+
+
+def cluster(X, n_clusters, random_state=42):
+    # Full KMeans for small inputs, chunked MiniBatch k-means for large ones; returns (labels, centroids, inertia)
+    X = np.asarray(X, dtype=float)
+    if len(X) <= FULL_KMEANS_MAX_ROWS:
+        model = KMeans(n_clusters=n_clusters, random_state=random_state)
+        labels = model.fit_predict(X)
+        return labels, model.cluster_centers_, float(model.inertia_)
+
+    chunks = (X[i:i + MINIBATCH_CHUNK_ROWS] for i in range(0, len(X), MINIBATCH_CHUNK_ROWS))
+    model = streaming_kmeans(chunks, n_clusters, random_state=random_state)
+    labels = model.predict(X)
+    inertia = float(np.sum((X - model.cluster_centers_[labels]) ** 2))
+    return labels, model.cluster_centers_, inertia
+
+
+def _fit_k(X, n_clusters, random_state):
+    # One sweep entry; a top-level function so the process pool can pickle it
+    labels, centroids, inertia = cluster(X, n_clusters, random_state=random_state)
+    silhouette = float("nan")
+    if 2 <= len(np.unique(labels)) < len(X):
+        sample_size = min(len(X), SILHOUETTE_SAMPLE_ROWS)
+        silhouette = float(silhouette_score(X, labels, sample_size=sample_size, random_state=random_state))
+    return {"labels": labels, "centroids": centroids, "inertia": inertia, "silhouette": silhouette}
+
+
+def sweep(X, k_values, random_state=42):
+    # Fit every k at once and cache the result per input, so moving a k slider is a dict lookup.
+    # Returns {k: {"labels", "centroids", "inertia", "silhouette"}}; k larger than the row count is skipped.
+    X = np.ascontiguousarray(X, dtype=float)
+    k_values = [k for k in k_values if k <= len(X)]
+    key = (hashlib.sha1(X.tobytes()).hexdigest(), X.shape, tuple(k_values), random_state)
+    with _sweeps_lock:
+        if key in _sweeps:
+            _sweeps.move_to_end(key)
+            return _sweeps[key]
+
+    if len(X) >= SWEEP_PARALLEL_MIN_ROWS and SWEEP_WORKERS > 1 and len(k_values) > 1:
+        with ProcessPoolExecutor(max_workers=min(SWEEP_WORKERS, len(k_values))) as pool:
+            futures = {k: pool.submit(_fit_k, X, k, random_state) for k in k_values}
+            results = {k: future.result() for k, future in futures.items()}
+    else:
+        results = {k: _fit_k(X, k, random_state) for k in k_values}
+
+    with _sweeps_lock:
+        _sweeps[key] = results
+        while len(_sweeps) > SWEEPS_IN_MEMORY:
+            _sweeps.popitem(last=False)
+    return results
+
+
+def sweep_summary(results):
+    # Elbow/silhouette table for charting
+    return pd.DataFrame([{"clusters": k, "inertia": r["inertia"], "silhouette": r["silhouette"]}
+                         for k, r in sorted(results.items())])
@@ -0,0 +1,113 @@
+"""View Data queries.
+
+    cd app
+    python data_view.py --check-plans   # EXPLAIN every filter combination, fail on a full scan or a sort
+"""
+import itertools
+import sys
+
+from database import borrow_connection
+from query_cache import cached_query
+
+
+CUSTOMER_COLUMNS = ["invoice_number", "customer_id", "gender", "age", "category", "quantity", "price",
+                    "payment_method", "invoice_date", "shopping_mall"]
+
+# Filters offered on the View Data page, in the order they are applied
+FILTER_COLUMNS = ["customer_id", "invoice_number", "gender", "category", "shopping_mall"]
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+
+COUNT_TTL_SECONDS = 60
+
+
+def build_filters(filters):
+    # Columns always appear in FILTER_COLUMNS order, so each filter combination has exactly one statement text
+    clauses, params = [], []
+    for column in FILTER_COLUMNS:
+        if filters.get(column):
+            clauses.append(f"{column} = %s")
+            params.append(filters[column])
+    return clauses, params
+
+
+def page_query(columns, filters, after=None):
+    columns = [column for column in CUSTOMER_COLUMNS if column in columns]
+    if "invoice_number" not in columns:
+        columns = ["invoice_number"] + columns
+    clauses, params = build_filters(filters)
+    if after is not None:
+        clauses.append("invoice_number > %s")
+        params.append(after)
+    query = f"SELECT {', '.join(columns)} FROM customer_data"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY invoice_number LIMIT %s"
+    return query, params, columns
+
+
+def fetch_page(conn, columns, filters, after=None, page_size=50):
+    # Keyset pagination on invoice_number: one page per round trip, however deep the page
+    query, params, columns = page_query(columns, filters, after)
+    df = cached_query(conn, query, params + [page_size + 1], prepared=True)
+
+    has_more = len(df) > page_size
+    df = df.iloc[:page_size]
+    last_key = df["invoice_number"].iloc[-1] if len(df) else None
+    return df, last_key, has_more
+
+
+def estimate_row_count(conn, filters):
+    # Unfiltered: the server's table statistics. Filtered: COUNT(*), cached per data version with a TTL
+    clauses, params = build_filters(filters)
+    if clauses:
+        df = cached_query(conn, "SELECT COUNT(*) FROM customer_data WHERE " + " AND ".join(clauses), params,
+                          ttl=COUNT_TTL_SECONDS, prepared=True)
+    else:
+        df = cached_query(conn, "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'customer_data'",
+                          ttl=COUNT_TTL_SECONDS, prepared=True)
+    return int(df.iloc[0, 0] or 0) if len(df) else 0
+
+
+def unindexed_filter_paths(conn):
+    # EXPLAIN the page and count queries for every filter combination, using values taken from a real row.
+    # Returns (filters, statement, problem) for each plan that scans the whole table or sorts the matches.
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {', '.join(FILTER_COLUMNS)} FROM customer_data LIMIT 1")
+        sample = cursor.fetchone()
+        if sample is None:
+            return []
+
+        problems = []
+        for size in range(1, len(FILTER_COLUMNS) + 1):
+            for combination in itertools.combinations(FILTER_COLUMNS, size):
+                filters = {column: sample[column] for column in combination}
+                query, params, _ = page_query(CUSTOMER_COLUMNS, filters)
+                clauses, count_params = build_filters(filters)
+                count_query = "SELECT COUNT(*) FROM customer_data WHERE " + " AND ".join(clauses)
+                for statement, statement_params in [(query, params + [50]), (count_query, count_params)]:
+                    cursor.execute("EXPLAIN " + statement, statement_params)
+                    plan = cursor.fetchall()
+                    steps = [step for step in plan if step["table"] == "customer_data"]
+                    if any(step["type"] == "ALL" for step in steps):
+                        problems.append((combination, statement, "full table scan"))
+                    elif any("Using filesort" in (step["Extra"] or "") for step in steps):
+                        problems.append((combination, statement, "filesort"))
+        return problems
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    if "--check-plans" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(2)
+    with borrow_connection() as conn:
+        problems = unindexed_filter_paths(conn)
+    for combination, statement, problem in problems:
+        print(f"{problem.capitalize()} for filters {', '.join(combination)}: {statement}")
+    if problems:
+        sys.exit(1)
+    print("Every filter path is index-backed")
@@ -1,11 +1,22 @@
 import mysql.connector
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
+from contextlib import contextmanager
+from collections import OrderedDict
 import os
+import queue
+import threading
+import time
+
+from query_log import InstrumentedConnection
+
+# DB_* settings from the .env file in app/ (see README); variables already set in the environment win
+load_dotenv()
 
 
 def connect_to_db():
     conn= mysql.connector.connect(
-        host=os.environ.get("DB_HOST"), 
+        host=os.environ.get("DB_HOST"),
         user=os.environ.get("DB_USER"),
         password=os.environ.get("DB_PASSWORD"),
         database=os.environ.get("DB_NAME"),
@@ -13,4 +24,236 @@ def connect_to_db():
     )
     cursor = conn.cursor()
     cursor.execute("SET SQL_SAFE_UPDATES = 0;")  # Disabling safe update for this session
-    return conn
+    cursor.close()
+    # Every statement on the connection is timed into the query log (query_log.py)
+    return InstrumentedConnection(conn)
+
+
+# Connection pool shared by every Streamlit session in this process
+class ConnectionPool:
+    def __init__(self, size=5, timeout=10.0, ping_interval=30.0):
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checked_out = {}
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "checkout_seconds_total": 0.0,
+            "checkout_seconds_max": 0.0,
+        }
+
+    def _new_connection(self):
+        conn = connect_to_db()
+        with self._lock:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_for):
+        # Only ping connections that sat idle long enough to have gone stale
+        if idle_for < self.ping_interval:
+            return conn.is_connected()
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self, wait=True):
+        # With wait=False, returns None instead of waiting when no connection is idle and the pool is full
+        start = time.perf_counter()
+        conn = None
+        while conn is None:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._new_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    break
+                if not wait:
+                    return None
+                remaining = self.timeout - (time.perf_counter() - start)
+                try:
+                    conn, released_at = self._idle.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolError(f"No database connection available after {self.timeout:.1f}s "
+                                    f"(pool size {self.size})")
+
+            # Reconnect-on-stale: replace connections that fail the health check
+            if not self._is_healthy(conn, time.monotonic() - released_at):
+                self._close_quietly(conn)
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._checked_out[id(conn)] = time.perf_counter()
+        return conn
+
+    def _check_in(self, conn):
+        with self._lock:
+            checked_out_at = self._checked_out.pop(id(conn), None)
+            if checked_out_at is not None:
+                held = time.perf_counter() - checked_out_at
+                self._stats["checkout_seconds_total"] += held
+                self._stats["checkout_seconds_max"] = max(self._stats["checkout_seconds_max"], held)
+
+    def release(self, conn):
+        self._check_in(conn)
+
+        # Never hand the next borrower an open transaction or unread results
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            self._drop(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def discard(self, conn):
+        self._check_in(conn)
+        self._drop(conn)
+
+    def _drop(self, conn):
+        self._close_quietly(conn)
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+            stats["in_use"] = len(self._checked_out)
+        stats["idle"] = self._idle.qsize()
+        checkouts = max(stats["checkouts"], 1)
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / checkouts
+        stats["checkout_seconds_avg"] = stats["checkout_seconds_total"] / checkouts
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    size=int(os.environ.get("DB_POOL_SIZE", 5)),
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                    ping_interval=float(os.environ.get("DB_POOL_PING_INTERVAL", 30)),
+                )
+    return _pool
+
+
+@contextmanager
+def borrow_connection():
+    # Borrow a connection for the duration of one request, then hand it back
+    pool = get_pool()
+    conn = pool.acquire()
+    broken = False
+    try:
+        yield conn
+    except mysql.connector.Error:
+        # The connection may be in an unknown state; drop it instead of reusing it
+        broken = True
+        raise
+    finally:
+        if broken:
+            pool.discard(conn)
+        else:
+            pool.release(conn)
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def data_watermarks(conn):
+    # (latest updated_at in customer_data, latest deleted_at among its tombstones); both are single index
+    # lookups and move on every insert, update or delete, from this process or any other
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT (SELECT MAX(updated_at) FROM customer_data), "
+                       "(SELECT MAX(deleted_at) FROM customer_data_deletes)")
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def fingerprint_of(watermarks):
+    return "{}|{}".format(*watermarks)
+
+
+def data_fingerprint(conn):
+    # Durable data version of customer_data: every cache of results derived from it is keyed on this
+    return fingerprint_of(data_watermarks(conn))
+
+
+# Server-side prepared statements are kept on the pooled connection, keyed by statement text,
+# so later reruns that issue the same statement skip the server's parse and plan step
+PREPARED_STATEMENTS_PER_CONNECTION = 64
+
+
+def prepared_cursor(conn, statement):
+    cache = getattr(conn, "_prepared_cursors", None)
+    if cache is None:
+        cache = OrderedDict()
+        conn._prepared_cursors = cache
+    cursor = cache.get(statement)
+    if cursor is not None:
+        cache.move_to_end(statement)
+        return cursor
+    cursor = conn.cursor(prepared=True)
+    cache[statement] = cursor
+    if len(cache) > PREPARED_STATEMENTS_PER_CONNECTION:
+        _, evicted = cache.popitem(last=False)
+        evicted.close()
+    return cursor
+
+
+def execute_prepared(conn, statement, params=()):
+    cursor = prepared_cursor(conn, statement)
+    cursor.execute(statement, tuple(params))
+    return cursor.fetchall(), list(cursor.column_names)
@@ -0,0 +1,222 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import summaries
+from database import data_fingerprint
+from model_registry import MODEL_DIR
+
+
+FORECAST_HORIZON = int(os.environ.get("FORECAST_HORIZON", 3))  # months
+# All series share one budget; once it is spent, searches stop trying further orders and series that have
+# not finished get a naive forecast (the mean of their last three months) instead
+FORECAST_BUDGET_SECONDS = float(os.environ.get("FORECAST_BUDGET_SECONDS", 60))
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", os.cpu_count() or 1))
+# A series is searched again once it has this many more months than when its order was chosen;
+# until then new data only refits the stored order, starting from the stored parameters
+FORECAST_RESEARCH_AFTER = int(os.environ.get("FORECAST_RESEARCH_AFTER", 6))
+FORECAST_STATE_PATH = os.path.join(MODEL_DIR, "forecast_state.joblib")
+
+# The (p, d, q) grid from the ARIMA notebook, simplest orders first so a cut-short search keeps the cheap ones
+ARIMA_ORDERS = sorted(itertools.product(range(3), range(3), range(3)), key=lambda order: (sum(order), order))
+MIN_MONTHS = 6
+
+_state = None
+_state_lock = threading.Lock()
+_forecasts = {}
+_forecasts_lock = threading.Lock()
+
+
+def monthly_series(df):
+    # {(category, shopping_mall): revenue per month}; every series spans the same months, with 0 for
+    # months without sales
+    df = df.assign(sales_month=pd.to_datetime(df["sales_month"]), total_sales=df["total_sales"].astype(float))
+    months = pd.date_range(df["sales_month"].min(), df["sales_month"].max(), freq="MS")
+    return {key: group.set_index("sales_month")["total_sales"].reindex(months, fill_value=0.0)
+            for key, group in df.groupby(["category", "shopping_mall"])}
+
+
+def _values_hash(values):
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=float).tobytes()).hexdigest()
+
+
+def _search(arima, values, deadline):
+    # Lowest AIC over the grid; orders that fail to fit are skipped, as in the notebook
+    best = None
+    for order in ARIMA_ORDERS:
+        if best is not None and time.time() > deadline:
+            break
+        try:
+            results = arima(values, order=order).fit()
+        except Exception:
+            continue
+        if best is None or results.aic < best.aic:
+            best = results
+    return best
+
+
+def _forecast_one(values, previous, horizon, deadline):
+    # Runs in a worker process. Unchanged series reuse the stored parameters as they are, series with new
+    # months are refitted starting from them, and the rest get the full order search.
+    from statsmodels.tsa.arima.model import ARIMA
+
+    start = time.perf_counter()
+    values = np.asarray(values, dtype=float)
+    digest = _values_hash(values)
+    results, mode = None, "search"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if previous is not None and len(values) - previous["searched_months"] < FORECAST_RESEARCH_AFTER:
+            model = ARIMA(values, order=previous["order"])
+            try:
+                if previous["values_hash"] == digest:
+                    results, mode = model.filter(previous["params"]), "cached"
+                else:
+                    results, mode = model.fit(start_params=previous["params"]), "warm_start"
+            except Exception:
+                results, mode = None, "search"
+        if results is None:
+            results = _search(ARIMA, values, deadline)
+        if results is None:
+            return None
+
+        forecast = results.get_forecast(horizon)
+        interval = np.asarray(forecast.conf_int(alpha=0.05))
+    order = tuple(results.model.order)
+    return {
+        "forecast": np.asarray(forecast.predicted_mean), "lower": interval[:, 0], "upper": interval[:, 1],
+        "order": order, "aic": float(results.aic), "mode": mode, "seconds": time.perf_counter() - start,
+        "state": {
+            "order": order,
+            "params": np.asarray(results.params),
+            "values_hash": digest,
+            "searched_months": len(values) if mode == "search" else previous["searched_months"],
+        },
+    }
+
+
+def _naive(values, horizon):
+    level = float(np.mean(values[-3:])) if len(values) else 0.0
+    return {"forecast": np.full(horizon, level), "lower": np.full(horizon, np.nan), "upper": np.full(horizon, np.nan),
+            "order": None, "aic": np.nan, "mode": "naive", "seconds": 0.0, "state": None}
+
+
+def _load_state():
+    global _state
+    if _state is None:
+        _state = joblib.load(FORECAST_STATE_PATH) if os.path.exists(FORECAST_STATE_PATH) else {}
+    return _state
+
+
+def _save_state(state):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(state, FORECAST_STATE_PATH + ".tmp")
+    os.replace(FORECAST_STATE_PATH + ".tmp", FORECAST_STATE_PATH)
+
+
+def _stop_pool(pool):
+    # Cancels series still queued and kills the ones still fitting, so a forecast past its budget leaves no
+    # busy workers behind. ProcessPoolExecutor only gained terminate_workers() in Python 3.14.
+    terminate_workers = getattr(pool, "terminate_workers", None)
+    if terminate_workers is not None:
+        terminate_workers()
+        return
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+def forecast_series(series, horizon=FORECAST_HORIZON, budget_seconds=FORECAST_BUDGET_SECONDS,
+                    workers=FORECAST_WORKERS):
+    # series: {key: monthly Series} as from monthly_series. Returns {"forecasts", "fits", "seconds"}: one
+    # forecast row per key and month, and per key the order, AIC and how it was obtained (search,
+    # warm_start, cached or naive). Chosen orders and parameters are kept in FORECAST_STATE_PATH.
+    global _state
+    start = time.perf_counter()
+    deadline = time.time() + budget_seconds
+    with _state_lock:
+        state = dict(_load_state())
+    updates = {}
+    jobs = {key: values.to_numpy() for key, values in series.items() if len(values) >= MIN_MONTHS}
+    outcomes = {}
+
+    if workers > 1 and len(jobs) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+        # Every series counts as unfinished until wait() returns
+        pending = set(jobs)
+        try:
+            futures = {pool.submit(_forecast_one, values, state.get(key), horizon, deadline): key
+                       for key, values in jobs.items()}
+            done, pending = wait(futures, timeout=max(deadline - time.time(), 0))
+            for future in done:
+                outcomes[futures[future]] = future.result()
+        finally:
+            # Series still running past the budget are stopped rather than waited for
+            if pending:
+                _stop_pool(pool)
+            else:
+                pool.shutdown()
+    else:
+        for key, values in jobs.items():
+            if time.time() > deadline:
+                break
+            outcomes[key] = _forecast_one(values, state.get(key), horizon, deadline)
+
+    forecasts, fits = [], []
+    for key, values in series.items():
+        outcome = outcomes.get(key) or _naive(values.to_numpy(), horizon)
+        if outcome["state"] is not None:
+            updates[key] = outcome["state"]
+        category, shopping_mall = key
+        months = pd.date_range(values.index[-1] + pd.offsets.MonthBegin(), periods=horizon, freq="MS")
+        forecasts.append(pd.DataFrame({
+            "category": category, "shopping_mall": shopping_mall, "sales_month": months,
+            "forecast": outcome["forecast"], "lower": outcome["lower"], "upper": outcome["upper"],
+        }))
+        fits.append({"category": category, "shopping_mall": shopping_mall, "order": outcome["order"],
+                     "aic": outcome["aic"], "mode": outcome["mode"], "seconds": outcome["seconds"]})
+
+    # Merged into the latest state, so concurrent sessions keep each other's series
+    with _state_lock:
+        _state = {**_load_state(), **updates}
+        _save_state(_state)
+
+    columns = ["category", "shopping_mall", "sales_month", "forecast", "lower", "upper"]
+    return {
+        "forecasts": pd.concat(forecasts, ignore_index=True) if forecasts else pd.DataFrame(columns=columns),
+        "fits": pd.DataFrame(fits),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def forecast_sales(conn, horizon=FORECAST_HORIZON):
+    # Forecasts for every category x shopping mall from agg_monthly_sales, computed once per durable data
+    # version. Returns forecast_series' result plus "history", the monthly revenue it was fitted on.
+    key = (data_fingerprint(conn), horizon)
+    with _forecasts_lock:
+        if key in _forecasts:
+            return _forecasts[key]
+
+    history = summaries.read_summary(conn, summaries.MONTHLY_SALES_QUERY)
+    if history.empty:
+        return None
+    series = monthly_series(history)
+    result = forecast_series(series, horizon)
+    result["history"] = pd.concat(series, names=["category", "shopping_mall", "sales_month"]) \
+        .rename("total_sales").reset_index()
+    with _forecasts_lock:
+        _forecasts.clear()
+        _forecasts[key] = result
+    return result
@@ -0,0 +1,153 @@
+"""Bulk-load a CSV or Parquet file into customer_data.
+
+Rows are validated a chunk at a time against validation.CUSTOMER_SCHEMA (as the Add Entry form is),
+then inserted in multi-row batches together with the customer_rfm_agg and summary table updates for
+those rows.
+Rejected rows are skipped and can be written to a CSV with the reason for each.
+
+    cd app
+    python ingest.py ../datasets/customer_shopping_data.csv
+    python ingest.py data.parquet --batch-rows 5000 --commit-every 10 --rejects rejected.csv
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import summaries
+from data_view import CUSTOMER_COLUMNS
+from database import borrow_connection
+from migrate import ensure_schema
+from rfm import AGGREGATE_ADD_INVOICE
+from validation import CUSTOMER_VALIDATOR
+
+
+READ_CHUNK_ROWS = 50_000
+BATCH_ROWS = 1_000
+COMMIT_EVERY = 1
+
+# Header names used by the public dataset in datasets/
+COLUMN_ALIASES = {"invoice_no": "invoice_number"}
+
+INSERT_ROWS = f"""
+    INSERT INTO customer_data ({', '.join(CUSTOMER_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(CUSTOMER_COLUMNS))})
+"""
+
+
+def read_chunks(source, chunk_rows=READ_CHUNK_ROWS):
+    # source is a path or a file-like object (e.g. a Streamlit upload); the format follows the file name
+    name = getattr(source, "name", source)
+    if str(name).lower().endswith(".parquet"):
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas().rename(columns=COLUMN_ALIASES)
+    else:
+        for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            yield chunk.rename(columns=COLUMN_ALIASES)
+
+
+def validate(chunk):
+    # Returns (valid rows ready to insert, rejected rows with a "reason" column)
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(chunk)
+    duplicated = rows["invoice_number"].duplicated()
+    if duplicated.any():
+        rejected = pd.concat([rejected, chunk.loc[rows.index[duplicated], CUSTOMER_COLUMNS]
+                              .assign(reason="Invoice Number is duplicated in the file.")])
+        rows = rows[~duplicated]
+    return rows, rejected
+
+
+def existing_invoices(cursor, invoice_numbers):
+    if not invoice_numbers:
+        return set()
+    cursor.execute("SELECT invoice_number FROM customer_data WHERE invoice_number IN "
+                   f"({', '.join(['%s'] * len(invoice_numbers))})", list(invoice_numbers))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def insert_batch(cursor, rows):
+    # customer_data plus the derived tables, as the Add Entry form does for a single row
+    records = rows.to_dict("records")  # native Python values, which the connector can bind
+    cursor.executemany(INSERT_ROWS, [tuple(record[column] for column in CUSTOMER_COLUMNS) for record in records])
+    cursor.executemany(AGGREGATE_ADD_INVOICE, [
+        (record["customer_id"], record["gender"], record["age"], record["invoice_date"], record["quantity"],
+         record["price"] * record["quantity"])
+        for record in records
+    ])
+    summaries.apply_rows(cursor, records, +1)
+
+
+def ingest(conn, source, batch_rows=BATCH_ROWS, commit_every=COMMIT_EVERY, on_rejected=None):
+    # Commits every `commit_every` batches; a failing batch rolls back the open transaction and re-raises.
+    # on_rejected(rejected_rows) is called for every chunk that has rejected rows.
+    start = time.perf_counter()
+    stats = {"rows_read": 0, "rows_loaded": 0, "rows_rejected": 0}
+    cursor = conn.cursor()
+    pending_batches, pending_rows = 0, 0
+    try:
+        for chunk in read_chunks(source):
+            chunk = chunk.reset_index(drop=True)
+            stats["rows_read"] += len(chunk)
+            rows, rejected = validate(chunk)
+
+            for offset in range(0, len(rows), batch_rows):
+                batch = rows.iloc[offset:offset + batch_rows]
+                duplicates = batch["invoice_number"].isin(existing_invoices(cursor, batch["invoice_number"].tolist()))
+                if duplicates.any():
+                    rejected = pd.concat([rejected, chunk.loc[batch.index[duplicates], CUSTOMER_COLUMNS]
+                                          .assign(reason="Invoice Number already exists.")])
+                    batch = batch[~duplicates]
+                if batch.empty:
+                    continue
+                insert_batch(cursor, batch)
+                pending_batches += 1
+                pending_rows += len(batch)
+                if pending_batches >= commit_every:
+                    conn.commit()
+                    stats["rows_loaded"] += pending_rows
+                    pending_batches, pending_rows = 0, 0
+
+            stats["rows_rejected"] += len(rejected)
+            if len(rejected) and on_rejected is not None:
+                on_rejected(rejected)
+        conn.commit()
+        stats["rows_loaded"] += pending_rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    seconds = time.perf_counter() - start
+    stats["seconds"] = seconds
+    stats["rows_per_second"] = stats["rows_loaded"] / seconds if seconds else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or .parquet file")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="rows per multi-row INSERT")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="batches per transaction")
+    parser.add_argument("--rejects", help="write rejected rows and their reasons to this CSV")
+    args = parser.parse_args(argv)
+
+    first_write = [True]
+
+    def write_rejected(rejected):
+        if args.rejects:
+            rejected.to_csv(args.rejects, mode="w" if first_write[0] else "a", header=first_write[0], index=False)
+            first_write[0] = False
+
+    with borrow_connection() as conn:
+        ensure_schema(conn)
+        stats = ingest(conn, args.path, args.batch_rows, args.commit_every, write_rejected)
+    print(f"Loaded {stats['rows_loaded']:,} of {stats['rows_read']:,} rows in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} rows/sec); rejected {stats['rows_rejected']:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
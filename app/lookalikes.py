@@ -0,0 +1,150 @@
+import copy
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from model_registry import get_or_fit
+from rfm import get_rfm_table
+from validation import GENDERS
+
+
+# Per-customer RFM and demographic values the similarity is measured on, each standardized
+LOOKALIKE_FEATURES = ["age", "gender", "last_date_order", "total_orders", "revenue"]
+LOOKALIKE_LEAF_SIZE = 40
+# Customers added, changed or removed since the tree was built are answered by brute force alongside it;
+# past this many the tree is rebuilt
+LOOKALIKE_REBUILD_AFTER = int(os.environ.get("LOOKALIKE_REBUILD_AFTER", 500))
+
+SIMILAR_COLUMNS = ["customer_id", "gender", "age", "total_orders", "revenue", "last_date_order", "rfm_segment"]
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def feature_matrix(df):
+    gender = pd.Categorical(df["gender"], categories=GENDERS).codes
+    return df[LOOKALIKE_FEATURES].assign(gender=gender).to_numpy(dtype=float)
+
+
+class LookalikeIndex:
+    # KD-tree over the standardized vectors of every customer when it was built, plus an overlay of
+    # customers added or changed since then. Tree rows that were changed or removed are masked out.
+    def __init__(self, df, leaf_size=LOOKALIKE_LEAF_SIZE):
+        X = feature_matrix(df)
+        self.mean = X.mean(axis=0) if len(X) else np.zeros(X.shape[1])
+        self.scale = X.std(axis=0) if len(X) else np.ones(X.shape[1])
+        self.scale[self.scale == 0] = 1.0
+        self.ids = df["customer_id"].to_numpy(dtype=object)
+        self.positions = pd.Index(self.ids)
+        self.tree = KDTree(self.standardize(X), leaf_size=leaf_size) if len(X) else None
+        self.removed = np.zeros(len(self.ids), dtype=bool)
+        self.overlay = {}
+        self.version = None
+        self.table_version = None
+
+    def standardize(self, X):
+        return (X - self.mean) / self.scale
+
+    def pending(self):
+        return int(self.removed.sum()) + len(self.overlay)
+
+    def patched(self, table):
+        # A copy with every customer the RFM table patched in after this index's version applied
+        index = copy.copy(self)
+        index.removed = self.removed.copy()
+        index.overlay = dict(self.overlay)
+        for customer_id, version in table.changed_at.items():
+            if version <= self.version:
+                continue
+            if customer_id in self.positions:
+                index.removed[self.positions.get_loc(customer_id)] = True
+            if customer_id in table.df.index:
+                index.overlay[customer_id] = index.standardize(feature_matrix(table.df.loc[[customer_id]]))[0]
+            else:
+                index.overlay.pop(customer_id, None)
+        index.version = table.version
+        return index
+
+    def query(self, vectors, k, exclude=None):
+        # (ids, distances), one row per standardized vector, nearest first; exclude[i] is left out of row i.
+        # Rows with fewer than k customers to return are padded with infinite distances.
+        vectors = np.atleast_2d(vectors)
+        ids, distances = [], []
+        if self.tree is not None:
+            # Enough neighbours that masking removed rows and the excluded customer still leaves k
+            n_neighbors = min(k + int(self.removed.sum()) + 1, len(self.ids))
+            tree_distances, positions = self.tree.query(vectors, k=n_neighbors)
+            tree_distances[self.removed[positions]] = np.inf
+            ids.append(self.ids[positions])
+            distances.append(tree_distances)
+        if self.overlay:
+            overlay_ids = np.array(list(self.overlay), dtype=object)
+            overlay = np.array(list(self.overlay.values()))
+            distances.append(np.linalg.norm(vectors[:, None, :] - overlay[None, :, :], axis=2))
+            ids.append(np.broadcast_to(overlay_ids, (len(vectors), len(overlay_ids))))
+        if not ids:
+            return np.empty((len(vectors), 0), dtype=object), np.empty((len(vectors), 0))
+
+        ids, distances = np.hstack(ids), np.hstack(distances)
+        if exclude is not None:
+            distances[ids == np.asarray(exclude, dtype=object)[:, None]] = np.inf
+        nearest = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(ids, nearest, axis=1), np.take_along_axis(distances, nearest, axis=1)
+
+
+def _build(table):
+    # Persisted under the durable fingerprint of the RFM table it is built from, so a restarted app loads
+    # the tree instead of rebuilding it
+    fitted = get_or_fit("lookalike_index", {"leaf_size": LOOKALIKE_LEAF_SIZE}, LOOKALIKE_FEATURES,
+                        table.fingerprint, lambda: LookalikeIndex(table.df))
+    index = copy.copy(fitted)
+    index.version, index.table_version = table.version, table.built_version
+    return index
+
+
+def get_lookalike_index(conn):
+    # Follows the cached RFM table: writes the forms patch into the table are patched into the index too,
+    # and the tree is only rebuilt when the table was reloaded or too many changes piled up
+    table = get_rfm_table(conn)
+    index = _cache.get("index")
+    if index is not None and index.version == table.version:
+        return index
+    with _cache_lock:
+        index = _cache.get("index")
+        if index is None or index.version != table.version:
+            if index is not None and index.table_version == table.built_version:
+                index = index.patched(table)
+                if index.pending() > LOOKALIKE_REBUILD_AFTER:
+                    index = None
+            else:
+                index = None
+            if index is None:
+                index = _build(table)
+            _cache["index"] = index
+    return index
+
+
+def similar_customers(conn, customer_ids, k=10):
+    # The k most similar customers to each of customer_ids, nearest first, with one tree query for the batch
+    customer_ids = list(customer_ids)
+    index = get_lookalike_index(conn)
+    table = get_rfm_table(conn)
+    missing = [customer_id for customer_id in customer_ids if customer_id not in table.df.index]
+    if missing:
+        raise ValueError(f"Unknown customer IDs: {', '.join(map(str, missing[:10]))}")
+
+    vectors = index.standardize(feature_matrix(table.df.loc[customer_ids]))
+    ids, distances = index.query(vectors, k, exclude=customer_ids)
+    result = pd.DataFrame({
+        "customer_id": np.repeat(np.asarray(customer_ids, dtype=object), ids.shape[1]),
+        "rank": np.tile(np.arange(1, ids.shape[1] + 1), len(customer_ids)),
+        "similar_customer_id": ids.ravel(),
+        "distance": distances.ravel(),
+    })
+    result = result[np.isfinite(result["distance"])].reset_index(drop=True)
+    # Index lookups for just the returned customers, rather than a join against the whole table
+    details = table.df.loc[result["similar_customer_id"], SIMILAR_COLUMNS[1:]].reset_index(drop=True)
+    return pd.concat([result, details], axis=1)
@@ -0,0 +1,86 @@
+"""Apply the SQL files in app/migrations in order, once each.
+
+    cd app
+    python migrate.py
+"""
+import os
+import threading
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from database import borrow_connection
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# MySQL commits DDL as it runs, so a migration that failed part-way has some of its tables, columns,
+# indexes and triggers in place. Re-running it skips those steps; data changes were rolled back with the
+# failure and run again.
+ALREADY_APPLIED_ERRORS = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,
+    errorcode.ER_TRG_ALREADY_EXISTS,
+}
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def split_statements(sql):
+    # Drop "--" comment lines and split on the terminating semicolons
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def apply_migrations(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name VARCHAR(255) NOT NULL PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT name FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        newly_applied = []
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not name.endswith(".sql") or name in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                for statement in split_statements(f.read()):
+                    try:
+                        cursor.execute(statement)
+                    except mysql.connector.Error as e:
+                        if e.errno not in ALREADY_APPLIED_ERRORS:
+                            raise
+            cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            conn.commit()
+            newly_applied.append(name)
+        return newly_applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def ensure_schema(conn):
+    # Run pending migrations once per process, before the first page touches derived tables
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            apply_migrations(conn)
+            _schema_ready = True
+
+
+if __name__ == "__main__":
+    with borrow_connection() as conn:
+        applied = apply_migrations(conn)
+    print("Applied: " + ", ".join(applied) if applied else "Schema is up to date")
@@ -0,0 +1,18 @@
+-- Per-customer RFM aggregates, maintained in place when the Add/Update/Delete forms commit
+CREATE TABLE IF NOT EXISTS customer_rfm_agg (
+    customer_id VARCHAR(64) NOT NULL PRIMARY KEY,
+    gender VARCHAR(16),
+    age INT,
+    last_invoice_date DATE,
+    invoice_count INT NOT NULL,
+    total_quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL
+);
+
+-- Lets a single customer's aggregates be rebuilt without scanning customer_data
+CREATE INDEX idx_customer_data_customer_id ON customer_data (customer_id);
+
+INSERT INTO customer_rfm_agg (customer_id, gender, age, last_invoice_date, invoice_count, total_quantity, revenue)
+SELECT customer_id, MAX(gender), MAX(age), MAX(invoice_date), COUNT(*), SUM(quantity), SUM(price * quantity)
+FROM customer_data
+GROUP BY customer_id;
@@ -0,0 +1,16 @@
+-- Composite indexes for the View Data filters. Every index ends in invoice_number, so a filter on
+-- exactly its leading columns is served in index order without a sort; 007 adds the combinations
+-- this file missed.
+
+-- customer_id and invoice_number are selective on their own; other filters are checked on the index rows
+CREATE INDEX idx_customer_data_customer_invoice ON customer_data (customer_id, invoice_number);
+CREATE INDEX idx_customer_data_invoice ON customer_data (invoice_number);
+
+-- Covers the (customer_id) lookups of migration 001 as a prefix
+DROP INDEX idx_customer_data_customer_id ON customer_data;
+
+-- gender / category / shopping_mall combinations that include gender
+CREATE INDEX idx_customer_data_category_mall_gender ON customer_data (category, shopping_mall, gender, invoice_number);
+CREATE INDEX idx_customer_data_category_gender ON customer_data (category, gender, invoice_number);
+CREATE INDEX idx_customer_data_mall_gender ON customer_data (shopping_mall, gender, invoice_number);
+CREATE INDEX idx_customer_data_gender ON customer_data (gender, invoice_number);
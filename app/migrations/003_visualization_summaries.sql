@@ -0,0 +1,45 @@
+-- Pre-aggregated tables behind the Visualizations page. Kept current by the write forms
+-- (summaries.apply_rows) and rebuildable at any time with `python summaries.py --refresh`.
+CREATE TABLE IF NOT EXISTS agg_daily_sales (
+    invoice_date DATE NOT NULL PRIMARY KEY,
+    total_sales DECIMAL(16, 2) NOT NULL,
+    row_count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_category_revenue (
+    category VARCHAR(64) NOT NULL PRIMARY KEY,
+    total_revenue DECIMAL(16, 2) NOT NULL,
+    row_count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_age_counts (
+    age INT NOT NULL PRIMARY KEY,
+    row_count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_payment_counts (
+    payment_method VARCHAR(64) NOT NULL PRIMARY KEY,
+    row_count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_gender_totals (
+    gender VARCHAR(16) NOT NULL PRIMARY KEY,
+    orders BIGINT NOT NULL,
+    revenue DECIMAL(16, 2) NOT NULL,
+    row_count BIGINT NOT NULL
+);
+
+INSERT INTO agg_daily_sales (invoice_date, total_sales, row_count)
+SELECT invoice_date, SUM(price * quantity), COUNT(*) FROM customer_data GROUP BY invoice_date;
+
+INSERT INTO agg_category_revenue (category, total_revenue, row_count)
+SELECT category, SUM(price * quantity), COUNT(*) FROM customer_data GROUP BY category;
+
+INSERT INTO agg_age_counts (age, row_count)
+SELECT age, COUNT(*) FROM customer_data GROUP BY age;
+
+INSERT INTO agg_payment_counts (payment_method, row_count)
+SELECT payment_method, COUNT(*) FROM customer_data GROUP BY payment_method;
+
+INSERT INTO agg_gender_totals (gender, orders, revenue, row_count)
+SELECT gender, SUM(quantity), SUM(price), COUNT(*) FROM customer_data GROUP BY gender;
@@ -0,0 +1,15 @@
+-- Change tracking for the local Parquet snapshot (snapshot.py): a row-level modification
+-- watermark and a tombstone for every deleted invoice.
+ALTER TABLE customer_data
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_customer_data_updated_at ON customer_data (updated_at);
+
+CREATE TABLE IF NOT EXISTS customer_data_deletes (
+    invoice_number VARCHAR(64) NOT NULL,
+    deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_customer_data_deletes_deleted_at (deleted_at)
+);
+
+CREATE TRIGGER trg_customer_data_delete AFTER DELETE ON customer_data
+FOR EACH ROW INSERT INTO customer_data_deletes (invoice_number) VALUES (OLD.invoice_number);
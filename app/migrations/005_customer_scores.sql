@@ -0,0 +1,7 @@
+-- Output of the nightly batch scoring job (batch_score.py --output table)
+CREATE TABLE IF NOT EXISTS customer_scores (
+    customer_id VARCHAR(64) NOT NULL PRIMARY KEY,
+    rfm_segment VARCHAR(32) NOT NULL,
+    predicted_category VARCHAR(64) NOT NULL,
+    scored_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
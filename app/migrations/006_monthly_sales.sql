@@ -0,0 +1,16 @@
+-- Monthly revenue per category and shopping mall, the series behind the sales forecasts
+-- (forecasting.py). Maintained like the other summary tables in summaries.py.
+CREATE TABLE IF NOT EXISTS agg_monthly_sales (
+    sales_month DATE NOT NULL,
+    category VARCHAR(64) NOT NULL,
+    shopping_mall VARCHAR(64) NOT NULL,
+    total_sales DECIMAL(16, 2) NOT NULL,
+    row_count BIGINT NOT NULL,
+    PRIMARY KEY (category, shopping_mall, sales_month)
+);
+
+INSERT INTO agg_monthly_sales (sales_month, category, shopping_mall, total_sales, row_count)
+SELECT invoice_date - INTERVAL (DAYOFMONTH(invoice_date) - 1) DAY, category, shopping_mall,
+       SUM(price * quantity), COUNT(*)
+FROM customer_data
+GROUP BY invoice_date - INTERVAL (DAYOFMONTH(invoice_date) - 1) DAY, category, shopping_mall;
@@ -0,0 +1,5 @@
+-- Filter combinations that 002 left without an index ending in invoice_number: on their own, category,
+-- shopping_mall and category + shopping_mall matched rows through a longer index and sorted them for each page
+CREATE INDEX idx_customer_data_category ON customer_data (category, invoice_number);
+CREATE INDEX idx_customer_data_mall ON customer_data (shopping_mall, invoice_number);
+CREATE INDEX idx_customer_data_category_mall ON customer_data (category, shopping_mall, invoice_number);
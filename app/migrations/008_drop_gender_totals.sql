@@ -0,0 +1,2 @@
+-- The gender totals summary from 003 is no longer shown anywhere, so writes stop maintaining it
+DROP TABLE IF EXISTS agg_gender_totals;
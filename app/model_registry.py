@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import joblib
+
+
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".models"))
+MODELS_IN_MEMORY = int(os.environ.get("MODELS_IN_MEMORY", 8))
+# Files kept on disk per model type; every write changes the data fingerprint, so older keys are superseded
+MODEL_FILES_PER_TYPE = int(os.environ.get("MODEL_FILES_PER_TYPE", 2))
+
+# Part of every key; bump when the shape of what fit() returns changes so old files are not loaded
+MODEL_FORMAT = 2
+
+# Winning hyperparameters written by tune.py, read once per process; models without an entry keep their defaults
+TUNED_PARAMS_PATH = os.environ.get("TUNED_PARAMS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuned_params.json"))
+TUNED_PARAMS_FORMAT = 1
+
+_models = OrderedDict()
+_lock = threading.Lock()
+_fit_locks = {}
+_tuned = None
+
+
+def load_tuned(path=TUNED_PARAMS_PATH):
+    # {} when tune.py has not been run, or the file was written in another format
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        tuned = json.load(f)
+    return tuned if tuned.get("format") == TUNED_PARAMS_FORMAT else {}
+
+
+def tuned_params(model_type, defaults):
+    # Tuned parameters override the defaults; they are part of the model key, so a new winner means a new fit
+    global _tuned
+    if _tuned is None:
+        _tuned = load_tuned()
+    entry = _tuned.get("models", {}).get(model_type)
+    return {**defaults, **entry["params"]} if entry else dict(defaults)
+
+
+def model_key(model_type, params, features, data_version):
+    payload = json.dumps([MODEL_FORMAT, model_type, params, list(features), str(data_version)], sort_keys=True, default=str)
+    return f"{model_type}-{hashlib.sha1(payload.encode()).hexdigest()[:16]}"
+
+
+def _remember(key, fitted):
+    with _lock:
+        _models[key] = fitted
+        _models.move_to_end(key)
+        while len(_models) > MODELS_IN_MEMORY:
+            _models.popitem(last=False)
+
+
+def _prune(model_type):
+    # Newest MODEL_FILES_PER_TYPE files of this type are kept, so another process still on the previous data
+    # version can load its model; temporary files from fits in progress are left alone
+    pattern = re.compile(re.escape(model_type) + r"-[0-9a-f]{16}\.joblib")
+    paths = [os.path.join(MODEL_DIR, name) for name in os.listdir(MODEL_DIR) if pattern.fullmatch(name)]
+    paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0, reverse=True)
+    for path in paths[MODEL_FILES_PER_TYPE:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_or_fit(model_type, params, features, data_version, fit):
+    # fit() returns whatever should be cached (estimator, encoders, scores); it only runs on a cold key
+    key = model_key(model_type, params, features, data_version)
+    with _lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+        fit_lock = _fit_locks.setdefault(key, threading.Lock())
+
+    # One fit per key, even when several sessions ask for it at once
+    with fit_lock:
+        with _lock:
+            if key in _models:
+                return _models[key]
+
+        path = os.path.join(MODEL_DIR, f"{key}.joblib")
+        try:
+            fitted = joblib.load(path)
+        except FileNotFoundError:
+            # Not fitted yet, or pruned by another process since
+            fitted = fit()
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            joblib.dump(fitted, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            _prune(model_type)
+        _remember(key, fitted)
+
+    with _lock:
+        _fit_locks.pop(key, None)
+    return fitted
@@ -0,0 +1,77 @@
+import os
+
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+
+import snapshot
+from database import data_fingerprint
+from model_registry import get_or_fit, tuned_params
+from preprocessing import fitted_preprocessor
+from rfm import CLASSIFIER_FEATURES, get_rfm_table
+
+
+# Used until tune.py has written winners for these models. The category tree is capped so that it never
+# grows toward one leaf per invoice on the full table.
+SEGMENT_TREE_DEFAULTS = {"random_state": 42, "max_depth": 5}
+CATEGORY_TREE_DEFAULTS = {"random_state": 42, "max_depth": 20, "min_samples_leaf": 5}
+SEGMENT_TREE_PARAMS = tuned_params("rfm_segment_tree", SEGMENT_TREE_DEFAULTS)
+CATEGORY_TREE_PARAMS = tuned_params("category_tree", CATEGORY_TREE_DEFAULTS)
+CATEGORY_FEATURES = ['gender', 'age', 'quantity', 'price']
+# Invoices the category tree is fitted on, sampled from the snapshot so a fit never loads the whole table
+CATEGORY_TREE_SAMPLE_ROWS = int(os.environ.get("CATEGORY_TREE_SAMPLE_ROWS", 1_000_000))
+
+
+def fit_segment_tree(rfm_table):
+    X, y = rfm_table.classifier_data()
+
+    # Encode categorical target variable
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+
+    # Split the data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
+
+    # Train the Decision Tree Classifier
+    clf = DecisionTreeClassifier(**SEGMENT_TREE_PARAMS)
+    clf.fit(X_train, y_train)
+
+    # Predict and evaluate
+    y_pred = clf.predict(X_test)
+    return {"model": clf, "label_encoder": label_encoder, "accuracy": accuracy_score(y_test, y_pred)}
+
+
+def fit_category_tree(df, preprocessor):
+    # The fitted preprocessor is returned with the model, so callers transform new rows the same way
+    # Preprocess data for classification
+    df = preprocessor.transform(df.copy())
+    X = df[CATEGORY_FEATURES]
+    y = df['category']  # Target is the product category
+
+    # Train/Test Split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Train Decision Tree Classifier
+    clf = DecisionTreeClassifier(**CATEGORY_TREE_PARAMS)
+    clf.fit(X_train, y_train)
+
+    # Model Evaluation
+    y_pred = clf.predict(X_test)
+    return {"model": clf, "preprocessor": preprocessor, "accuracy": accuracy_score(y_test, y_pred)}
+
+
+def segment_tree(conn):
+    # Trained once per data version; callers only predict. Keyed on the fingerprint of the RFM table it is
+    # trained on, so a table a write has not reached yet never stores a model under a newer key.
+    table = get_rfm_table(conn)
+    return get_or_fit("rfm_segment_tree", SEGMENT_TREE_PARAMS, CLASSIFIER_FEATURES, table.fingerprint,
+                      lambda: fit_segment_tree(table))
+
+
+def category_tree(conn):
+    # The sample size is part of the key, so changing it means a new fit
+    params = dict(CATEGORY_TREE_PARAMS, sample_rows=CATEGORY_TREE_SAMPLE_ROWS)
+    return get_or_fit("category_tree", params, CATEGORY_FEATURES, data_fingerprint(conn),
+                      lambda: fit_category_tree(snapshot.sample_frame(conn, CATEGORY_TREE_SAMPLE_ROWS),
+                                                fitted_preprocessor(conn)))
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+import snapshot
+from database import data_fingerprint
+from model_registry import get_or_fit
+
+
+SCALED_COLUMNS = ['quantity', 'price']
+PREPROCESS_CHUNK_ROWS = 100_000
+
+
+class Preprocessor:
+    # Gender label encoding and quantity/price min-max scaling, learned once in a streaming pass over
+    # chunks and applied to any number of batches afterwards. Matches LabelEncoder/MinMaxScaler output.
+    def __init__(self):
+        self.gender_classes = np.array([], dtype=object)
+        self.data_min = None
+        self.data_max = None
+
+    def partial_fit(self, chunk):
+        chunk = chunk[chunk.notna().all(axis=1)]
+        if chunk.empty:
+            return self
+        self.gender_classes = np.union1d(self.gender_classes, chunk['gender'].astype(str).unique())
+        values = chunk[SCALED_COLUMNS].to_numpy(dtype=float)
+        chunk_min, chunk_max = values.min(axis=0), values.max(axis=0)
+        self.data_min = chunk_min if self.data_min is None else np.minimum(self.data_min, chunk_min)
+        self.data_max = chunk_max if self.data_max is None else np.maximum(self.data_max, chunk_max)
+        return self
+
+    def fit(self, chunks):
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def transform(self, chunk, dropna=True):
+        # In place: drops incomplete rows, then overwrites gender and the scaled columns
+        if dropna:
+            chunk.dropna(inplace=True)
+        chunk['gender'] = self.encode_gender(chunk['gender'])
+        value_range = self.data_max - self.data_min
+        scale = np.divide(1.0, value_range, out=np.ones_like(value_range), where=value_range != 0)
+        for i, column in enumerate(SCALED_COLUMNS):
+            chunk[column] = (chunk[column].to_numpy(dtype=float) - self.data_min[i]) * scale[i]
+        return chunk
+
+    def encode_gender(self, values):
+        # Unseen labels encode as -1
+        return pd.Index(self.gender_classes).get_indexer(np.asarray(values, dtype=str))
+
+
+def fitted_preprocessor(conn, columns=None):
+    # Fitted once per data version over the snapshot in chunks, and persisted by the model registry
+    columns = list(columns or snapshot.CUSTOMER_COLUMNS)
+    return get_or_fit("preprocessor", {}, columns, data_fingerprint(conn),
+                      lambda: Preprocessor().fit(snapshot.iter_frames(conn, columns, PREPROCESS_CHUNK_ROWS)))
+
+
+def iter_preprocessed(conn, columns=None, chunk_rows=PREPROCESS_CHUNK_ROWS):
+    # Transformed snapshot chunks; only one chunk is in memory at a time
+    preprocessor = fitted_preprocessor(conn, columns)
+    for chunk in snapshot.iter_frames(conn, columns, chunk_rows):
+        yield preprocessor.transform(chunk)
+
+
+# Preprocessing Function
+def preprocess_data(data):
+    # One-off fit and transform of a frame that is already in memory
+    data = data.copy()
+    return Preprocessor().fit([data]).transform(data)
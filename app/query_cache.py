@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from database import data_fingerprint, execute_prepared
+
+
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", 300))
+QUERY_CACHE_MAX_MB = float(os.environ.get("QUERY_CACHE_MAX_MB", 64))
+
+# key -> (stored_at, ttl, nbytes, DataFrame), least recently used first
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "bytes": 0}
+
+
+def normalize_sql(query):
+    # Whitespace and a trailing semicolon do not change the statement
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+def _drop(key):
+    _, _, nbytes, _ = _entries.pop(key)
+    _stats["bytes"] -= nbytes
+
+
+def _run(conn, query, params, prepared):
+    if prepared:
+        rows, columns = execute_prepared(conn, query, params)
+        return pd.DataFrame(rows, columns=columns)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, tuple(params))
+        return pd.DataFrame(cursor.fetchall(), columns=cursor.column_names)
+    finally:
+        cursor.close()
+
+
+def cached_query(conn, query, params=(), ttl=None, prepared=False):
+    # Result of a read query on customer_data (or the summaries maintained with it) as a DataFrame, keyed
+    # by the normalized SQL, its parameters and the durable data fingerprint, so a write from any process
+    # invalidates it. The TTL covers what the fingerprint cannot see, such as table statistics.
+    # Callers get their own copy of the cached frame.
+    ttl = QUERY_CACHE_TTL if ttl is None else ttl
+    key = (normalize_sql(query), tuple(params), data_fingerprint(conn))
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            if now - entry[0] < entry[1]:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return entry[3].copy()
+            _drop(key)
+            _stats["expired"] += 1
+        _stats["misses"] += 1
+
+    df = _run(conn, query, params, prepared)
+
+    nbytes = int(df.memory_usage(index=True, deep=True).sum())
+    max_bytes = QUERY_CACHE_MAX_MB * 1024 * 1024
+    if nbytes <= max_bytes:
+        with _lock:
+            if key in _entries:
+                _drop(key)
+            _entries[key] = (now, ttl, nbytes, df)
+            _stats["bytes"] += nbytes
+            while _stats["bytes"] > max_bytes:
+                _drop(next(iter(_entries)))
+                _stats["evicted"] += 1
+    return df.copy()
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats["bytes"] = 0
+
+
+def stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, entries=len(_entries), hit_rate=_stats["hits"] / lookups if lookups else 0.0)
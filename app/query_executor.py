@@ -0,0 +1,91 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import mysql.connector
+
+from database import ConnectionPool
+
+
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", 4))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    # Worker connections come from their own pool, so query workers never compete with sessions
+    # borrowing their main connection from database.get_pool()
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    size=QUERY_WORKERS,
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                    ping_interval=float(os.environ.get("DB_POOL_PING_INTERVAL", 30)),
+                )
+    return _pool
+
+
+def _timed(task, connections, broken):
+    start = time.perf_counter()
+    conn = connections.get()
+    acquired = time.perf_counter()
+    try:
+        result = task(conn)
+    except mysql.connector.Error:
+        # The connection may be in an unknown state; it is discarded instead of returned to the pool
+        broken.add(id(conn))
+        raise
+    finally:
+        connections.put(conn)
+    finished = time.perf_counter()
+    return result, {"wait_seconds": acquired - start, "query_seconds": finished - acquired,
+                    "total_seconds": finished - start}
+
+
+def run_concurrently(tasks, conn=None):
+    # tasks: {name: fn(conn) -> result}, independent of each other. They are yielded as (name, result, timing)
+    # in completion order, so callers can render results as they arrive.
+    # Workers only get worker-pool connections that are idle (or can be opened) right now, reserved up front,
+    # so concurrent sessions never wait on each other for them; when none is free, the tasks run one after
+    # another on the caller's `conn`.
+    pool = get_worker_pool()
+    reserved = []
+    while len(reserved) < min(QUERY_WORKERS, len(tasks)):
+        extra = pool.acquire(wait=False)
+        if extra is None:
+            break
+        reserved.append(extra)
+
+    if not reserved:
+        for name, task in tasks.items():
+            start = time.perf_counter()
+            result = task(conn)
+            seconds = time.perf_counter() - start
+            yield name, result, {"wait_seconds": 0.0, "query_seconds": seconds, "total_seconds": seconds}
+        return
+
+    connections = queue.Queue()
+    for extra in reserved:
+        connections.put(extra)
+    broken = set()
+    executor = ThreadPoolExecutor(max_workers=len(reserved), thread_name_prefix="query")
+    try:
+        # Each task runs in a copy of the caller's context, so its statements carry the caller's page section
+        futures = {executor.submit(contextvars.copy_context().run, _timed, task, connections, broken): name
+                   for name, task in tasks.items()}
+        for future in as_completed(futures):
+            result, timing = future.result()
+            yield futures[future], result, timing
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for extra in reserved:
+            if id(extra) in broken:
+                pool.discard(extra)
+            else:
+                pool.release(extra)
@@ -0,0 +1,207 @@
+import contextvars
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+
+QUERY_LOG_SIZE = int(os.environ.get("QUERY_LOG_SIZE", 500))
+QUERY_LOG_PATH = os.environ.get("QUERY_LOG_PATH")
+# Statements slower than this many seconds get their EXPLAIN plan captured; 0 turns it off
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_SECONDS", 0))
+
+_records = deque(maxlen=QUERY_LOG_SIZE)
+_lock = threading.Lock()
+_section = contextvars.ContextVar("query_log_section", default="")
+
+
+def set_section(section):
+    # Tag every statement issued from here on (in this thread or context) with the page section
+    _section.set(section)
+
+
+def fingerprint(statement):
+    # Literals and IN lists are replaced, so one query shape maps to one fingerprint
+    statement = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", "?", statement)
+    statement = re.sub(r"\b\d+(?:\.\d+)?\b", "?", statement)
+    statement = re.sub(r"%\(\w+\)s|%s", "?", statement)
+    statement = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", statement)
+    return re.sub(r"\s+", " ", statement).strip().rstrip(";")
+
+
+def _estimate_bytes(rows):
+    # Size of the first row times the row count; cheap enough to run on every fetch
+    if not rows:
+        return 0
+    row = rows[0].values() if isinstance(rows[0], dict) else rows[0]
+    size = sum(len(value) if isinstance(value, (str, bytes, bytearray)) else 8 for value in row)
+    return size * len(rows)
+
+
+def _write(record):
+    with _lock:
+        _records.append(record)
+        if QUERY_LOG_PATH:
+            with open(QUERY_LOG_PATH, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+class InstrumentedCursor:
+    # Times execute and fetch calls; one record per statement, written once its result set is read
+    # (or right away for statements without one), or at the latest when the next statement starts
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+        self._record = None
+        self._params = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _start(self, statement, params, batch_size=1):
+        self._finish()
+        self._params = params
+        fp = fingerprint(statement)
+        self._record = {
+            "at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "section": _section.get(),
+            "fingerprint": fp,
+            "fingerprint_id": hashlib.sha1(fp.encode()).hexdigest()[:12],
+            "statement": statement,
+            "batch_size": batch_size,
+            "seconds": 0.0,
+            "rows": 0,
+            "bytes": 0,
+        }
+
+    def _timed(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if self._record is not None:
+                self._record["seconds"] += time.perf_counter() - start
+
+    def _fetched(self, rows):
+        if self._record is not None and rows:
+            self._record["rows"] += len(rows)
+            self._record["bytes"] += _estimate_bytes(rows)
+        return rows
+
+    def _finish(self, explain=True):
+        record, self._record = self._record, None
+        if record is None:
+            return
+        if explain and SLOW_QUERY_SECONDS and record["seconds"] >= SLOW_QUERY_SECONDS \
+                and record["statement"].lstrip()[:6].upper() == "SELECT":
+            record["plan"] = self._conn.explain(record["statement"], self._params)
+        record["rows"] = max(record["rows"], getattr(self._cursor, "rowcount", 0) or 0)
+        _write(record)
+
+    def _executed(self, result):
+        if not getattr(self._cursor, "with_rows", False):
+            self._finish()
+        return result
+
+    def execute(self, statement, params=(), *args, **kwargs):
+        self._start(statement, params)
+        return self._executed(self._timed(self._cursor.execute, statement, params, *args, **kwargs))
+
+    def executemany(self, statement, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        self._start(statement, None, len(seq_params))
+        return self._executed(self._timed(self._cursor.executemany, statement, seq_params, *args, **kwargs))
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._fetched([row])
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._fetched(self._timed(self._cursor.fetchmany, *args, **kwargs))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetched(self._timed(self._cursor.fetchall))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __del__(self):
+        # Garbage collection can run on any thread after the connection went back to the pool (or on to
+        # another borrower), so only the timing is recorded here; no EXPLAIN is issued
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+
+class InstrumentedConnection:
+    # Delegates everything to the MySQL connection; only cursor() is wrapped
+    def __init__(self, conn):
+        self.__dict__["_conn"] = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self)
+
+    def explain(self, statement, params):
+        # Best effort: the connection may still have unread results from the slow statement
+        try:
+            cursor = self._conn.cursor(dictionary=True, buffered=True)
+            try:
+                cursor.execute("EXPLAIN " + statement, params or ())
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+
+
+def recent(limit=None):
+    with _lock:
+        records = list(_records)
+    return records[-limit:] if limit else records
+
+
+def summary():
+    # Per fingerprint: calls, total and max seconds, rows and bytes, most expensive first
+    totals = {}
+    for record in recent():
+        entry = totals.setdefault(record["fingerprint_id"], {
+            "fingerprint": record["fingerprint"], "sections": set(), "calls": 0,
+            "seconds_total": 0.0, "seconds_max": 0.0, "rows": 0, "bytes": 0,
+        })
+        entry["sections"].add(record["section"])
+        entry["calls"] += 1
+        entry["seconds_total"] += record["seconds"]
+        entry["seconds_max"] = max(entry["seconds_max"], record["seconds"])
+        entry["rows"] += record["rows"]
+        entry["bytes"] += record["bytes"]
+    for entry in totals.values():
+        entry["sections"] = ", ".join(sorted(filter(None, entry["sections"])))
+    return sorted(totals.values(), key=lambda entry: entry["seconds_total"], reverse=True)
+
+
+def slow_queries():
+    return [record for record in recent() if "plan" in record]
@@ -0,0 +1,371 @@
+import datetime
+import itertools
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from database import data_watermarks, fingerprint_of
+
+
+SEGMENT_OPTIONS = ["new customers", "lost customers", "regular customers", "loyal customers", "top customers"]
+
+# RFM codes (recency, frequency, monetary tiles) that make up each segment, as in the SQL CASE below
+SEGMENT_CODES = {
+    "new customers": ["311", "312"],
+    "lost customers": ["111", "121", "131", "122", "133", "113", "112", "132"],
+    "regular customers": ["212", "313", "123", "221", "211", "232"],
+    "loyal customers": ["223", "222", "213", "322", "231", "321", "331"],
+    "top customers": ["333", "332", "323", "233"],
+}
+
+# 3x3x3 lookup array: SEGMENT_LOOKUP[r - 1, f - 1, m - 1] is the index of the segment in SEGMENT_OPTIONS
+SEGMENT_LOOKUP = np.full((3, 3, 3), -1, dtype=np.int8)
+for _index, _segment in enumerate(SEGMENT_OPTIONS):
+    for _code in SEGMENT_CODES[_segment]:
+        SEGMENT_LOOKUP[int(_code[0]) - 1, int(_code[1]) - 1, int(_code[2]) - 1] = _index
+
+# "sql" scores with NTILE on the server, "local" fetches plain aggregates and scores them with NumPy
+RFM_BACKEND = os.environ.get("RFM_BACKEND", "sql")
+
+# Fraction of customers that may change before the cached tile cut points are recomputed
+RFM_DRIFT_THRESHOLD = float(os.environ.get("RFM_DRIFT_THRESHOLD", 0.05))
+
+# Per-customer R/F/M table with both the 3-tile scores (segments) and the 5-tile scores (top customers),
+# read from the customer_rfm_agg table that the write forms keep up to date
+RFM_QUERY = """
+    WITH rfm_data AS (
+        SELECT
+            customer_id,
+            gender,
+            age,
+            DATEDIFF('2024-01-01', last_invoice_date) AS last_date_order,
+            total_quantity AS total_orders,
+            CAST(revenue AS DECIMAL(10, 2)) AS revenue
+        FROM
+            customer_rfm_agg
+    ),
+    rfm_calc AS (
+        SELECT *,
+            NTILE(3) OVER (ORDER BY last_date_order) AS rfm_recency,
+            NTILE(3) OVER (ORDER BY total_orders) AS rfm_frequency,
+            NTILE(3) OVER (ORDER BY revenue) AS rfm_monetary,
+            NTILE(5) OVER (ORDER BY last_date_order) AS rfm_recency_5,
+            NTILE(5) OVER (ORDER BY total_orders) AS rfm_frequency_5,
+            NTILE(5) OVER (ORDER BY revenue) AS rfm_monetary_5
+        FROM rfm_data
+    )
+    SELECT customer_id, gender, age, last_date_order, total_orders, revenue,
+        rfm_recency, rfm_frequency, rfm_monetary,
+        rfm_recency + rfm_frequency + rfm_monetary AS rfm_score,
+        CONCAT(rfm_recency, rfm_frequency, rfm_monetary) AS rfm,
+        CASE
+            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('311', '312', '311') THEN 'new customers'
+            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('111', '121', '131', '122', '133', '113', '112', '132') THEN 'lost customers'
+            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('212', '313', '123', '221', '211', '232') THEN 'regular customers'
+            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('223', '222', '213', '322', '231', '321', '331') THEN 'loyal customers'
+            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('333', '332', '323', '233') THEN 'top customers'
+        END AS rfm_segment,
+        rfm_recency_5, rfm_frequency_5, rfm_monetary_5,
+        rfm_recency_5 + rfm_frequency_5 + rfm_monetary_5 AS rfm_score_5
+    FROM rfm_calc;
+"""
+
+# Plain per-customer aggregates for the local backend: no window functions, so no server-side sort
+RFM_AGGREGATE_QUERY = """
+    SELECT
+        customer_id,
+        gender,
+        age,
+        DATEDIFF('2024-01-01', last_invoice_date) AS last_date_order,
+        total_quantity AS total_orders,
+        CAST(revenue AS DECIMAL(10, 2)) AS revenue
+    FROM
+        customer_rfm_agg
+"""
+
+# In-place maintenance of customer_rfm_agg; both are primary-key operations, so O(log n) per write.
+# gender and age follow the rebuilds' MAX() (ignoring NULLs), so an upsert and a rebuild agree.
+AGGREGATE_ADD_INVOICE = """
+    INSERT INTO customer_rfm_agg (customer_id, gender, age, last_invoice_date, invoice_count, total_quantity, revenue)
+    VALUES (%s, %s, %s, %s, 1, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        gender = GREATEST(COALESCE(gender, VALUES(gender)), COALESCE(VALUES(gender), gender)),
+        age = GREATEST(COALESCE(age, VALUES(age)), COALESCE(VALUES(age), age)),
+        last_invoice_date = GREATEST(last_invoice_date, VALUES(last_invoice_date)),
+        invoice_count = invoice_count + 1,
+        total_quantity = total_quantity + VALUES(total_quantity),
+        revenue = revenue + VALUES(revenue)
+"""
+
+AGGREGATE_REBUILD_CUSTOMER = """
+    INSERT INTO customer_rfm_agg (customer_id, gender, age, last_invoice_date, invoice_count, total_quantity, revenue)
+    SELECT customer_id, MAX(gender), MAX(age), MAX(invoice_date), COUNT(*), SUM(quantity), SUM(price * quantity)
+    FROM customer_data
+    WHERE customer_id = %s
+    GROUP BY customer_id
+"""
+
+AGGREGATE_REBUILD_ALL = """
+    INSERT INTO customer_rfm_agg (customer_id, gender, age, last_invoice_date, invoice_count, total_quantity, revenue)
+    SELECT customer_id, MAX(gender), MAX(age), MAX(invoice_date), COUNT(*), SUM(quantity), SUM(price * quantity)
+    FROM customer_data
+    GROUP BY customer_id
+"""
+
+# (value column, tile column, number of tiles) for every tile the RFM table carries
+TILE_COLUMNS = [
+    ("last_date_order", "rfm_recency", 3),
+    ("total_orders", "rfm_frequency", 3),
+    ("revenue", "rfm_monetary", 3),
+    ("last_date_order", "rfm_recency_5", 5),
+    ("total_orders", "rfm_frequency_5", 5),
+    ("revenue", "rfm_monetary_5", 5),
+]
+
+AGGREGATE_COLUMNS = ["customer_id", "gender", "age", "last_date_order", "total_orders", "revenue"]
+
+CLASSIFIER_FEATURES = ["total_orders", "revenue", "rfm_recency", "rfm_frequency", "rfm_monetary"]
+
+
+class RFMTable:
+    # In-memory RFM result; every RFM view is a slice of this one frame. version increases with every
+    # load and patch in this process; watermarks are the durable data version the frame reflects.
+    # Sessions share the table, so the frame is never edited in place: a patch builds a new frame and
+    # swaps the reference, and readers take self.df once.
+    def __init__(self, df, version, watermarks=(None, None)):
+        self.df = df.set_index("customer_id", drop=False)
+        self.df.index.name = None
+        self.version = version
+        self.watermarks = tuple(watermarks)
+        # Version the frame was loaded at, and the version of every customer patched in since then
+        self.built_version = version
+        self.changed_at = {}
+        self.changes_since_scoring = 0
+        self._cut_points = None
+
+    @property
+    def fingerprint(self):
+        # Same key as database.data_fingerprint() for the data this frame reflects
+        return fingerprint_of(self.watermarks)
+
+    def cut_points(self):
+        # Largest value in each tile but the last; a new value's tile is then one searchsorted away
+        if self._cut_points is None:
+            df = self.df
+            cut_points = {}
+            for value, tile, n_tiles in TILE_COLUMNS:
+                maxima = df.groupby(tile)[value].max().reindex(range(1, n_tiles + 1))
+                cut_points[tile] = maxima.to_numpy(dtype=float)[:-1]
+            self._cut_points = cut_points
+        return self._cut_points
+
+    def score_customer(self, row):
+        cut_points = self.cut_points()
+        scores = {tile: int(np.searchsorted(cut_points[tile], float(row[value]), side="left")) + 1
+                  for value, tile, _ in TILE_COLUMNS}
+        r, f, m = scores["rfm_recency"], scores["rfm_frequency"], scores["rfm_monetary"]
+        scores["rfm_score"] = r + f + m
+        scores["rfm"] = f"{r}{f}{m}"
+        scores["rfm_segment"] = SEGMENT_OPTIONS[SEGMENT_LOOKUP[r - 1, f - 1, m - 1]]
+        scores["rfm_score_5"] = scores["rfm_recency_5"] + scores["rfm_frequency_5"] + scores["rfm_monetary_5"]
+        return scores
+
+    def rescore(self):
+        self.df = score_rfm(self.df[AGGREGATE_COLUMNS])
+        self.changes_since_scoring = 0
+        self._cut_points = None
+
+    def apply_customer(self, customer_id, row, version):
+        # Patch one customer's aggregates (row is None when the customer no longer has invoices)
+        if row is None:
+            self.df = self.df.drop(index=customer_id, errors="ignore")
+        else:
+            row = dict(row, revenue=float(row["revenue"]))
+            cut_points = self.cut_points()
+            if any(np.isnan(points).any() for points in cut_points.values()):
+                # Too few customers to fill every tile; exact rescoring is cheap at this size
+                self.changes_since_scoring = len(self.df)
+                scores = {}
+            else:
+                scores = self.score_customer(row)
+            record = {**row, **scores}
+            if customer_id in self.df.index:
+                df = self.df.copy()
+                df.loc[customer_id, list(record)] = list(record.values())
+                self.df = df
+            else:
+                new_row = pd.DataFrame([record], index=[customer_id])
+                self.df = pd.concat([self.df, new_row])
+        self.version = version
+        self.changed_at[customer_id] = version
+        self.changes_since_scoring += 1
+
+        # Cut points only move once enough customers changed; recompute them lazily past that drift
+        if self.changes_since_scoring > RFM_DRIFT_THRESHOLD * max(len(self.df), 1):
+            self.rescore()
+
+    def segment_counts(self):
+        segment_counts = self.df["rfm_segment"].value_counts()
+        segment_counts = segment_counts[segment_counts > 0].reset_index()
+        segment_counts.columns = ["Segment", "Count"]
+        return segment_counts
+
+    def classifier_data(self):
+        df = self.df
+        return df[CLASSIFIER_FEATURES], df["rfm_segment"]
+
+    def top_customers(self, n):
+        top = self.df.nlargest(n, "rfm_score_5")
+        top = top[["customer_id", "total_orders", "revenue", "last_date_order", "rfm_score_5"]]
+        return top.rename(columns={"rfm_score_5": "rfm_score"}).reset_index(drop=True)
+
+    def customers_in_segment(self, segment):
+        df = self.df
+        segment_df = df[df["rfm_segment"] == segment]
+        columns = ["customer_id", "gender", "age", "total_orders", "revenue", "rfm_score", "rfm_segment"]
+        return segment_df[columns].reset_index(drop=True)
+
+
+def ntile(values, n):
+    # Same bucketing as SQL NTILE(n) OVER (ORDER BY values): the first size % n buckets get one extra row
+    values = np.asarray(values)
+    size = len(values)
+    order = np.argsort(values, kind="stable")
+    bucket_sizes = np.full(n, size // n)
+    bucket_sizes[:size % n] += 1
+    bounds = np.cumsum(bucket_sizes)
+    tiles = np.empty(size, dtype=np.int8)
+    tiles[order] = np.searchsorted(bounds, np.arange(size), side="right") + 1
+    return tiles
+
+
+def score_rfm(df):
+    # Vectorized equivalent of RFM_QUERY over a frame of per-customer aggregates
+    df = df.copy()
+    recency, frequency, monetary = df["last_date_order"], df["total_orders"], df["revenue"]
+
+    r, f, m = ntile(recency, 3), ntile(frequency, 3), ntile(monetary, 3)
+    df["rfm_recency"], df["rfm_frequency"], df["rfm_monetary"] = r, f, m
+    df["rfm_score"] = r.astype(np.int16) + f + m
+    # A string like RFM_QUERY's CONCAT, so every backend and patched rows carry the same type
+    df["rfm"] = (r.astype(np.int16) * 100 + f.astype(np.int16) * 10 + m).astype(str)
+    df["rfm_segment"] = pd.Categorical.from_codes(SEGMENT_LOOKUP[r - 1, f - 1, m - 1], SEGMENT_OPTIONS)
+    r5, f5, m5 = ntile(recency, 5), ntile(frequency, 5), ntile(monetary, 5)
+    df["rfm_recency_5"], df["rfm_frequency_5"], df["rfm_monetary_5"] = r5, f5, m5
+    df["rfm_score_5"] = r5.astype(np.int16) + f5 + m5
+    return df
+
+
+def _fetch_frame(conn, query, params=None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return pd.DataFrame(cursor.fetchall(), columns=cursor.column_names)
+    finally:
+        cursor.close()
+
+
+def load_rfm(conn, backend=None):
+    backend = backend or RFM_BACKEND
+    if backend == "sql":
+        df = _fetch_frame(conn, RFM_QUERY)
+        df["revenue"] = df["revenue"].astype(float)
+        return df
+    if backend == "local":
+        df = _fetch_frame(conn, RFM_AGGREGATE_QUERY)
+        df["revenue"] = df["revenue"].astype(float)
+        return score_rfm(df)
+    raise ValueError(f"Unknown RFM backend: {backend!r} (expected 'sql' or 'local')")
+
+
+def rfm_mismatches(sql_df, local_df):
+    # Rows whose scores differ between backends, ignoring customers tied on a value that straddles a
+    # tile boundary (NTILE gives no ordering guarantee inside ties)
+    merged = sql_df.merge(local_df, on="customer_id", suffixes=("_sql", "_local"))
+    mismatched = pd.Series(False, index=merged.index)
+    for value, score in [("last_date_order", "rfm_recency"), ("total_orders", "rfm_frequency"),
+                         ("revenue", "rfm_monetary")]:
+        differs = merged[f"{score}_sql"].astype(int) != merged[f"{score}_local"].astype(int)
+        tiles_per_value = merged.groupby(f"{value}_sql")[f"{score}_sql"].transform("nunique")
+        mismatched |= differs & (tiles_per_value == 1)
+    return merged[mismatched]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_versions = itertools.count(1)
+
+# Writes since a table's watermarks other than the one being patched in: rows of other customers changed,
+# and invoices deleted other than the one the caller deleted
+OTHER_WRITES_QUERY = """
+    SELECT (SELECT MAX(updated_at) FROM customer_data),
+           (SELECT MAX(deleted_at) FROM customer_data_deletes),
+           (SELECT COUNT(*) FROM customer_data WHERE updated_at > %s AND customer_id <> %s),
+           (SELECT COUNT(*) FROM customer_data_deletes WHERE deleted_at > %s AND invoice_number <> %s)
+"""
+
+
+def get_rfm_table(conn):
+    # Built once per durable data version (database.data_fingerprint) and shared by every session in the
+    # process, so writes from other processes (ingest.py, summaries.py --refresh) reach it too
+    watermarks = tuple(data_watermarks(conn))
+    table = _cache.get("rfm")
+    if table is not None and table.watermarks == watermarks:
+        return table
+    with _cache_lock:
+        table = _cache.get("rfm")
+        if table is None or table.watermarks != watermarks:
+            # Watermarks read before the frame: a write in between only makes the next call rebuild
+            table = RFMTable(load_rfm(conn), next(_versions), watermarks)
+            _cache["rfm"] = table
+    return table
+
+
+def add_invoice(cursor, customer_id, gender, age, invoice_date, quantity, price):
+    # Call in the same transaction as the INSERT INTO customer_data
+    cursor.execute(AGGREGATE_ADD_INVOICE, (customer_id, gender, age, invoice_date, quantity, price * quantity))
+
+
+def rebuild_customer(cursor, customer_id):
+    # Call in the same transaction as an UPDATE/DELETE on customer_data; uses the customer_id index
+    cursor.execute("DELETE FROM customer_rfm_agg WHERE customer_id = %s", (customer_id,))
+    cursor.execute(AGGREGATE_REBUILD_CUSTOMER, (customer_id,))
+
+
+def rebuild_aggregates(conn):
+    # Recompute customer_rfm_agg from scratch, e.g. after rows were loaded without add_invoice
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM customer_rfm_agg")
+        cursor.execute(AGGREGATE_REBUILD_ALL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def customer_changed(conn, customer_id, deleted_invoice=None):
+    # Call after committing a write to one customer's invoices (deleted_invoice: the invoice a delete
+    # removed). The cached table is patched when that write is the only one since it was loaded or last
+    # patched; otherwise its watermarks no longer match and it is rebuilt on next use.
+    with _cache_lock:
+        table = _cache.get("rfm")
+        if table is None:
+            return
+        updated_at, deleted_at = (mark or datetime.datetime.min for mark in table.watermarks)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(OTHER_WRITES_QUERY, (updated_at, customer_id, deleted_at, deleted_invoice or ""))
+            max_updated_at, max_deleted_at, other_updates, other_deletes = cursor.fetchone()
+        finally:
+            cursor.close()
+        if other_updates or other_deletes:
+            return
+        df = _fetch_frame(conn, RFM_AGGREGATE_QUERY + " WHERE customer_id = %s", (customer_id,))
+        row = df.iloc[0].to_dict() if len(df) else None
+        table.apply_customer(customer_id, row, next(_versions))
+        table.watermarks = (max_updated_at, max_deleted_at)
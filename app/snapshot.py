@@ -0,0 +1,318 @@
+"""Columnar local snapshot of customer_data.
+
+The first sync exports the table to Parquet, partitioned by invoice month. Later syncs only pull rows
+whose updated_at is past the last watermark (less an overlap for late commits) plus the tombstones of
+deleted invoices, and rewrite just the partitions those rows touch.
+
+    cd app
+    python snapshot.py   # sync now
+"""
+import datetime
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from filelock import FileLock
+from pyarrow import fs
+
+from data_view import CUSTOMER_COLUMNS
+from database import borrow_connection, data_fingerprint
+
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot"))
+SNAPSHOT_SYNC_INTERVAL = float(os.environ.get("SNAPSHOT_SYNC_INTERVAL", 60))
+# Seconds behind the watermarks each delta sync re-reads; should exceed the longest write transaction
+SNAPSHOT_SYNC_OVERLAP = float(os.environ.get("SNAPSHOT_SYNC_OVERLAP", 600))
+FETCH_CHUNK_ROWS = 100_000
+
+# Stored dictionary-encoded and read back as pandas categoricals
+CATEGORICAL_COLUMNS = ["gender", "category", "payment_method", "shopping_mall"]
+
+SNAPSHOT_COLUMNS = CUSTOMER_COLUMNS + ["updated_at"]
+
+_lock = threading.Lock()
+_last_sync = {"fingerprint": None, "time": 0.0}
+_frames = {}
+
+
+def _data_dir():
+    return os.path.join(SNAPSHOT_DIR, "data")
+
+
+def _partition_file(month):
+    return os.path.join(_data_dir(), f"invoice_month={month}", "part.parquet")
+
+
+def _read_state():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "state.json")) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    for key in ["watermark", "delete_watermark"]:
+        state[key] = datetime.datetime.fromisoformat(state[key]) if state[key] else None
+    return state
+
+
+def _write_state(state):
+    serialized = {key: value.isoformat() if isinstance(value, datetime.datetime) else value
+                  for key, value in state.items()}
+    tmp_path = os.path.join(SNAPSHOT_DIR, "state.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(serialized, f)
+    os.replace(tmp_path, os.path.join(SNAPSHOT_DIR, "state.json"))
+
+
+def _to_arrow(rows, columns):
+    df = pd.DataFrame(rows, columns=columns)
+    df["price"] = df["price"].astype("float64")
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype("category")
+    df["invoice_date"] = pd.to_datetime(df["invoice_date"])
+    months = df["invoice_date"].dt.strftime("%Y-%m")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table, months
+
+
+def _stream(conn, query, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK_ROWS)
+            if not rows:
+                break
+            yield rows, cursor.column_names
+    finally:
+        cursor.close()
+
+
+def _max_deleted_at(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(deleted_at) FROM customer_data_deletes")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def full_export(conn):
+    # Stream the whole table into one Parquet file per invoice month
+    delete_watermark = _max_deleted_at(conn)
+    staging_dir = os.path.join(SNAPSHOT_DIR, "data.staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    writers, watermark, rows_written = {}, None, 0
+    try:
+        for rows, columns in _stream(conn, f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM customer_data"):
+            table, months = _to_arrow(rows, columns)
+            for month in months.unique():
+                part = table.filter(pa.array((months == month).to_numpy()))
+                if month not in writers:
+                    path = os.path.join(staging_dir, f"invoice_month={month}", "part.parquet")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    writers[month] = pq.ParquetWriter(path, part.schema)
+                writers[month].write_table(part.cast(writers[month].schema))
+            batch_max = pc.max(table["updated_at"]).as_py()
+            watermark = batch_max if watermark is None else max(watermark, batch_max)
+            rows_written += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    os.makedirs(staging_dir, exist_ok=True)
+    shutil.rmtree(_data_dir(), ignore_errors=True)
+    os.replace(staging_dir, _data_dir())
+    return {"watermark": watermark, "delete_watermark": delete_watermark}, rows_written
+
+
+def _present(invoice_numbers):
+    # {invoice_number: (updated_at, invoice month)} for the given invoices currently in the snapshot
+    if not os.path.isdir(_data_dir()) or not len(invoice_numbers):
+        return {}
+    dataset = ds.dataset(_data_dir(), format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    table = dataset.to_table(columns=["invoice_number", "updated_at", "invoice_month"],
+                             filter=pc.field("invoice_number").isin(invoice_numbers))
+    return {invoice: (updated, str(month)) for invoice, updated, month in zip(
+        table["invoice_number"].to_pylist(), table["updated_at"].to_pylist(), table["invoice_month"].to_pylist())}
+
+
+def delta_sync(conn, state):
+    # Rows changed and invoices deleted since the watermarks, less SNAPSHOT_SYNC_OVERLAP: updated_at and
+    # deleted_at are stamped when a statement runs, so a transaction that commits after a sync can carry
+    # stamps behind that sync's watermark. Rows re-read from the overlap that the snapshot already has are
+    # skipped, so an unchanged overlap rewrites nothing.
+    overlap = datetime.timedelta(seconds=SNAPSHOT_SYNC_OVERLAP)
+    earliest = datetime.datetime.min + overlap
+    since = max(state["watermark"] or earliest, earliest) - overlap
+    deletes_since = max(state["delete_watermark"] or earliest, earliest) - overlap
+    changed = [_to_arrow(rows, columns) for rows, columns in _stream(
+        conn, f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM customer_data WHERE updated_at > %s", (since,))]
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT invoice_number, deleted_at FROM customer_data_deletes WHERE deleted_at > %s",
+                       (deletes_since,))
+        deletes = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not changed and not deletes:
+        return state, 0
+
+    changed_table = pa.concat_tables([table for table, _ in changed], promote_options="permissive") \
+        if changed else None
+    changed_months = pd.concat([months for _, months in changed], ignore_index=True) if changed \
+        else pd.Series([], dtype=object)
+
+    watermark = state["watermark"]
+    if changed_table is not None and len(changed_table):
+        watermark = max(filter(None, [watermark, pc.max(changed_table["updated_at"]).as_py()]))
+    delete_watermark = max([state["delete_watermark"] or datetime.datetime.min] + [at for _, at in deletes])
+    new_state = {"watermark": watermark, "delete_watermark": delete_watermark}
+
+    # A delete only wins over a changed row if it happened after that row's last change
+    deleted_at = {}
+    for invoice_number, at in deletes:
+        deleted_at[invoice_number] = max(at, deleted_at.get(invoice_number, at))
+    changed_invoices = changed_table["invoice_number"].to_pylist() if changed_table is not None else []
+    changed_updated = changed_table["updated_at"].to_pylist() if changed_table is not None else []
+    keep = [deleted_at.get(invoice, datetime.datetime.min) < updated
+            for invoice, updated in zip(changed_invoices, changed_updated)]
+
+    # Rows the snapshot already holds at the same updated_at are not rewritten, and neither are deletes of
+    # invoices it no longer has
+    present = _present(pa.array(list(set(deleted_at) | set(changed_invoices)), pa.string()))
+    unchanged = {invoice for invoice, updated, kept in zip(changed_invoices, changed_updated, keep)
+                 if kept and invoice in present and present[invoice][0] == updated}
+    keep = [kept and invoice not in unchanged for invoice, kept in zip(changed_invoices, keep)]
+    if changed_table is not None:
+        changed_table = changed_table.filter(pa.array(keep, pa.bool_()))
+        changed_months = changed_months[keep].reset_index(drop=True)
+
+    added = set(changed_table["invoice_number"].to_pylist()) if changed_table is not None else set()
+    removed = ((set(deleted_at) - unchanged) | added) & set(present)
+    removed_keys = pa.array(list(removed), pa.string())
+
+    # Rewrite only the partitions that hold a removed/changed invoice or receive a changed row
+    touched = set(changed_months.unique()) | {present[invoice][1] for invoice in removed}
+    if not touched:
+        return new_state, 0
+
+    for month in touched:
+        parts = []
+        path = _partition_file(month)
+        if os.path.exists(path):
+            current = pq.read_table(path, memory_map=True)
+            parts.append(current.filter(pc.invert(pc.is_in(current["invoice_number"], value_set=removed_keys))))
+        if changed_table is not None:
+            parts.append(changed_table.filter(pa.array((changed_months == month).to_numpy())))
+        merged = pa.concat_tables(parts, promote_options="permissive")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if len(merged) == 0:
+            shutil.rmtree(os.path.dirname(path))
+            continue
+        pq.write_table(merged, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    return new_state, len(removed | added)
+
+
+def sync(conn):
+    # The file lock keeps the app and the CLI (or two app processes) from rewriting the snapshot at once;
+    # the state is read inside it, so a sync never starts from a watermark another process has moved
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with FileLock(os.path.join(SNAPSHOT_DIR, "sync.lock")):
+        state = _read_state()
+        if state is None or not os.path.isdir(_data_dir()):
+            new_state, rows = full_export(conn)
+            generation = 1
+        else:
+            new_state, rows = delta_sync(conn, state)
+            generation = state["generation"] + (1 if rows else 0)
+        new_state["generation"] = generation
+        _write_state(new_state)
+    return rows
+
+
+def ensure_fresh(conn):
+    # Sync when customer_data changed (from any process), and every SNAPSHOT_SYNC_INTERVAL seconds for late
+    # commits that do not move the fingerprint
+    with _lock:
+        fingerprint = data_fingerprint(conn)
+        if _last_sync["fingerprint"] == fingerprint and time.monotonic() - _last_sync["time"] < SNAPSHOT_SYNC_INTERVAL:
+            return
+        sync(conn)
+        _last_sync["fingerprint"] = fingerprint
+        _last_sync["time"] = time.monotonic()
+
+
+def read_snapshot(columns=None):
+    # Memory-mapped Arrow table; dictionary-encoded columns stay dictionary-encoded
+    columns = columns or CUSTOMER_COLUMNS
+    dataset = ds.dataset(_data_dir(), format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    if not dataset.files:
+        return pa.table({column: pa.array([], pa.null()) for column in columns})
+    return dataset.to_table(columns=columns)
+
+
+def row_count():
+    # From the Parquet footers; no data is read
+    dataset = ds.dataset(_data_dir(), format="parquet", partitioning="hive")
+    return dataset.count_rows() if dataset.files else 0
+
+
+def iter_frames(conn, columns=None, chunk_rows=FETCH_CHUNK_ROWS):
+    # Pandas chunks of the snapshot for passes over tables larger than memory
+    ensure_fresh(conn)
+    columns = columns or CUSTOMER_COLUMNS
+    dataset = ds.dataset(_data_dir(), format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def sample_frame(conn, rows, columns=None, seed=42):
+    # Uniform sample of about `rows` snapshot rows (every row when there are fewer), read chunk by chunk so
+    # memory holds the sample and one chunk; the same for a given snapshot and seed
+    ensure_fresh(conn)
+    fraction = min(1.0, rows / max(row_count(), 1))
+    rng = np.random.default_rng(seed)
+    parts = [frame[rng.random(len(frame)) < fraction] if fraction < 1.0 else frame
+             for frame in iter_frames(conn, columns)]
+    if not parts:
+        return read_snapshot(columns).to_pandas()
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_frame(conn, columns=None):
+    # Pandas view of the snapshot (categoricals for the dictionary columns), cached per snapshot generation
+    ensure_fresh(conn)
+    generation = _read_state()["generation"]
+    key = (generation, tuple(columns or CUSTOMER_COLUMNS))
+    frame = _frames.get(key)
+    if frame is None:
+        frame = read_snapshot(columns).to_pandas()
+        _frames.clear()
+        _frames[key] = frame
+    return frame
+
+
+if __name__ == "__main__":
+    with borrow_connection() as conn:
+        start = time.perf_counter()
+        rows = sync(conn)
+    print(f"Synced {rows} rows in {time.perf_counter() - start:.2f}s into {SNAPSHOT_DIR}")
+    sys.exit(0)
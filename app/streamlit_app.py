@@ -1,62 +1,39 @@
 import streamlit as st
-import pandas as pd
-from database import connect_to_db
-import plotly.express as px
-import numpy as np
-import re
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
-from sklearn.metrics import classification_report, accuracy_score, mean_squared_error
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-import datetime
-
-# Title of the app
+
+# Title of the app, drawn before the remaining imports so a cold start shows something right away
 st.title("Customer Insights and Segmentation Dashboard")
 
-# Connect to the database
-conn = connect_to_db()
-try:
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)
-    else:
-        raise Exception("Database connection is not active")
-except Exception as e:
-    st.error(f"Error: {e}")
-    st.stop()
-
-
-# Preprocessing Function
-def preprocess_data(data):
-    # Handle missing values
-    data = data.dropna()
-    
-    # Encode categorical variables
-    le_gender = LabelEncoder()
-    data['gender'] = le_gender.fit_transform(data['gender'])
-    
-    # Scale numeric features
-    scaler = MinMaxScaler()
-    data[['quantity', 'price']] = scaler.fit_transform(data[['quantity', 'price']])
-    
-    return data
+# Only what every run needs is imported here. Heavier libraries are imported by the section that uses
+# them (plotly in the chart pages, pyarrow's Parquet reader in Bulk Upload, sklearn behind `analytics`),
+# so a session pays for them the first time it opens one of those pages.
+# python -m benchmarks.import_benchmark checks the startup cost against a budget.
+import pandas as pd
+from database import borrow_connection, pool_stats
+from data_view import fetch_page, estimate_row_count, CUSTOMER_COLUMNS, PAGE_SIZES
+from migrate import ensure_schema
+from query_executor import run_concurrently
+from validation import CUSTOMER_VALIDATOR, GENDERS, CATEGORIES, PAYMENT_METHODS, SHOPPING_MALLS
+import analytics
+import query_cache
+import query_log
+import summaries
+from rfm import get_rfm_table, add_invoice, rebuild_customer, customer_changed, SEGMENT_OPTIONS
+import time
 
 
-# Sidebar Main Menu
-st.sidebar.title("Menu")
-main_menu = st.sidebar.selectbox(
-    "Main Menu",
-    ["Data Management", "Data Driven Insights"]
-)
+def plotly_express():
+    # Imported on the first visit to a chart page rather than at startup
+    import plotly.express as px
+    return px
+
 
 # View Data Section
-if main_menu == "Data Management":
-    menu = ["View Data", "Add Entry", "Update Entry", "Delete Entry", "Visualizations"]
+def data_management(conn, cursor, main_menu):
+    menu = ["View Data", "Add Entry", "Bulk Upload", "Update Entry", "Delete Entry", "Visualizations"]
     choice = st.sidebar.selectbox("Menu", menu)
+    query_log.set_section(f"{main_menu} / {choice}")
+
 
-    
     # View Data
     if choice == "View Data":
         st.subheader("View Customer Data")
@@ -72,176 +49,110 @@ if main_menu == "Data Management":
             search = st.button("Search")
         with col2:
             reset = st.button("Reset")
-        
-        # Initial page load: Display all records
-        if not search and not reset:
-            query = "SELECT * FROM customer_data"
-            cursor.execute(query)
-            data = cursor.fetchall()
-            df = pd.DataFrame(data)
-            st.dataframe(df)
-        
+
+        if "view_filters" not in st.session_state:
+            st.session_state.view_filters = {}
+            st.session_state.view_page_keys = [None]
+
         if search:
-            # Build the query with filters
-            query = "SELECT * FROM customer_data WHERE 1=1"
-            if custid:
-                query += f" AND customer_id = '{custid}'"
-            if invoice_number:
-                query += f" AND invoice_number = '{invoice_number}'"
-            if gender:
-                query += f" AND gender = '{gender}'"
-            if category:
-                query += f" AND category = '{category}'"
-            if shopping_mall:
-                query += f" AND shopping_mall = '{shopping_mall}'"
-        
-            cursor.execute(query)
-            data = cursor.fetchall()
-            df = pd.DataFrame(data)
-            st.dataframe(df)
+            # Apply the filters and start again from the first page
+            st.session_state.view_filters = {
+                "customer_id": custid,
+                "invoice_number": invoice_number,
+                "gender": gender,
+                "category": category,
+                "shopping_mall": shopping_mall,
+            }
+            st.session_state.view_page_keys = [None]
 
         if reset:
-            # Clear all input fields and show all records
-            custid = ""
-            invoice_number = ""
-            gender = ""
-            category = ""
-            shopping_mall = ""
-            
-            query = "SELECT * FROM customer_data"
-            cursor.execute(query)
-            data = cursor.fetchall()
-            df = pd.DataFrame(data)
-            st.dataframe(df)
-    
+            # Clear all filters and show all records
+            st.session_state.view_filters = {}
+            st.session_state.view_page_keys = [None]
+
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+        columns = st.multiselect("Columns", CUSTOMER_COLUMNS, default=CUSTOMER_COLUMNS)
+        if st.session_state.get("view_page_size") != page_size:
+            st.session_state.view_page_size = page_size
+            st.session_state.view_page_keys = [None]
+
+        # Only the current page is fetched and rendered
+        filters = st.session_state.view_filters
+        page_keys = st.session_state.view_page_keys
+        df, last_key, has_more = fetch_page(conn, columns, filters, after=page_keys[-1], page_size=page_size)
+        total = estimate_row_count(conn, filters)
+        st.caption(f"Page {len(page_keys)} of about {max(-(-total // page_size), 1):,} ({total:,} rows)")
+        st.dataframe(df)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Previous page", disabled=len(page_keys) == 1):
+                page_keys.pop()
+                st.rerun()
+        with col2:
+            if st.button("Next page", disabled=not has_more):
+                page_keys.append(last_key)
+                st.rerun()
+
     # Add Entry
     elif choice == "Add Entry":
         st.subheader("Add New Customer Entry")
         with st.form("add_form"):
             invoice_number = st.text_input("Invoice Number")
             invoice_number_error = st.empty()
-            
+        
             customer_id = st.text_input("Customer ID")
             customer_id_error = st.empty()
-            
-            gender = st.selectbox("Gender", ["Male", "Female"])
+        
+            gender = st.selectbox("Gender", GENDERS)
             gender_error = st.empty()
-            
+        
             age = st.number_input("Age", min_value=1, max_value=120)
             age_error = st.empty()
-            
-            category = st.selectbox("Category",[
-            "Books",
-            "Clothing",
-            "Cosmetics",
-            "Food & Beverage",
-            "Shoes",
-            "Souvenir",
-            "Technology",
-            "Toys"])
+        
+            category = st.selectbox("Category", CATEGORIES)
             category_error = st.empty()
-            
+        
             quantity = st.number_input("Quantity", min_value=1)
             quantity_error = st.empty()
-            
+        
             price = st.number_input("Price", min_value=0.0)
             price_error = st.empty()
-            
-            payment_method = st.selectbox("Payment Method",[ "Cash", "Credit Card", "Debit Card"])
+        
+            payment_method = st.selectbox("Payment Method", PAYMENT_METHODS)
             payment_method_error = st.empty()
-            
+        
             invoice_date = st.date_input("Invoice Date")
             invoice_date_error = st.empty()
-            
-            shopping_mall = st.selectbox("Shopping Mall",[
-                "Cevahir AVM",
-                "Emaar Square Mall",
-                "Forum Istanbul",
-                "Istinye Park",
-                "Kanyon",
-                "Mall of Istanbul",
-                "Metrocity",
-                "Metropol AVM",
-                "Viaport Outlet",
-                "Zorlu Center", ])
-            
+        
+            shopping_mall = st.selectbox("Shopping Mall", SHOPPING_MALLS)
+        
             shopping_mall_error = st.empty()
-            
+        
             #location = st.text_input("Location")
             submitted = st.form_submit_button("Add Entry")
 
             if submitted:
-                has_error = False
-                
-                if not invoice_number:
-                    invoice_number_error.error("Invoice Number is required.")
-                    has_error = True
-                elif not re.match("^[a-zA-Z0-9]*$", invoice_number):
-                    invoice_number_error.error("Invoice Number should be alphanumeric.")
-                    has_error = True
-                else:
-                    invoice_number_error.empty()
-                
-                if not customer_id:
-                    customer_id_error.error("Customer ID is required.")
-                    has_error = True
-                elif not re.match("^[a-zA-Z0-9]*$", customer_id):
-                    customer_id_error.error("Customer ID should be alphanumeric.")
-                    has_error = True
-                else:
-                    customer_id_error.empty()
-                
-                if not gender:
-                    gender_error.error("Gender is required.")
-                    has_error = True
-                else:
-                    gender_error.empty()
-                
-                if not age:
-                    age_error.error("Age is required.")
-                    has_error = True
-                else:
-                    age_error.empty()
-                
-                if not category:
-                    category_error.error("Category is required.")
-                    has_error = True
-                else:
-                    category_error.empty()
-                
-                if not quantity:
-                    quantity_error.error("Quantity is required.")
-                    has_error = True
-                else:
-                    quantity_error.empty()
-                
-                if not price:
-                    price_error.error("Price is required.")
-                    has_error = True
-                else:
-                    price_error.empty()
-                
-                if not payment_method:
-                    payment_method_error.error("Payment Method is required.")
-                    has_error = True
-                else:
-                    payment_method_error.empty()
-                
-                if not invoice_date:
-                    invoice_date_error.error("Invoice Date is required.")
-                    has_error = True
-                elif invoice_date > datetime.date.today():
-                    invoice_date_error.error("Invoice Date cannot be in the future.")
-                    has_error = True
-                else:
-                    invoice_date_error.empty()
-                
-                if not shopping_mall:
-                    shopping_mall_error.error("Shopping Mall is required.")
-                    has_error = True
-                else:
-                    shopping_mall_error.empty()
-                
+                # Every field is checked against validation.CUSTOMER_SCHEMA, as bulk loads are
+                record = {
+                    "invoice_number": invoice_number, "customer_id": customer_id, "gender": gender, "age": age,
+                    "category": category, "quantity": quantity, "price": price,
+                    "payment_method": payment_method, "invoice_date": invoice_date, "shopping_mall": shopping_mall,
+                }
+                errors = CUSTOMER_VALIDATOR.validate_record(record)
+                error_slots = {
+                    "invoice_number": invoice_number_error, "customer_id": customer_id_error,
+                    "gender": gender_error, "age": age_error, "category": category_error,
+                    "quantity": quantity_error, "price": price_error, "payment_method": payment_method_error,
+                    "invoice_date": invoice_date_error, "shopping_mall": shopping_mall_error,
+                }
+                for column, slot in error_slots.items():
+                    if column in errors:
+                        slot.error(errors[column])
+                    else:
+                        slot.empty()
+                has_error = bool(errors)
+            
                 if not has_error:
                     query = """
                         INSERT INTO customer_data (invoice_number, customer_id, gender, age, category, quantity, price, payment_method, invoice_date, shopping_mall)
@@ -249,8 +160,38 @@ if main_menu == "Data Management":
                     """
                     values = (invoice_number, customer_id, gender, age, category, quantity, price, payment_method, invoice_date, shopping_mall)
                     cursor.execute(query, values)
+                    add_invoice(cursor, customer_id, gender, age, invoice_date, quantity, price)
+                    summaries.apply_rows(cursor, [{
+                        "invoice_date": invoice_date, "category": category, "age": age,
+                        "payment_method": payment_method, "gender": gender, "price": price, "quantity": quantity,
+                        "shopping_mall": shopping_mall,
+                    }], +1)
                     conn.commit()
+                    customer_changed(conn, customer_id)
                     st.success("New entry added successfully!")
+    # Bulk Upload
+    elif choice == "Bulk Upload":
+        import ingest
+
+        st.subheader("Upload Customer Data")
+        uploaded = st.file_uploader("CSV or Parquet file", type=["csv", "parquet"])
+        batch_rows = st.number_input("Rows per batch", min_value=1, value=ingest.BATCH_ROWS, step=100)
+        commit_every = st.number_input("Batches per transaction", min_value=1, value=ingest.COMMIT_EVERY)
+
+        if uploaded is not None and st.button("Load"):
+            # Rows are validated with the Add Entry rules; invalid rows are skipped and listed below
+            rejected_parts = []
+            with st.spinner("Loading..."):
+                stats = ingest.ingest(conn, uploaded, int(batch_rows), int(commit_every), rejected_parts.append)
+            st.success(f"Loaded {stats['rows_loaded']:,} of {stats['rows_read']:,} rows in "
+                       f"{stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} rows/sec)")
+            if rejected_parts:
+                rejected = pd.concat(rejected_parts, ignore_index=True)
+                st.warning(f"Rejected {len(rejected):,} rows")
+                st.dataframe(rejected.head(1000))
+                st.download_button("Download rejected rows", rejected.to_csv(index=False),
+                                   file_name="rejected_rows.csv", mime="text/csv")
+
     # Update Entry
     elif choice == "Update Entry":
         st.subheader("Update Customer Entry")
@@ -300,10 +241,15 @@ if main_menu == "Data Management":
                         SET age = %s, category = %s
                         WHERE customer_id = %s
                     """
+                    previous_rows = summaries.customer_rows(cursor, customer_id)
                     cursor.execute(update_query, (age, category, customer_id))
+                    rebuild_customer(cursor, customer_id)
+                    summaries.apply_rows(cursor, previous_rows, -1)
+                    summaries.apply_rows(cursor, summaries.customer_rows(cursor, customer_id), +1)
                     conn.commit()
+                    customer_changed(conn, customer_id)
                     st.success("Entry updated successfully!")
-                    
+                
                     # Clear session state after update
                     del st.session_state["result"]
                 except Exception as e:
@@ -326,7 +272,10 @@ if main_menu == "Data Management":
                     if result:
                         query_delete = "DELETE FROM customer_data WHERE customer_id = %s AND invoice_number = %s"
                         cursor.execute(query_delete, (customer_id, invoice_number))
+                        rebuild_customer(cursor, customer_id)
+                        summaries.apply_rows(cursor, [result], -1)
                         conn.commit()
+                        customer_changed(conn, customer_id, deleted_invoice=invoice_number)
                         st.success("Entry deleted successfully!")
                     else:
                         st.error("Customer ID or Invoice Number not found. Deletion failed.")
@@ -339,82 +288,65 @@ if main_menu == "Data Management":
 
 # Additional data visualizations
     elif choice == "Visualizations":
+        px = plotly_express()
+
         st.subheader("Data Visualizations")
 
+        # Every chart reads a pre-aggregated summary table instead of scanning customer_data.
+        # The reads are independent, so they run concurrently on separate pooled connections and
+        # each chart is drawn into its place as soon as its result arrives.
+        charts = {}
+
         # Revenue by Category
         st.write("### Total Revenue by Category")
-        query = "SELECT category, SUM(price * quantity) AS total_revenue FROM customer_data GROUP BY category;"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data, columns=["category", "total_revenue"])
-        fig = px.bar(df, x="category", y="total_revenue", title="Total Revenue by Category")
-        st.plotly_chart(fig)
+        charts["category_revenue"] = (summaries.CATEGORY_REVENUE_QUERY, st.empty(), lambda df: px.bar(
+            df, x="category", y="total_revenue", title="Total Revenue by Category"))
 
         # Customer Age Distribution
         st.write("### Customer Age Distribution")
-        query = "SELECT age FROM customer_data;"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data, columns=["age"])
-        fig = px.histogram(df, x="age", nbins=10, title="Customer Age Distribution")
-        st.plotly_chart(fig)
+        charts["age_counts"] = (summaries.AGE_COUNTS_QUERY, st.empty(), lambda df: px.histogram(
+            df, x="age", y="count", histfunc="sum", nbins=10, title="Customer Age Distribution"))
 
         # Sales Trends Over Time
         st.write("### Sales Trends Over Time")
-        query = "SELECT invoice_date, SUM(price * quantity) AS total_sales FROM customer_data GROUP BY invoice_date ORDER BY invoice_date;"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data, columns=["invoice_date", "total_sales"])
-        df["Invoice Date"] = pd.to_datetime(df["invoice_date"])
-        fig = px.line(df, x="invoice_date", y="total_sales", title="Sales Trends Over Time")
-        st.plotly_chart(fig)
+        charts["daily_sales"] = (summaries.DAILY_SALES_QUERY, st.empty(), lambda df: px.line(
+            df.assign(**{"Invoice Date": pd.to_datetime(df["invoice_date"])}),
+            x="invoice_date", y="total_sales", title="Sales Trends Over Time"))
 
         # Payment Method Usage
         st.write("### Payment Method Usage")
-        query = "SELECT payment_method, COUNT(*) AS count FROM customer_data GROUP BY payment_method;"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data, columns=["payment_method", "count"])
-        fig = px.pie(df, names="payment_method", values="count", title="Payment Method Usage")
-        st.plotly_chart(fig)
+        charts["payment_counts"] = (summaries.PAYMENT_COUNTS_QUERY, st.empty(), lambda df: px.pie(
+            df, names="payment_method", values="count", title="Payment Method Usage"))
 
-        # Query to fetch spending by gender
-        query = """
-        SELECT 
-        gender, 
-        SUM(quantity) AS orders, 
-        CAST(SUM(price) AS DECIMAL(10, 2)) AS revenue
-        FROM 
-        customer_data
-        GROUP BY 
-        gender
-        ORDER BY 
-        revenue DESC;
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
-
-        # Create DataFrame
-        df = pd.DataFrame(data, columns=["gender", "orders", "revenue"])
-
-        # Reshape DataFrame for grouped bar chart
-        df_melted = df.melt(id_vars="gender", 
-                        value_vars=["orders", "revenue"], 
-                        var_name="Metric", 
-                        value_name="Value")
+        tasks = {name: (lambda c, query=query: summaries.read_summary(c, query))
+                 for name, (query, _, _) in charts.items()}
+        timings = []
+        page_start = time.perf_counter()
+        for name, df, timing in run_concurrently(tasks, conn):
+            _, slot, chart = charts[name]
+            slot.plotly_chart(chart(df))
+            timings.append(dict(query=name, **timing))
+
+        with st.expander("Query timings"):
+            st.caption(f"Page queries finished in {time.perf_counter() - page_start:.3f}s "
+                       f"(sum of query times {sum(t['total_seconds'] for t in timings):.3f}s)")
+            st.dataframe(pd.DataFrame(timings).sort_values("total_seconds", ascending=False))
 
-            
 
 ########################################################
 # Data Driven Insights Section
-if main_menu == "Data Driven Insights":
+def data_driven_insights(conn, cursor, main_menu):
+    px = plotly_express()
+
     st.title("Data Driven Insights")
-    
+
     # Sub-menu for Customer Insights
     questions_menu = st.radio(
         "Choose a section",
-        ["Top Customers", "RFM Segmentation", "Sales Analysis: Age Group","Customer Segmentation"]
+        ["Top Customers", "RFM Segmentation", "Sales Analysis: Age Group","Customer Segmentation", "Sales Forecast",
+         "Similar Customers", "What-If Analysis"]
     )
+    query_log.set_section(f"{main_menu} / {questions_menu}")
 
     # Top Customers Section
     if questions_menu == "Top Customers":
@@ -422,201 +354,64 @@ if main_menu == "Data Driven Insights":
         # Add logic for Top Customers
         # Input: Number of top customers
         num_customers = st.slider("Select number of top customers", 5, 20, 10)
-        query =  """
-    WITH rfm_data AS (
-        SELECT
-            customer_id, 
-            gender, 
-            age, 
-          
-            DATEDIFF('2023-12-31', invoice_date) AS last_date_order,
-            SUM(quantity) AS total_orders,
-            CAST(SUM(price * quantity ) AS DECIMAL(10, 2)) AS revenue  
-        FROM 
-            customer_data
-        GROUP BY 
-            customer_id, gender, age
-    ),
-    rfm_calc AS (
-        SELECT *,
-             NTILE(5) OVER (ORDER BY last_date_order) AS rfm_recency,
-            NTILE(5) OVER (ORDER BY total_orders) AS rfm_frequency,
-            NTILE(5) OVER (ORDER BY revenue) AS rfm_monetary
-        FROM rfm_data
-    )
-    SELECT  customer_id, gender, age, last_date_order, total_orders, revenue,
-    rfm_recency , rfm_frequency , rfm_monetary ,
-        rfm_recency + rfm_frequency + rfm_monetary AS rfm_score
-     
-        
-    FROM rfm_calc order by rfm_score desc  limit """ + str(num_customers) +""";
-    """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data, columns=["customer_id", "total_orders", "revenue", "last_date_order", "rfm_score"])
-        from sklearn.preprocessing import StandardScaler
-
-        scaler = StandardScaler()
-        features = ["total_orders", "revenue", "last_date_order", "rfm_score"]
-        scaled_data = scaler.fit_transform(df[features])
-        from sklearn.cluster import KMeans
-
-        # User selects the number of clusters
-        num_clusters = st.slider("Select the number of clusters", 2, 10, 3)
-
-        # Apply K-Means
-        kmeans = KMeans(n_clusters=num_clusters, random_state=42)
-        df["Cluster"] = kmeans.fit_predict(scaled_data)
-
-        #     Display results
-        st.write(f"Customer Segments with {num_clusters} Clusters:")
-        df = df.drop(columns=["last_date_order"])
-        st.dataframe(df)
 
-        import plotly.express as px
+        # Every k in the slider range is fitted once per input (in parallel on large inputs) and cached,
+        # so moving the slider only looks up the stored labels
+        df, clusterings = analytics.cluster_top_customers(get_rfm_table(conn), num_customers)
+
+        if not clusterings:
+            st.info(f"Clustering needs at least {analytics.MIN_CLUSTER_CUSTOMERS} customers; "
+                    f"there are {len(df)}.")
+        else:
+            # User selects the number of clusters; with a single possible count there is nothing to slide
+            max_clusters = max(clusterings)
+            if max_clusters > 2:
+                num_clusters = st.slider("Select the number of clusters", 2, max_clusters, min(3, max_clusters))
+            else:
+                num_clusters = 2
+            df["Cluster"] = clusterings[num_clusters]["labels"]
+
+            # Elbow chart from the same sweep
+            elbow = analytics.sweep_summary(clusterings)
+            st.plotly_chart(px.line(elbow, x="clusters", y=["inertia", "silhouette"], markers=True,
+                                    facet_row="variable", title="Elbow and Silhouette by Number of Clusters")
+                            .update_yaxes(matches=None))
+
+            #     Display results
+            st.write(f"Customer Segments with {num_clusters} Clusters:")
+            df = df.drop(columns=["last_date_order"])
+            st.dataframe(df)
 
-        fig = px.scatter(df, x="total_orders", y="revenue", color="Cluster", 
-                 title="Customer Segments by Revenue and Orders",
-                 hover_data=["customer_id"])
-        st.plotly_chart(fig)
+            fig = px.scatter(df, x="total_orders", y="revenue", color="Cluster", 
+                     title="Customer Segments by Revenue and Orders",
+                     hover_data=["customer_id"])
+            st.plotly_chart(fig)
 
     # RFM Segmentation Section
     if questions_menu == "RFM Segmentation":
-       
-         # Query to calculate segmentation
-        query = """
-        WITH rfm_data AS (
-        SELECT
-            customer_id, 
-            gender, 
-            age, 
-          
-            DATEDIFF('2024-01-01', invoice_date) AS last_date_order,
-            SUM(quantity) AS total_orders,
-            CAST(SUM(price * quantity ) AS DECIMAL(10, 2)) AS revenue  
-        FROM 
-            customer_data
-        GROUP BY 
-            customer_id, gender, age, invoice_date,invoice_date,quantity,price
-    ),
-    rfm_calc AS (
-        SELECT *,
-            NTILE(3) OVER (ORDER BY last_date_order) AS rfm_recency,
-            NTILE(3) OVER (ORDER BY total_orders) AS rfm_frequency,
-            NTILE(3) OVER (ORDER BY revenue) AS rfm_monetary
-        FROM rfm_data
-    )
-    SELECT  customer_id, gender, age, last_date_order, total_orders, revenue, rfm_recency, rfm_frequency, rfm_monetary,
-        rfm_recency + rfm_frequency + rfm_monetary AS rfm_score,
-        CONCAT(rfm_recency, rfm_frequency, rfm_monetary) AS rfm,
-        CASE
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('311', '312', '311') THEN 'new customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('111', '121', '131', '122', '133', '113', '112', '132') THEN 'lost customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('212', '313', '123', '221', '211', '232') THEN 'regular customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('223', '222', '213', '322', '231', '321', '331') THEN 'loyal customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('333', '332', '323', '233') THEN 'top customers'
-        END AS rfm_segment
-    FROM rfm_calc;
-    """
-
-        # Execute the query
-        cursor.execute(query)
-        data = cursor.fetchall()
-
-        # Convert the result to a DataFrame
-        df = pd.DataFrame(data, columns=[
-        "customer_id", "gender", "age", 
-        "last_date_order", "total_orders", "revenue", "rfm_recency", 
-        "rfm_frequency", "rfm_monetary", "rfm_score", "rfm", "rfm_segment"
-        ])
+        # RFM scores and segments are computed once per data version and sliced for each view below
+        rfm_table = get_rfm_table(conn)
 
         # Visualization: Pie Chart for Segmentation
         st.write("### Segmentation Distribution")
-        segment_counts = df["rfm_segment"].value_counts().reset_index()
-        segment_counts.columns = ["Segment", "Count"]
+        segment_counts = rfm_table.segment_counts()
 
         fig = px.pie(
             segment_counts, 
             names="Segment", 
             values="Count", 
-            
+        
         )
         st.plotly_chart(fig)
-                 
+             
         ################ Decision tree #####################33
         st.header("RFM Segmentation Analysis (Decision Tree Classifier)")
 
-        # Fetches RFM data from the database
-        query = """
-        WITH rfm_data AS (
-            SELECT
-                customer_id, 
-                gender, 
-                age, 
-                DATEDIFF('2024-01-01', invoice_date) AS last_date_order,
-                SUM(quantity) AS total_orders,
-                CAST(SUM(price * quantity ) AS DECIMAL(10, 2)) AS revenue  
-            FROM 
-                customer_data
-            GROUP BY 
-                customer_id, gender, age, invoice_date, invoice_date, quantity, price
-        ),
-        rfm_calc AS (
-            SELECT *,
-                NTILE(3) OVER (ORDER BY last_date_order) AS rfm_recency,
-                NTILE(3) OVER (ORDER BY total_orders) AS rfm_frequency,
-                NTILE(3) OVER (ORDER BY revenue) AS rfm_monetary
-            FROM rfm_data
-        )
-        SELECT  
-            customer_id, gender, age, last_date_order, total_orders, revenue, 
-            rfm_recency, rfm_frequency, rfm_monetary,
-            rfm_recency + rfm_frequency + rfm_monetary AS rfm_score,
-            CONCAT(rfm_recency, rfm_frequency, rfm_monetary) AS rfm,
-            CASE
-                WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('311', '312', '311') THEN 'new customers'
-                WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('111', '121', '131', '122', '133', '113', '112', '132') THEN 'lost customers'
-                WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('212', '313', '123', '221', '211', '232') THEN 'regular customers'
-                WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('223', '222', '213', '322', '231', '321', '331') THEN 'loyal customers'
-                WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('333', '332', '323', '233') THEN 'top customers'
-            END AS rfm_segment
-        FROM rfm_calc;
-        """
-        
-        cursor.execute(query)
-        result = cursor.fetchall()
-
-        # Converting query result into a DataFrame
-        rfm_df = pd.DataFrame(result, columns=["customer_id", "gender", "age", "last_date_order", 
-                                            "total_orders", "revenue", "rfm_recency", 
-                                            "rfm_frequency", "rfm_monetary", "rfm_score", 
-                                            "rfm", "rfm_segment"])
-
-        # Prepare the data for Decision Tree Classification
-        features = ["total_orders", "revenue", "rfm_recency", "rfm_frequency", "rfm_monetary"]
-        X = rfm_df[features]
-        y = rfm_df["rfm_segment"]
-
-        # Encode categorical target variable
-        from sklearn.preprocessing import LabelEncoder
-        label_encoder = LabelEncoder()
-        y_encoded = label_encoder.fit_transform(y)
-
-        # Split the data into training and testing sets
-        from sklearn.model_selection import train_test_split
-        X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
-
-        # Train the Decision Tree Classifier
-        from sklearn.tree import DecisionTreeClassifier
-        clf = DecisionTreeClassifier(random_state=42, max_depth=5)
-        clf.fit(X_train, y_train)
-
-        # Predict and evaluate
-        y_pred = clf.predict(X_test)
+        # Decision Tree Classifier, trained once per data version; widget changes below only call predict
+        fitted = analytics.segment_tree(conn)
 
         # Calculate accuracy
-        from sklearn.metrics import accuracy_score
-        accuracy = accuracy_score(y_test, y_pred)
+        accuracy = fitted["accuracy"]
         st.subheader(f"Model Accuracy: {accuracy:.2f}")
 
         # Allow the user to input features for prediction
@@ -629,118 +424,41 @@ if main_menu == "Data Driven Insights":
             "rfm_monetary": st.number_input("Enter RFM Monetary ", value=2, step=1),
         }
 
-        # Convert user input into a DataFrame
-        user_df = pd.DataFrame([user_input])
-
         # Predict the segment for the input
-        predicted_segment = clf.predict(user_df)
-        segment_label = label_encoder.inverse_transform(predicted_segment)[0]
+        segment_label = analytics.predict_segment(fitted, user_input)
 
         st.subheader(f"Predicted Segment: {segment_label}")
 
         # Visualize feature importance
         st.subheader("Feature Importance")
-        importance = clf.feature_importances_
-        feature_importance_df = pd.DataFrame({"Feature": features, "Importance": importance})
-        feature_importance_df = feature_importance_df.sort_values(by="Importance", ascending=False)
+        feature_importance_df = analytics.feature_importance(fitted)
         st.bar_chart(feature_importance_df.set_index("Feature"))
 
         # Dropdown for selecting a customer segment
         st.header("Check customers based on their segments")
-        segment_options = ["new customers", "lost customers", "regular customers", "loyal customers", "top customers"]
+        segment_options = SEGMENT_OPTIONS
         selected_segment = st.selectbox("Select a customer segment", segment_options)
-        if selected_segment=="new customers":
-            filter= "IN ('311', '312', '311')"
-        elif selected_segment=="lost customers":
-            filter="IN ('111', '121', '131', '122', '133', '113', '112', '132')"
-        elif selected_segment=="regular customers":
-            filter="IN ('212', '313', '123', '221', '211', '232')"
-        elif selected_segment=="loyal customers":
-            filter="IN ('223', '222', '213', '322', '231', '321', '331')"
-        elif selected_segment=="top customers":
-            filter=" IN ('333', '332', '323', '233')"
-        
-        
-        query =  """
-    WITH rfm_data AS (
-        SELECT
-            customer_id, 
-            gender, 
-            age, 
-          
-            DATEDIFF('2024-01-01', invoice_date) AS last_date_order,
-            SUM(quantity) AS total_orders,
-            CAST(SUM(price * quantity ) AS DECIMAL(10, 2)) AS revenue  
-        FROM 
-            customer_data
-        GROUP BY 
-            customer_id, gender, age, invoice_date,invoice_date,quantity,price
-    ),
-    rfm_calc AS (
-        SELECT *,
-            NTILE(3) OVER (ORDER BY last_date_order) AS rfm_recency,
-            NTILE(3) OVER (ORDER BY total_orders) AS rfm_frequency,
-            NTILE(3) OVER (ORDER BY revenue) AS rfm_monetary
-        FROM rfm_data
-    )
-    SELECT  customer_id, gender, age,  total_orders, revenue,
-    rfm_recency + rfm_frequency + rfm_monetary as rfm_score,
-     
-        CASE
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('311', '312', '311') THEN 'new customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('111', '121', '131', '122', '133', '113', '112', '132') THEN 'lost customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('212', '313', '123', '221', '211', '232') THEN 'regular customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('223', '222', '213', '322', '231', '321', '331') THEN 'loyal customers'
-            WHEN CONCAT(rfm_recency, rfm_frequency, rfm_monetary) IN ('333', '332', '323', '233') THEN 'top customers'
-        END AS rfm_segment
-    FROM rfm_calc where CONCAT(rfm_recency, rfm_frequency, rfm_monetary)  """ + filter +""";
-    """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data)
+        df = rfm_table.customers_in_segment(selected_segment)
         st.dataframe(df)
 
     # Sales Analysis Section
     if questions_menu == "Sales Analysis: Age Group":
         st.header("How do age groups influence the quantity of products purchased and their preferred product categories?")
 
-        # Fetch data from the database
-        query = "SELECT * FROM customer_data"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data)
-
-        # Preprocess data for clustering
-        df = preprocess_data(df)
-
-        # Perform Clustering
-        kmeans = KMeans(n_clusters=3, random_state=42)
-        df['age_group'] = kmeans.fit_predict(df[['age']])
+        # One streaming pass over the preprocessed snapshot, then exact 1-D k-means over the age histogram
+        report = analytics.age_group_report(conn)
+        if report is None:
+            st.warning("No data to analyze.")
+            st.stop()
 
         # Analyze the age ranges for each cluster
-        cluster_ranges = (
-            df.groupby('age_group')['age']
-            .agg(['min', 'max', 'mean'])
-            .reset_index()
-        )
         st.write("### Age Group Ranges:")
-        st.dataframe(cluster_ranges)
-
-        # Map cluster labels to meaningful age groups (adjust based on cluster_ranges)
-        age_group_labels = {
-            0: "Young Adults (18-30)",
-            1: "Middle-Aged (31-50)",
-            2: "Seniors (51+)"
-        }
-        df['age_group_label'] = df['age_group'].map(age_group_labels)
-
-        # Summarize total products purchased by labeled age groups
-        age_group_summary = df.groupby('age_group_label')['quantity'].sum().reset_index()
+        st.dataframe(report["ranges"])
 
         # Update bar chart to use labeled groups
         st.write("### Total Products Purchased by Age Group:")
         fig = px.bar(
-            age_group_summary,
+            report["quantity"],
             x='age_group_label',
             y='quantity',
             title="Total Products Purchased by Age Group",
@@ -748,46 +466,15 @@ if main_menu == "Data Driven Insights":
         )
         st.plotly_chart(fig)
 
-        # Identify the most purchased product category for each age group
-        category_summary = (
-            df.groupby(['age_group_label', 'category'])['quantity']
-            .sum()
-            .reset_index()
-        )
-        most_purchased_categories = (
-            category_summary.loc[
-                category_summary.groupby('age_group_label')['quantity'].idxmax()
-            ]
-        )
-
         st.write("### Most Purchased Product Category by Age Group")
-        st.dataframe(most_purchased_categories[['age_group_label', 'category', 'quantity']])
+        st.dataframe(report["top_categories"])
 
      # Customer Segmentation Section
     if questions_menu == "Customer Segmentation":
         st.header("What customer behaviors (age, gender, price sensitivity, and quantity purchased) predict product category preferences?")
 
-        # Fetch data from the database
-        query = "SELECT * FROM customer_data"
-        cursor.execute(query)
-        data = cursor.fetchall()
-        df = pd.DataFrame(data)
-
-        # Preprocess data for classification
-        df = preprocess_data(df)
-        features = ['gender', 'age', 'quantity', 'price']
-        X = df[features]
-        y = df['category']  # Target is the product category
-
-        # Train/Test Split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        # Train Decision Tree Classifier
-        clf = DecisionTreeClassifier(random_state=42)
-        clf.fit(X_train, y_train)
-
-        # Model Evaluation
-        y_pred = clf.predict(X_test)
+        # Trained once per data version; the inputs below only call predict
+        fitted = analytics.category_tree(conn)
 
         # User Input for Classification
         st.write("### Enter Customer Information for Prediction:")
@@ -796,15 +483,128 @@ if main_menu == "Data Driven Insights":
         quantity = st.number_input("Quantity Purchased", min_value=1, step=1)
         price = st.number_input("Price of Product", min_value=1.0, step=0.1)
 
-        # Encode Gender Input
-        gender_encoded = 0 if gender == "Male" else 1
-
         # Prediction
         if st.button("Classify Customer"):
-            prediction = clf.predict([[gender_encoded, age, quantity, price]])
-            st.write(f"The customer is classified under the '{prediction[0]}' category.")
+            prediction = analytics.predict_category(fitted, gender, age, quantity, price)
+            st.write(f"The customer is classified under the '{prediction}' category.")
+
+    # Sales Forecast Section
+    if questions_menu == "Sales Forecast":
+        st.header("How much revenue should each category expect in each shopping mall over the coming months?")
+
+        # ARIMA per category x shopping mall on the monthly sales summary, computed once per data version.
+        # Orders are searched in parallel the first time; after new invoices the stored order is refitted.
+        horizon = st.slider("Months to forecast", 1, 12, 3)
+        result = analytics.forecast_sales(conn, horizon)
+        if result is None:
+            st.warning("No data to forecast.")
+            st.stop()
+        fits = result["fits"]
+        st.caption(f"{len(fits)} series forecast in {result['seconds']:.1f}s "
+                   f"({', '.join(f'{mode}: {count}' for mode, count in fits['mode'].value_counts().items())})")
+
+        category = st.selectbox("Category", CATEGORIES)
+        shopping_mall = st.selectbox("Shopping Mall", SHOPPING_MALLS)
+        history, forecast = (
+            df[(df["category"] == category) & (df["shopping_mall"] == shopping_mall)]
+            for df in (result["history"], result["forecasts"])
+        )
+        chart = pd.concat([
+            history.rename(columns={"total_sales": "Revenue"}).assign(Series="History"),
+            forecast.rename(columns={"forecast": "Revenue"}).assign(Series="Forecast"),
+        ])
+        fig = px.line(chart, x="sales_month", y="Revenue", color="Series", markers=True,
+                      title=f"Monthly Revenue: {category} at {shopping_mall}")
+        st.plotly_chart(fig)
+        st.dataframe(forecast[["sales_month", "forecast", "lower", "upper"]])
+
+        with st.expander("Models"):
+            st.dataframe(fits.astype({"order": str}))
+
+    # Similar Customers Section
+    if questions_menu == "Similar Customers":
+        st.header("Which customers look most like a given customer?")
+
+        # Nearest neighbours over standardized age, gender and RFM values from a KD-tree index that
+        # follows the cached RFM table, so edits made in Data Management show up without a rebuild
+        top = get_rfm_table(conn).top_customers(1)
+        default_id = str(top["customer_id"].iloc[0]) if len(top) else ""
+        entered = st.text_input("Customer IDs (comma separated)", value=default_id)
+        num_neighbors = st.slider("Number of similar customers", 1, 50, 10)
+        customer_ids = [customer_id.strip() for customer_id in entered.split(",") if customer_id.strip()]
+        if customer_ids:
+            search_start = time.perf_counter()
+            try:
+                similar = analytics.similar_customers(conn, customer_ids, num_neighbors)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            st.caption(f"Found in {(time.perf_counter() - search_start) * 1000:.1f} ms")
+            st.dataframe(similar)
+
+    # What-If Analysis Section
+    if questions_menu == "What-If Analysis":
+        st.header("How do age, gender and payment method change what a customer buys?")
+
+        # Bayesian network counted from one GROUP BY and compiled into lookup tables once per data
+        # version; each answer below is a table lookup
+        network = analytics.purchase_network(conn)
+        evidence = {}
+        for column, (variable, label) in zip(st.columns(3), [("age_band", "Age Band"), ("gender", "Gender"),
+                                                              ("payment_method", "Payment Method")]):
+            state = column.selectbox(label, ["Any"] + list(network.network[variable][0]))
+            evidence[variable] = None if state == "Any" else state
+
+        query_start = time.perf_counter()
+        category = network.query("category", evidence)
+        purchase_value = network.query("purchase_value", evidence)
+        query_ms = (time.perf_counter() - query_start) * 1000
+
+        fig = px.bar(category.rename("Probability").rename_axis("Category").reset_index(),
+                     x="Category", y="Probability", title="Probability of Each Product Category")
+        st.plotly_chart(fig)
+        st.metric("Probability of a high-value purchase", f"{purchase_value['high']:.1%}")
+        st.caption(f"Answered in {query_ms:.2f} ms from {network.rows:,} counted purchases")
 
-    
-# Closing the database connection
-conn.close()
 
+# Sidebar Main Menu
+st.sidebar.title("Menu")
+main_menu = st.sidebar.selectbox(
+    "Main Menu",
+    ["Data Management", "Data Driven Insights"]
+)
+with st.sidebar.expander("Connection pool"):
+    st.json(pool_stats())
+with st.sidebar.expander("Query cache"):
+    st.json(query_cache.stats())
+# Filled in at the end of the run, so it includes this run's statements
+query_log_panel = st.sidebar.expander("Query log")
+
+# Borrow a pooled database connection for the chosen section; it goes back to the pool when the section
+# finishes, before the query log panel below is drawn
+with borrow_connection() as conn:
+    try:
+        if conn.is_connected():
+            cursor = conn.cursor(dictionary=True)
+        else:
+            raise Exception("Database connection is not active")
+    except Exception as e:
+        st.error(f"Error: {e}")
+        st.stop()
+    query_log.set_section("startup")
+    ensure_schema(conn)
+    query_log.set_section(main_menu)
+    if main_menu == "Data Management":
+        data_management(conn, cursor, main_menu)
+    if main_menu == "Data Driven Insights":
+        data_driven_insights(conn, cursor, main_menu)
+
+# Statements by fingerprint (most time first), the latest statements, and EXPLAIN plans of slow ones
+with query_log_panel:
+    query_summary = query_log.summary()
+    if query_summary:
+        st.dataframe(pd.DataFrame(query_summary))
+    st.dataframe(pd.DataFrame(query_log.recent(50)[::-1]).drop(columns=["plan"], errors="ignore"))
+    for record in query_log.slow_queries()[-5:]:
+        st.write(f"{record['seconds']:.3f}s in {record['section']}: `{record['fingerprint']}`")
+        st.write(record["plan"])
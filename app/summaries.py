@@ -0,0 +1,110 @@
+"""Summary tables behind the Visualizations page.
+
+    cd app
+    python summaries.py --refresh   # rebuild every summary table from customer_data (e.g. from cron)
+"""
+import sys
+
+from database import borrow_connection
+from query_cache import cached_query
+
+
+# (table, rebuild query, delta upsert) for every summary; a delta's sign is +1 for added rows, -1 for removed
+SUMMARIES = [
+    (
+        "agg_daily_sales",
+        "SELECT invoice_date, SUM(price * quantity), COUNT(*) FROM customer_data GROUP BY invoice_date",
+        """INSERT INTO agg_daily_sales (invoice_date, total_sales, row_count)
+           VALUES (%(invoice_date)s, %(sign)s * %(price)s * %(quantity)s, %(sign)s)
+           ON DUPLICATE KEY UPDATE total_sales = total_sales + VALUES(total_sales),
+                                   row_count = row_count + VALUES(row_count)""",
+    ),
+    (
+        "agg_category_revenue",
+        "SELECT category, SUM(price * quantity), COUNT(*) FROM customer_data GROUP BY category",
+        """INSERT INTO agg_category_revenue (category, total_revenue, row_count)
+           VALUES (%(category)s, %(sign)s * %(price)s * %(quantity)s, %(sign)s)
+           ON DUPLICATE KEY UPDATE total_revenue = total_revenue + VALUES(total_revenue),
+                                   row_count = row_count + VALUES(row_count)""",
+    ),
+    (
+        "agg_age_counts",
+        "SELECT age, COUNT(*) FROM customer_data GROUP BY age",
+        """INSERT INTO agg_age_counts (age, row_count)
+           VALUES (%(age)s, %(sign)s)
+           ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count)""",
+    ),
+    (
+        "agg_payment_counts",
+        "SELECT payment_method, COUNT(*) FROM customer_data GROUP BY payment_method",
+        """INSERT INTO agg_payment_counts (payment_method, row_count)
+           VALUES (%(payment_method)s, %(sign)s)
+           ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count)""",
+    ),
+    (
+        "agg_monthly_sales",
+        """SELECT invoice_date - INTERVAL (DAYOFMONTH(invoice_date) - 1) DAY, category, shopping_mall,
+                  SUM(price * quantity), COUNT(*)
+           FROM customer_data
+           GROUP BY invoice_date - INTERVAL (DAYOFMONTH(invoice_date) - 1) DAY, category, shopping_mall""",
+        """INSERT INTO agg_monthly_sales (sales_month, category, shopping_mall, total_sales, row_count)
+           VALUES (%(invoice_date)s - INTERVAL (DAYOFMONTH(%(invoice_date)s) - 1) DAY, %(category)s,
+                   %(shopping_mall)s, %(sign)s * %(price)s * %(quantity)s, %(sign)s)
+           ON DUPLICATE KEY UPDATE total_sales = total_sales + VALUES(total_sales),
+                                   row_count = row_count + VALUES(row_count)""",
+    ),
+]
+
+# Queries the Visualizations page runs; each reads at most a few hundred rows
+CATEGORY_REVENUE_QUERY = "SELECT category, total_revenue FROM agg_category_revenue"
+AGE_COUNTS_QUERY = "SELECT age, row_count AS count FROM agg_age_counts ORDER BY age"
+DAILY_SALES_QUERY = "SELECT invoice_date, total_sales FROM agg_daily_sales ORDER BY invoice_date"
+PAYMENT_COUNTS_QUERY = "SELECT payment_method, row_count AS count FROM agg_payment_counts"
+MONTHLY_SALES_QUERY = ("SELECT sales_month, category, shopping_mall, total_sales FROM agg_monthly_sales "
+                       "ORDER BY category, shopping_mall, sales_month")
+
+
+def apply_rows(cursor, rows, sign):
+    # Fold customer_data rows into the summaries; call in the same transaction as the write itself
+    if not rows:
+        return
+    params = [dict(row, sign=sign) for row in rows]
+    for table, _, upsert in SUMMARIES:
+        cursor.executemany(upsert, params)
+        if sign < 0:
+            cursor.execute(f"DELETE FROM {table} WHERE row_count <= 0")
+
+
+def customer_rows(cursor, customer_id):
+    cursor.execute("SELECT invoice_date, category, age, payment_method, price, quantity, shopping_mall "
+                   "FROM customer_data WHERE customer_id = %s", (customer_id,))
+    columns = cursor.column_names
+    return [row if isinstance(row, dict) else dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def refresh_summaries(conn):
+    cursor = conn.cursor()
+    try:
+        for table, rebuild, _ in SUMMARIES:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"INSERT INTO {table} {rebuild}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def read_summary(conn, query):
+    # The summaries change in the same transactions as customer_data, so they share its data fingerprint
+    return cached_query(conn, query)
+
+
+if __name__ == "__main__":
+    if "--refresh" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(2)
+    with borrow_connection() as conn:
+        refresh_summaries(conn)
+    print("Summary tables refreshed")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app's modules import each other as top-level modules (`from database import ...`), as when run from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
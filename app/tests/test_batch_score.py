@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_score import SEGMENT_TILES, StreamTiles, local_cut_points
+from rfm import score_rfm
+
+
+def customers(n, seed=0):
+    # Few distinct values, so many customers are tied on every tile boundary
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": [f"C{i:05d}" for i in range(n)],
+        "gender": "Female",
+        "age": 30,
+        "last_date_order": rng.integers(300, 310, n),
+        "total_orders": rng.integers(1, 6, n),
+        "revenue": rng.choice([10.0, 20.0, 30.0], n),
+    })
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 10, 101, 1000])
+@pytest.mark.parametrize("chunk_rows", [1, 7, 1000])
+def test_streamed_tiles_match_the_dashboard_on_tied_data(n, chunk_rows):
+    df = customers(n, seed=n)
+    expected = score_rfm(df)
+    cut_points = local_cut_points(df)
+    tilers = {tile: StreamTiles(cut_points[tile]) for _, tile in SEGMENT_TILES}
+    for value, tile in SEGMENT_TILES:
+        streamed = np.concatenate([tilers[tile].assign(df[value].iloc[i:i + chunk_rows])
+                                   for i in range(0, n, chunk_rows)])
+        assert streamed.tolist() == expected[tile].tolist()
+
+
+def test_cut_points_do_not_depend_on_the_order_values_arrive_in():
+    df = customers(500)
+    shuffled = df.sample(frac=1, random_state=1)
+    assert local_cut_points(df) == local_cut_points(shuffled)
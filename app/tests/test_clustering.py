@@ -0,0 +1,50 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from clustering import kmeans_1d
+
+
+def brute_force_inertia(values, weights, n_clusters):
+    # Smallest weighted within-cluster sum of squares over every assignment of values to clusters
+    best = np.inf
+    for labels in itertools.product(range(n_clusters), repeat=len(values)):
+        labels = np.array(labels)
+        inertia = 0.0
+        for label in set(labels.tolist()):
+            members = labels == label
+            center = np.average(values[members], weights=weights[members])
+            inertia += np.sum(weights[members] * (values[members] - center) ** 2)
+        best = min(best, inertia)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("n_clusters", [1, 2, 3])
+def test_kmeans_1d_is_optimal(seed, n_clusters):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 20, 7).astype(float)
+    weights = rng.integers(1, 4, 7).astype(float)
+    labels, centers, inertia = kmeans_1d(values, n_clusters, weights)
+    assert inertia == pytest.approx(brute_force_inertia(values, weights, n_clusters))
+    # Labels are ordered by centre, and every value sits in the cluster of its centre
+    assert np.all(np.diff(centers) > 0)
+    assert np.all(np.diff(labels[np.argsort(values, kind="stable")]) >= 0)
+    assert inertia == pytest.approx(np.sum(weights * (values - centers[labels]) ** 2))
+
+
+def test_kmeans_1d_weights_match_repeated_rows():
+    values = np.array([1.0, 2.0, 10.0, 11.0, 30.0])
+    weights = np.array([3, 1, 2, 2, 1])
+    _, centers, inertia = kmeans_1d(values, 3, weights)
+    _, repeated_centers, repeated_inertia = kmeans_1d(np.repeat(values, weights), 3)
+    assert centers == pytest.approx(repeated_centers)
+    assert inertia == pytest.approx(repeated_inertia)
+
+
+def test_kmeans_1d_with_fewer_distinct_values_than_clusters():
+    labels, centers, inertia = kmeans_1d([5, 5, 7], 4)
+    assert labels.tolist() == [0, 0, 1]
+    assert centers.tolist() == [5, 7]
+    assert inertia == 0
@@ -0,0 +1,31 @@
+import os
+
+import model_registry
+
+
+def test_superseded_model_files_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(model_registry, "_models", model_registry.OrderedDict())
+    for version in range(4):
+        model_registry.get_or_fit("segment", {}, ["a"], f"v{version}", lambda: version)
+        # Distinct modification times, newest last
+        path = tmp_path / f"{model_registry.model_key('segment', {}, ['a'], f'v{version}')}.joblib"
+        os.utime(path, (version, version))
+    model_registry.get_or_fit("segment_tree", {}, ["a"], "v0", lambda: "other type")
+    (tmp_path / "forecast_state.json").write_text("{}")
+
+    names = sorted(os.listdir(tmp_path))
+    kept = [model_registry.model_key("segment", {}, ["a"], f"v{version}") + ".joblib" for version in (2, 3)]
+    assert [name for name in names if name.startswith("segment-")] == sorted(kept)
+    assert any(name.startswith("segment_tree-") for name in names)
+    assert "forecast_state.json" in names
+
+
+def test_pruned_file_is_refitted(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(model_registry, "_models", model_registry.OrderedDict())
+    assert model_registry.get_or_fit("segment", {}, ["a"], "v0", lambda: "first") == "first"
+    model_registry._models.clear()
+    for path in tmp_path.iterdir():
+        path.unlink()
+    assert model_registry.get_or_fit("segment", {}, ["a"], "v0", lambda: "refit") == "refit"
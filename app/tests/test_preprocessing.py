@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+from preprocessing import SCALED_COLUMNS, Preprocessor, preprocess_data
+
+
+def invoices(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "gender": rng.choice(["Male", "Female"], n).astype(object),
+        "age": rng.integers(18, 70, n),
+        "category": rng.choice(["Books", "Shoes", "Toys"], n),
+        "quantity": rng.integers(1, 6, n),
+        "price": np.round(rng.random(n) * 1000, 2),
+    })
+    df.loc[[3, 40], "price"] = np.nan
+    df.loc[7, "gender"] = None
+    return df
+
+
+def test_matches_label_encoder_and_min_max_scaler():
+    df = invoices()
+    # Fitted in chunks, as over the snapshot
+    preprocessor = Preprocessor().fit(df.iloc[i:i + 70] for i in range(0, len(df), 70))
+    transformed = preprocessor.transform(df.copy())
+
+    expected = df.dropna()
+    assert transformed.index.tolist() == expected.index.tolist()
+    assert transformed["gender"].tolist() == LabelEncoder().fit_transform(expected["gender"]).tolist()
+    scaled = MinMaxScaler().fit_transform(expected[SCALED_COLUMNS])
+    np.testing.assert_allclose(transformed[SCALED_COLUMNS].to_numpy(), scaled)
+
+
+def test_constant_column_scales_to_zero_like_min_max_scaler():
+    df = invoices().dropna().assign(quantity=3)
+    transformed = Preprocessor().fit([df]).transform(df.copy())
+    np.testing.assert_allclose(transformed["quantity"], MinMaxScaler().fit_transform(df[["quantity"]])[:, 0])
+
+
+def test_unseen_gender_encodes_as_minus_one():
+    preprocessor = Preprocessor().fit([invoices()])
+    assert preprocessor.encode_gender(["Female", "Male", "Other"]).tolist() == [0, 1, -1]
+
+
+def test_preprocess_data_leaves_its_input_alone():
+    df = invoices()
+    before = df.copy()
+    preprocess_data(df)
+    pd.testing.assert_frame_equal(df, before)
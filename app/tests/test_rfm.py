@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rfm import SEGMENT_CODES, RFMTable, load_rfm, ntile, rfm_mismatches, score_rfm
+
+
+def sql_ntile(values, n):
+    # NTILE(n) OVER (ORDER BY values) row by row: rows in order, the first size % n buckets one row larger
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    small, extra = divmod(len(values), n)
+    tiles = [0] * len(values)
+    row = 0
+    for bucket in range(1, n + 1):
+        for _ in range(small + (bucket <= extra)):
+            tiles[order[row]] = bucket
+            row += 1
+    return tiles
+
+
+def customers(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": [f"C{i}" for i in range(n)],
+        "gender": rng.choice(["Male", "Female"], n),
+        "age": rng.integers(18, 70, n),
+        "last_date_order": rng.integers(300, 1100, n),
+        "total_orders": rng.integers(1, 15, n),
+        "revenue": np.round(rng.random(n) * 5000, 2),
+    })
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 4, 7, 100, 1001])
+@pytest.mark.parametrize("n", [3, 5])
+def test_ntile_matches_sql_ntile(size, n):
+    # Few distinct values, so most rows are tied with others
+    values = np.random.default_rng(size).integers(0, 10, size)
+    assert ntile(values, n).tolist() == sql_ntile(values.tolist(), n)
+
+
+def test_score_rfm_segments_match_codes():
+    df = score_rfm(customers(500))
+    codes = df["rfm_recency"].astype(str) + df["rfm_frequency"].astype(str) + df["rfm_monetary"].astype(str)
+    segment_of = {code: segment for segment, members in SEGMENT_CODES.items() for code in members}
+    assert df["rfm"].tolist() == codes.tolist()
+    assert df["rfm_segment"].astype(str).tolist() == codes.map(segment_of).tolist()
+    assert (df["rfm_score"] == df["rfm_recency"] + df["rfm_frequency"] + df["rfm_monetary"]).all()
+
+
+def test_mismatches_ignore_ties_across_a_tile_boundary():
+    sql_df = score_rfm(customers(300))
+    local_df = sql_df.copy()
+    assert rfm_mismatches(sql_df, local_df).empty
+    # Moving a customer whose value no other customer shares is a real mismatch
+    unique = sql_df.groupby("revenue")["customer_id"].transform("size") == 1
+    customer = sql_df.loc[unique & (sql_df["rfm_monetary"] == 1), "customer_id"].iloc[0]
+    local_df.loc[local_df["customer_id"] == customer, "rfm_monetary"] = 2
+    assert rfm_mismatches(sql_df, local_df)["customer_id"].tolist() == [customer]
+
+
+def test_patched_rows_keep_the_column_types():
+    table = RFMTable(score_rfm(customers(200)), 1)
+    row = dict(customers(1, seed=1).iloc[0], revenue=4999.0)
+    table.apply_customer("C5", dict(row, customer_id="C5"), 2)
+    table.apply_customer("C999", dict(row, customer_id="C999"), 3)
+    patched = table.df.loc[["C5", "C999"]]
+    assert patched["rfm"].map(type).tolist() == [str, str]
+    assert patched["rfm_segment"].tolist() == [table.score_customer(row)["rfm_segment"]] * 2
+
+
+def test_patches_leave_frames_already_handed_out_unchanged():
+    table = RFMTable(score_rfm(customers(200)), 1)
+    before = table.df
+    expected = before.copy()
+    row = dict(customers(1, seed=1).iloc[0], revenue=4999.0)
+    table.apply_customer("C5", dict(row, customer_id="C5"), 2)
+    table.apply_customer("C999", dict(row, customer_id="C999"), 3)
+    table.apply_customer("C7", None, 4)
+    pd.testing.assert_frame_equal(before, expected)
+    assert table.df is not before
+
+
+@pytest.mark.skipif(not os.environ.get("DB_HOST"), reason="needs the app's database (DB_HOST, DB_USER, ...)")
+def test_backends_agree_on_the_database():
+    from database import borrow_connection
+
+    with borrow_connection() as conn:
+        sql_df, local_df = load_rfm(conn, "sql"), load_rfm(conn, "local")
+    assert len(sql_df) == len(local_df)
+    assert rfm_mismatches(sql_df, local_df).empty
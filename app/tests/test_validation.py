@@ -0,0 +1,95 @@
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from validation import CUSTOMER_VALIDATOR
+
+
+VALID_RECORD = {
+    "invoice_number": "I100", "customer_id": "C200", "gender": "Female", "age": 34, "category": "Books",
+    "quantity": 2, "price": 30.3, "payment_method": "Cash", "invoice_date": datetime.date(2022, 8, 5),
+    "shopping_mall": "Kanyon",
+}
+
+INVALID_FIELDS = [
+    ("invoice_number", "I-1", "Invoice Number should be alphanumeric."),
+    ("customer_id", "", "Customer ID is required."),
+    ("gender", "Other", "Gender should be one of: Male, Female."),
+    ("age", 0, "Age is required."),
+    ("age", 1.5, "Age should be a whole number."),
+    ("age", 121, "Age should be at most 120."),
+    ("quantity", "two", "Quantity should be a number."),
+    ("quantity", 0, "Quantity is required."),
+    ("price", -1, "Price should be at least 0."),
+    ("category", "Garden", "Category should be one of: " + ", ".join(
+        ["Books", "Clothing", "Cosmetics", "Food & Beverage", "Shoes", "Souvenir", "Technology", "Toys"]) + "."),
+    ("payment_method", "Cheque", "Payment Method should be one of: Cash, Credit Card, Debit Card."),
+    ("shopping_mall", "nan", "Shopping Mall is required."),
+    ("invoice_date", None, "Invoice Date is required."),
+    ("invoice_date", "Aug 5 2022", "Invoice Date is not a valid date."),
+    ("invoice_date", datetime.date.today() + datetime.timedelta(days=1), "Invoice Date cannot be in the future."),
+]
+
+
+def test_valid_record():
+    assert CUSTOMER_VALIDATOR.validate_record(VALID_RECORD) == {}
+    assert CUSTOMER_VALIDATOR.validate_record(dict(VALID_RECORD, invoice_date=datetime.date.today())) == {}
+
+
+@pytest.mark.parametrize("column, value, message", INVALID_FIELDS)
+def test_record_rejected(column, value, message):
+    assert CUSTOMER_VALIDATOR.validate_record(dict(VALID_RECORD, **{column: value})) == {column: message}
+
+
+@pytest.mark.parametrize("column, value, message", INVALID_FIELDS)
+def test_frame_rejects_as_record_does(column, value, message):
+    frame = pd.DataFrame([VALID_RECORD, dict(VALID_RECORD, **{column: value})])
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(frame)
+    assert len(rows) == 1
+    assert rejected["reason"].tolist() == [message]
+
+
+def test_record_reports_every_invalid_field():
+    record = dict(VALID_RECORD, customer_id="C 1", age=-3, price="")
+    assert CUSTOMER_VALIDATOR.validate_record(record) == {
+        "customer_id": "Customer ID should be alphanumeric.",
+        "age": "Age should be at least 1.",
+        "price": "Price is required.",
+    }
+
+
+def test_frame_reports_the_first_invalid_column():
+    frame = pd.DataFrame([dict(VALID_RECORD, gender="X", category="Y")])
+    _, rejected = CUSTOMER_VALIDATOR.validate_frame(frame)
+    assert rejected["reason"].tolist() == ["Gender should be one of: Male, Female."]
+
+
+def test_arrow_batches_are_validated_like_frames():
+    frame = pd.DataFrame([VALID_RECORD, dict(VALID_RECORD, gender="Other")])
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(pa.Table.from_pandas(frame.astype({"invoice_date": str})))
+    assert rows["invoice_number"].tolist() == ["I100"]
+    assert rejected["reason"].tolist() == ["Gender should be one of: Male, Female."]
+
+
+def test_frame_without_any_parseable_date():
+    # Every date NaT used to raise on the future-date check and abort the whole chunk
+    frame = pd.DataFrame([dict(VALID_RECORD, invoice_date=value) for value in ["Aug 5 2022", None, ""]])
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(frame)
+    assert rows.empty
+    assert rejected["reason"].tolist() == [
+        "Invoice Date is not a valid date.", "Invoice Date is required.", "Invoice Date is required."]
+
+
+def test_frame_parses_text_as_a_csv_reader_gives_it():
+    frame = pd.DataFrame([dict(VALID_RECORD, age="34", quantity="2", price="30.30", invoice_date="5/8/2022")])
+    rows, rejected = CUSTOMER_VALIDATOR.validate_frame(frame)
+    assert rejected.empty
+    assert rows.iloc[0]["invoice_date"] == datetime.date(2022, 8, 5)
+    assert rows.iloc[0]["age"] == 34
+
+
+def test_missing_column():
+    with pytest.raises(ValueError, match="Missing columns: shopping_mall"):
+        CUSTOMER_VALIDATOR.validate_frame(pd.DataFrame([VALID_RECORD]).drop(columns="shopping_mall"))
@@ -0,0 +1,174 @@
+"""Hyperparameter search for the app's models, with the winners persisted for the app to read at startup.
+
+Each model is searched on a stratified subsample of its training data with successive halving
+(HalvingRandomSearchCV: many candidates on a few rows, the best third kept on three times as many)
+or a plain randomized search, cross-validated in parallel across TUNE_WORKERS processes. The winner is
+scored on a stratified holdout next to the current parameters and written to TUNED_PARAMS_PATH under
+a new version. Restart the app to pick it up; models the search did not cover keep their entries.
+
+    cd app
+    python tune.py
+    python tune.py --models category_tree --method random --candidates 30
+    python tune.py --sample-rows 200000 --workers 8
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import sklearn
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import HalvingRandomSearchCV, RandomizedSearchCV, StratifiedKFold, train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+import snapshot
+from database import borrow_connection, data_fingerprint
+from migrate import ensure_schema
+from model_registry import TUNED_PARAMS_FORMAT, TUNED_PARAMS_PATH, load_tuned
+from models import CATEGORY_FEATURES, CATEGORY_TREE_DEFAULTS, SEGMENT_TREE_DEFAULTS
+from preprocessing import fitted_preprocessor
+from rfm import get_rfm_table
+
+
+TUNE_WORKERS = int(os.environ.get("TUNE_WORKERS", os.cpu_count() or 1))
+TUNE_SAMPLE_ROWS = 100_000
+TUNE_HOLDOUT_ROWS = 20_000
+TUNE_CANDIDATES = 60
+TUNE_CV_FOLDS = 3
+
+# Every depth is bounded, so no candidate can grow one leaf per row
+TREE_SEARCH_SPACE = {
+    "criterion": ["gini", "entropy"],
+    "max_depth": list(range(3, 21)),
+    "min_samples_split": [2, 5, 10, 20, 50],
+    "min_samples_leaf": [1, 2, 5, 10, 20, 50, 100],
+    "max_leaf_nodes": [32, 64, 128, 256, 512, 1024, None],
+}
+
+
+def segment_data(conn):
+    # Per-customer RFM values -> segment, as fit_segment_tree trains on
+    return get_rfm_table(conn).classifier_data()
+
+
+def category_data(conn):
+    # Preprocessed invoices -> category, as fit_category_tree trains on; the snapshot frame is shared, so
+    # the preprocessor works on a copy
+    df = fitted_preprocessor(conn).transform(snapshot.load_frame(conn).copy())
+    return df[CATEGORY_FEATURES], df["category"]
+
+
+# model type (the model registry's name) -> (training data loader, default parameters, search space)
+TUNABLE_MODELS = {
+    "rfm_segment_tree": (segment_data, SEGMENT_TREE_DEFAULTS, TREE_SEARCH_SPACE),
+    "category_tree": (category_data, CATEGORY_TREE_DEFAULTS, TREE_SEARCH_SPACE),
+}
+
+
+def stratified_sample(X, y, sample_rows, holdout_rows, seed=42):
+    # (X_sample, X_holdout, y_sample, y_holdout) keeping each class's share; small tables are split 80/20
+    sample_rows = min(sample_rows, int(len(y) * 0.8))
+    holdout_rows = min(holdout_rows, len(y) - sample_rows)
+    # A class with a single row cannot be split in proportion
+    stratify = y if y.value_counts().min() >= 2 else None
+    return train_test_split(X, y, train_size=sample_rows, test_size=holdout_rows, stratify=stratify, random_state=seed)
+
+
+def search(X, y, defaults, space, method="halving", candidates=TUNE_CANDIDATES, workers=TUNE_WORKERS, seed=42):
+    estimator = DecisionTreeClassifier(**defaults)
+    cv = StratifiedKFold(n_splits=TUNE_CV_FOLDS, shuffle=True, random_state=seed)
+    if method == "halving":
+        searcher = HalvingRandomSearchCV(estimator, space, n_candidates=candidates, factor=3, cv=cv,
+                                         scoring="accuracy", n_jobs=workers, random_state=seed)
+    else:
+        searcher = RandomizedSearchCV(estimator, space, n_iter=candidates, cv=cv, scoring="accuracy",
+                                      n_jobs=workers, random_state=seed)
+    return searcher.fit(X, y)
+
+
+def tune_model(X, y, defaults, space, method="halving", candidates=TUNE_CANDIDATES, workers=TUNE_WORKERS,
+               sample_rows=TUNE_SAMPLE_ROWS, holdout_rows=TUNE_HOLDOUT_ROWS):
+    # The winning parameters and how they compare with the defaults on the same holdout
+    start = time.perf_counter()
+    X_sample, X_holdout, y_sample, y_holdout = stratified_sample(X, y, sample_rows, holdout_rows)
+    searcher = search(X_sample, y_sample, defaults, space, method, candidates, workers)
+    winner = searcher.best_estimator_
+    baseline = DecisionTreeClassifier(**defaults).fit(X_sample, y_sample)
+    # JSON has no NumPy scalars
+    params = {name: value.item() if hasattr(value, "item") else value for name, value in searcher.best_params_.items()}
+    return {
+        "params": {**defaults, **params},
+        "cv_score": float(searcher.best_score_),
+        "holdout_accuracy": float(accuracy_score(y_holdout, winner.predict(X_holdout))),
+        "default_holdout_accuracy": float(accuracy_score(y_holdout, baseline.predict(X_holdout))),
+        "depth": int(winner.get_depth()),
+        "leaves": int(winner.get_n_leaves()),
+        "default_leaves": int(baseline.get_n_leaves()),
+        "method": method,
+        "candidates": len(searcher.cv_results_["params"]),
+        "sample_rows": len(y_sample),
+        "holdout_rows": len(y_holdout),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def write_tuned(results, fingerprint, path=TUNED_PARAMS_PATH):
+    # Each run is a new version; entries for models not tuned this time are carried over
+    previous = load_tuned(path)
+    version = previous.get("version", 0) + 1
+    models = dict(previous.get("models", {}))
+    for model_type, result in results.items():
+        models[model_type] = {**result, "version": version, "data_fingerprint": fingerprint}
+    tuned = {
+        "format": TUNED_PARAMS_FORMAT,
+        "version": version,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "sklearn": sklearn.__version__,
+        "models": models,
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(tuned, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return tuned
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=list(TUNABLE_MODELS), default=list(TUNABLE_MODELS))
+    parser.add_argument("--method", choices=["halving", "random"], default="halving")
+    parser.add_argument("--candidates", type=int, default=TUNE_CANDIDATES, help="parameter settings to try per model")
+    parser.add_argument("--sample-rows", type=int, default=TUNE_SAMPLE_ROWS)
+    parser.add_argument("--holdout-rows", type=int, default=TUNE_HOLDOUT_ROWS)
+    parser.add_argument("--workers", type=int, default=TUNE_WORKERS, help="processes (-1 for every core)")
+    parser.add_argument("--output", default=TUNED_PARAMS_PATH)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with borrow_connection() as conn:
+        ensure_schema(conn)
+        fingerprint = data_fingerprint(conn)
+        for model_type in args.models:
+            load, defaults, space = TUNABLE_MODELS[model_type]
+            X, y = load(conn)
+            if len(y) < 2 * TUNE_CV_FOLDS:
+                print(f"{model_type}: not enough rows to tune ({len(y)})")
+                continue
+            result = tune_model(X, y, defaults, space, args.method, args.candidates, args.workers,
+                                args.sample_rows, args.holdout_rows)
+            results[model_type] = result
+            print(f"{model_type}: {result['params']} holdout accuracy {result['holdout_accuracy']:.4f} "
+                  f"({result['leaves']:,} leaves; defaults {result['default_holdout_accuracy']:.4f} with "
+                  f"{result['default_leaves']:,} leaves) in {result['seconds']:.1f}s")
+
+    if not results:
+        return 1
+    tuned = write_tuned(results, fingerprint, args.output)
+    print(f"Wrote version {tuned['version']} to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
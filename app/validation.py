@@ -0,0 +1,184 @@
+import datetime
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+GENDERS = ["Male", "Female"]
+CATEGORIES = ["Books", "Clothing", "Cosmetics", "Food & Beverage", "Shoes", "Souvenir", "Technology", "Toys"]
+PAYMENT_METHODS = ["Cash", "Credit Card", "Debit Card"]
+SHOPPING_MALLS = ["Cevahir AVM", "Emaar Square Mall", "Forum Istanbul", "Istinye Park", "Kanyon", "Mall of Istanbul",
+                  "Metrocity", "Metropol AVM", "Viaport Outlet", "Zorlu Center"]
+
+ALPHANUMERIC_PATTERN = "^[a-zA-Z0-9]*$"
+
+# Declarative schema for customer_data, in column order. type is str, int, float or date. For numbers,
+# "required" also rejects 0, as the Add Entry form always has; a date's "max" may be "today".
+CUSTOMER_SCHEMA = {
+    "invoice_number": {"label": "Invoice Number", "type": "str", "required": True, "pattern": ALPHANUMERIC_PATTERN},
+    "customer_id": {"label": "Customer ID", "type": "str", "required": True, "pattern": ALPHANUMERIC_PATTERN},
+    "gender": {"label": "Gender", "type": "str", "required": True, "enum": GENDERS},
+    "age": {"label": "Age", "type": "int", "required": True, "min": 1, "max": 120},
+    "category": {"label": "Category", "type": "str", "required": True, "enum": CATEGORIES},
+    "quantity": {"label": "Quantity", "type": "int", "required": True, "min": 1},
+    "price": {"label": "Price", "type": "float", "required": True, "min": 0},
+    "payment_method": {"label": "Payment Method", "type": "str", "required": True, "enum": PAYMENT_METHODS},
+    "invoice_date": {"label": "Invoice Date", "type": "date", "required": True, "max": "today"},
+    "shopping_mall": {"label": "Shopping Mall", "type": "str", "required": True, "enum": SHOPPING_MALLS},
+}
+
+MISSING_TEXT = ["", "nan", "NaT", "None", "<NA>"]
+
+
+def parse_dates(values):
+    # ISO dates first, then day-first dates as in the public dataset (e.g. 5/8/2022)
+    values = values.astype(str).str.strip()
+    dates = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    day_first = pd.to_datetime(values[dates.isna()], format="%d/%m/%Y", errors="coerce")
+    return dates.fillna(day_first)
+
+
+class Validator:
+    # A schema compiled once (regexes, enum sets); checks whole columns at a time
+    def __init__(self, schema):
+        self.columns = list(schema)
+        self.rules = []
+        for column, spec in schema.items():
+            rule = dict(spec, column=column)
+            if "pattern" in spec:
+                # fullmatch with the anchors stripped, so a trailing newline is rejected too
+                rule["regex"] = re.compile(spec["pattern"].lstrip("^").rstrip("$"))
+            if "enum" in spec:
+                rule["enum"] = pd.Index(spec["enum"])
+            self.rules.append(rule)
+
+    def errors(self, data):
+        # One message per cell ("" when valid; the first failing check wins) and the parsed, typed values
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            data = data.to_pandas()
+        missing = [column for column in self.columns if column not in data.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        data = data.reset_index(drop=True)
+
+        messages, values = {}, {}
+        for rule in self.rules:
+            column, label = rule["column"], rule["label"]
+            raw = data[column]
+            text = raw.astype(str).str.strip()
+            message = np.full(len(data), "", dtype=object)
+
+            def fail(mask, error):
+                message[np.asarray(mask, dtype=bool) & (message == "")] = error
+
+            is_missing = raw.isna() | text.isin(MISSING_TEXT)
+            if rule["type"] == "str":
+                parsed = text
+            elif rule["type"] == "date":
+                parsed = parse_dates(raw)
+            else:
+                parsed = pd.to_numeric(raw, errors="coerce")
+                if rule.get("required"):
+                    is_missing = is_missing | (parsed == 0)
+
+            if rule.get("required"):
+                fail(is_missing, f"{label} is required.")
+            if rule["type"] == "date":
+                fail(~is_missing & parsed.isna(), f"{label} is not a valid date.")
+            elif rule["type"] in ("int", "float"):
+                fail(~is_missing & parsed.isna(), f"{label} should be a number.")
+                if rule["type"] == "int":
+                    fail(parsed.notna() & (parsed % 1 != 0), f"{label} should be a whole number.")
+            if "regex" in rule:
+                fail(~text.str.fullmatch(rule["regex"]), f"{label} should be alphanumeric.")
+            if "enum" in rule:
+                fail(~text.isin(rule["enum"]), f"{label} should be one of: {', '.join(rule['enum'])}.")
+            if "min" in rule:
+                fail(parsed < rule["min"], f"{label} should be at least {rule['min']}.")
+            if "max" in rule:
+                if rule["max"] == "today":
+                    # NaT compares False, so unparsed dates keep their own message
+                    fail(parsed.dt.normalize() > pd.Timestamp.today().normalize(), f"{label} cannot be in the future.")
+                else:
+                    fail(parsed > rule["max"], f"{label} should be at most {rule['max']}.")
+
+            messages[column] = message
+            values[column] = parsed
+        return pd.DataFrame(messages, index=data.index), values
+
+    def validate_frame(self, data):
+        # (valid rows with typed values, rejected rows with a "reason" column)
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            data = data.to_pandas()
+        data = data.reset_index(drop=True)
+        messages, values = self.errors(data)
+        reason = pd.Series("", index=data.index, dtype=object)
+        for column in self.columns:
+            reason = reason.where(reason != "", messages[column])
+        valid = (messages == "").all(axis=1)
+
+        rows = pd.DataFrame({column: values[column][valid] for column in self.columns})
+        for rule in self.rules:
+            column = rule["column"]
+            if rule["type"] == "int":
+                rows[column] = rows[column].astype(int)
+            elif rule["type"] == "float":
+                rows[column] = rows[column].astype(float)
+            elif rule["type"] == "date":
+                rows[column] = rows[column].dt.date
+        rejected = data.loc[~valid, self.columns].assign(reason=reason[~valid])
+        return rows, rejected
+
+    def check_value(self, rule, value):
+        # The message for one value ("" when valid): the same checks, in the same order, as errors()
+        # without building a frame
+        label = rule["label"]
+        text = "" if value is None else str(value).strip()
+        is_missing = (not isinstance(value, str) and pd.isna(value)) or text in MISSING_TEXT
+        if rule["type"] == "str":
+            parsed = text
+        elif rule["type"] == "date":
+            if isinstance(value, (datetime.date, pd.Timestamp)) and not is_missing:
+                parsed = pd.Timestamp(value)
+            else:
+                parsed = parse_dates(pd.Series([value])).iloc[0]
+        else:
+            try:
+                parsed = float(text)
+            except ValueError:
+                parsed = np.nan
+            if rule.get("required"):
+                is_missing = is_missing or parsed == 0
+
+        if rule.get("required") and is_missing:
+            return f"{label} is required."
+        if rule["type"] == "date" and pd.isna(parsed):
+            return f"{label} is not a valid date."
+        if rule["type"] in ("int", "float"):
+            if pd.isna(parsed):
+                return f"{label} should be a number."
+            if rule["type"] == "int" and parsed % 1 != 0:
+                return f"{label} should be a whole number."
+        if "regex" in rule and not rule["regex"].fullmatch(text):
+            return f"{label} should be alphanumeric."
+        if "enum" in rule and text not in rule["enum"]:
+            return f"{label} should be one of: {', '.join(rule['enum'])}."
+        if "min" in rule and parsed < rule["min"]:
+            return f"{label} should be at least {rule['min']}."
+        if "max" in rule:
+            if rule["max"] == "today":
+                if parsed.normalize() > pd.Timestamp.today().normalize():
+                    return f"{label} cannot be in the future."
+            elif parsed > rule["max"]:
+                return f"{label} should be at most {rule['max']}."
+        return ""
+
+    def validate_record(self, record):
+        # {column: message} for every invalid field of a single record; empty when the record is valid
+        messages = {rule["column"]: self.check_value(rule, record.get(rule["column"])) for rule in self.rules}
+        return {column: text for column, text in messages.items() if text}
+
+
+CUSTOMER_VALIDATOR = Validator(CUSTOMER_SCHEMA)